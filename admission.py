@@ -0,0 +1,108 @@
+# admission.py — per-class concurrency limits and load shedding
+"""
+Every view belongs to a priority class (default "normal"):
+
+    critical  booking creation, trip accept/complete — never shed
+    normal    location pings and ordinary pages
+    low       dashboards and background polls
+
+Each non-critical class has a bounded number of in-flight requests per worker
+(ADMIT_LIMIT_<CLASS>). When a class is full, low work is rejected at once and
+normal work waits up to ADMIT_WAIT_NORMAL seconds; rejected requests get a
+503 with Retry-After. Counters are exposed through snapshot().
+"""
+import os
+import threading
+
+from flask import g, jsonify, render_template, request
+
+DEFAULT_CLASS = "normal"
+
+
+class _Gate:
+    def __init__(self, name, limit, wait, retry_after):
+        self.name = name
+        self.limit = limit
+        self.wait = wait
+        self.retry_after = retry_after
+        self._sem = threading.BoundedSemaphore(limit) if limit > 0 else None
+        self._lock = threading.Lock()
+        self.admitted = self.shed = self.in_flight = self.peak = 0
+
+    def enter(self) -> bool:
+        if self._sem is None:
+            ok = True
+        elif self.wait > 0:
+            ok = self._sem.acquire(timeout=self.wait)
+        else:
+            ok = self._sem.acquire(blocking=False)
+        with self._lock:
+            if ok:
+                self.admitted += 1; self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+            else:
+                self.shed += 1
+        return ok
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+        if self._sem is not None:
+            self._sem.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"limit": self.limit, "admitted": self.admitted, "shed": self.shed,
+                    "in_flight": self.in_flight, "peak_in_flight": self.peak}
+
+
+def _env(name, default):
+    return float(os.environ.get(name, default))
+
+GATES = {
+    "critical": _Gate("critical", 0, 0, 0),
+    "normal":   _Gate("normal", int(_env("ADMIT_LIMIT_NORMAL", "64")), _env("ADMIT_WAIT_NORMAL", "0.1"), 2),
+    "low":      _Gate("low", int(_env("ADMIT_LIMIT_LOW", "16")), 0, 5),
+}
+
+
+def admit(cls):
+    """View decorator: put the view in priority class `cls`."""
+    if cls not in GATES:
+        raise ValueError(f"unknown admission class {cls!r}")
+    def deco(fn):
+        fn.admission_class = cls
+        return fn
+    return deco
+
+def snapshot() -> dict:
+    return {name: gate.stats() for name, gate in GATES.items()}
+
+def _rejected(gate):
+    if request.accept_mimetypes.best == "text/html":
+        body = render_template("error.html", code=503, message="Server busy, please retry shortly")
+        return body, 503, {"Retry-After": str(gate.retry_after)}
+    resp = jsonify({"error": "busy", "retry_after": gate.retry_after})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(gate.retry_after)
+    return resp
+
+
+def init_app(app):
+    """Register the admission hooks; call before any other before_request hook."""
+
+    @app.before_request
+    def _admit_request():
+        if request.endpoint in (None, "static"):
+            return
+        view = app.view_functions.get(request.endpoint)
+        gate = GATES[getattr(view, "admission_class", DEFAULT_CLASS)]
+        if not gate.enter():
+            return _rejected(gate)
+        g.admission_gate = gate
+
+    @app.teardown_request
+    def _release_request(exc):
+        gate = g.pop("admission_gate", None)
+        if gate is not None:
+            gate.leave()
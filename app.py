@@ -1,18 +1,53 @@
 import os
-from datetime import datetime
+import time
+from datetime import datetime, date
 from flask import (
-    Flask, render_template, request, redirect, url_for, session, flash, jsonify
+    Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 
 # DB helpers
-from database import initialize_db, get_db_connection
+from database import (
+    initialize_db, get_db_connection, get_read_connection,
+    db_route, pin_primary, consume_write_flag, STICKY_SECONDS,
+    pooled_connection, execute_prepared, LIVE_BOOKINGS, reconcile_unread_counters,
+)
+from passwords import check_password, hash_password, HashingBusy
+from events import publish, publish_ids, subscribe, start_listener, listening as events_listening
+from sessions import PgSessionInterface, rotate as rotate_session, has_data as session_has_data
+import assets
+import admission
+import heatmap
+import locations
+import jobs
+import partitions
+import search
+import export
+import offers
+import regions
+import slowlog
+import ratelimit
+from jobs import recurring
+from admission import admit
+from ratelimit import rate_limit
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "dev-secret-please-change")
 app.config["UPLOAD_FOLDER"] = os.path.join("static", "uploads")
 os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+# Server-side sessions; SESSION_BACKEND=cookie keeps Flask's signed cookie.
+if os.environ.get("SESSION_BACKEND", "db") != "cookie":
+    app.session_interface = PgSessionInterface()
+# Fingerprinted/precompressed static files when static/dist/manifest.json exists.
+assets.init_app(app)
+# Per-client token buckets on ping/poll endpoints; checked before anything else.
+ratelimit.init_app(app)
+# Priority classes + load shedding; registered early so shed requests cost nothing.
+admission.init_app(app)
+# SLOW_REQUEST_MS=<ms> logs slow requests with their statements (see slowlog.py).
+slowlog.init_app(app)
+jobs.init_app(app)
+partitions.init_app(app, get_db_connection)
 
 # Init DB
 try:
@@ -21,25 +56,19 @@ try:
 except Exception as e:
     print("⚠️ DB init failed:", e)
 
+# Cross-worker events (LISTEN/NOTIFY); EVENT_BUS=0 disables the listener.
+if os.environ.get("EVENT_BUS", "1") != "0":
+    start_listener()
+# In-process job workers; JOB_WORKERS=0 leaves jobs to `flask --app app jobs-worker`.
+if int(os.environ.get("JOB_WORKERS", "1")) > 0:
+    jobs.start_workers(int(os.environ.get("JOB_WORKERS", "1")))
+
 
 # ------------------------------
 # Utilities
 # ------------------------------
-def verify_password(input_password: str, stored_hash: str) -> bool:
-    """Accept PBKDF2/Scrypt (werkzeug) and legacy SHA-256 hex."""
-    if not stored_hash:
-        return False
-    if stored_hash.startswith(("pbkdf2:", "scrypt:")):
-        return check_password_hash(stored_hash, input_password)
-    sh = stored_hash.strip().lower()
-    if len(sh) == 64 and all(c in "0123456789abcdef" for c in sh):
-        import hashlib
-        return hashlib.sha256(input_password.encode()).hexdigest() == sh
-    return False
-
 def is_user_verified(conn, user_id: int) -> bool:
-    cur = conn.cursor()
-    cur.execute("SELECT is_verified FROM users WHERE id=%s", (user_id,))
+    cur = execute_prepared(conn, "user_is_verified", (user_id,))
     row = cur.fetchone()
     cur.close()
     return bool(row and row[0])
@@ -50,9 +79,35 @@ def create_notification(conn, user_id: int, title: str, body: str):
         "INSERT INTO notifications (user_id, title, body) VALUES (%s,%s,%s)",
         (user_id, title, body)
     )
+    publish(conn, "notification", user_id=user_id)
     conn.commit()
     cur.close()
 
+def create_notifications(conn, user_ids, title: str, body: str):
+    """Same notification for many users: one INSERT, one event; caller commits."""
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO notifications (user_id, title, body)
+        SELECT uid, %s, %s FROM unnest(%s::int[]) AS uid
+    """, (title, body, list(user_ids)))
+    publish_ids(conn, "notification", user_ids)
+    cur.close()
+
+def set_driver_online(conn, driver_id: int, online: bool):
+    """Flip users.is_online; publishes driver_status only when it actually changed."""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE users u
+        SET is_online=%s,
+            last_online_at=CASE WHEN %s THEN NOW() ELSE u.last_online_at END
+        FROM (SELECT is_online FROM users WHERE id=%s) prev
+        WHERE u.id=%s
+        RETURNING prev.is_online
+    """, (online, online, driver_id, driver_id))
+    row = cur.fetchone(); cur.close()
+    if row and bool(row[0]) != online:
+        publish(conn, "driver_status", user_id=driver_id, is_online=online)
+
 def distance_km(lat1, lon1, lat2, lon2):
     try:
         if None in (lat1, lon1, lat2, lon2): return None
@@ -64,21 +119,60 @@ def distance_km(lat1, lon1, lat2, lon2):
     except Exception:
         return None
 
+@app.before_request
+def route_reads():
+    """Read-your-writes: pin reads to the primary shortly after this session wrote."""
+    consume_write_flag()
+    if request.endpoint == "static" or not session_has_data(session):
+        return   # don't load the session just to learn there is no pin
+    pin_primary(session.get("db_primary_until", 0) > time.time())
+
+@app.after_request
+def remember_writes(resp):
+    if consume_write_flag() and "user_id" in session:
+        session["db_primary_until"] = time.time() + STICKY_SECONDS
+    return resp
+
+@app.teardown_request
+def unpin_reads(exc):
+    pin_primary(False)
+
+# driver id -> (is_online, is_verified, cached_at). Only used while the event
+# listener is connected, since driver_status/user_verified events keep it fresh.
+_driver_flags = {}
+DRIVER_FLAGS_TTL = 60
+
+@subscribe("driver_status")
+@subscribe("user_verified")
+def _forget_driver_flags(payload):
+    for uid in payload.get("user_ids") or [payload.get("user_id")]:
+        _driver_flags.pop(uid, None)
+
 @app.before_request
 def refresh_identity_flags():
     """Cache driver verified/online flags into session for quick UI checks."""
+    if request.endpoint == "static" or not session_has_data(session):
+        return
     uid = session.get("user_id"); role = session.get("role")
     if not uid or role != "driver":
         session.pop("driver_is_online", None)
         session.pop("driver_is_verified", None)
         return
     try:
-        conn = get_db_connection(); cur = conn.cursor()
-        cur.execute("SELECT is_online, is_verified FROM users WHERE id=%s", (uid,))
-        row = cur.fetchone()
-        cur.close(); conn.close()
-        session["driver_is_online"] = bool(row[0]) if row else False
-        session["driver_is_verified"] = bool(row[1]) if row else False
+        cached = _driver_flags.get(uid) if events_listening() else None
+        if cached and time.time() - cached[2] < DRIVER_FLAGS_TTL:
+            online, verified = cached[0], cached[1]
+        else:
+            conn = get_db_connection(); cur = conn.cursor()
+            cur.execute("SELECT is_online, is_verified FROM users WHERE id=%s", (uid,))
+            row = cur.fetchone()
+            cur.close(); conn.close()
+            online = bool(row[0]) if row else False
+            verified = bool(row[1]) if row else False
+            if events_listening():
+                _driver_flags[uid] = (online, verified, time.time())
+        session["driver_is_online"] = online
+        session["driver_is_verified"] = verified
     except Exception:
         session["driver_is_online"] = False
         session["driver_is_verified"] = False
@@ -102,7 +196,18 @@ def signin():
         cur.execute("SELECT id, password, role, username FROM users WHERE LOWER(email)=LOWER(%s)", (email,))
         row = cur.fetchone()
         cur.close(); conn.close()
-        if row and verify_password(password, row[1]):
+        try:
+            ok, upgraded = check_password(password, row[1]) if row else (False, None)
+        except HashingBusy:
+            flash("Server is busy, please try again in a moment.")
+            return render_template("signin.html"), 503
+        if ok and upgraded:
+            # Legacy SHA-256 hash matched: store the current scheme instead.
+            conn = get_db_connection(); cur = conn.cursor()
+            cur.execute("UPDATE users SET password=%s WHERE id=%s", (upgraded, row[0]))
+            conn.commit(); cur.close(); conn.close()
+        if ok:
+            rotate_session(session)
             session["user_id"] = row[0]
             session["role"] = row[2]
             session["username"] = row[3]
@@ -113,6 +218,7 @@ def signin():
     return render_template("signin.html")
 
 @app.route("/signup", methods=["GET", "POST"])
+@db_route("write")
 def signup():
     if request.method == "POST":
         username = (request.form.get("username") or "").strip()
@@ -121,7 +227,10 @@ def signup():
         role = request.form.get("role") or "user"
         if not (username and email and password and role):
             flash("Fill all fields."); return redirect("/signup")
-        hashed = generate_password_hash(password)
+        try:
+            hashed = hash_password(password)
+        except HashingBusy:
+            flash("Server is busy, please try again in a moment."); return render_template("signup.html"), 503
         conn = get_db_connection(); cur = conn.cursor()
         try:
             cur.execute(
@@ -149,7 +258,26 @@ def logout():
 # ------------------------------
 # Live location pings
 # ------------------------------
+# Cadence the client should follow, by state:
+#   (next_interval s, min_move_m, max_quiet s)
+# The client skips a ping when it moved less than min_move_m, but never stays
+# quiet longer than max_quiet (driver locations go stale after 5 minutes).
+PING_CADENCE = {
+    "trip":    (5, 10, 60),           # on an Accepted trip: tracked live
+    "waiting": (20, 25, 120),         # rider whose booking is still Pending
+    "idle":    (30, 50, 120),         # verified driver, no trip
+    "off":     (120, None, None),     # rider without booking / unverified driver
+}
+# "off" is a slow keep-alive rather than a stop, so a driver verified or a
+# rider booking from elsewhere is picked up by the next ping, not a reload.
+
+def ping_cadence(state: str) -> dict:
+    interval, min_move, max_quiet = PING_CADENCE[state]
+    return {"state": state, "next_interval": interval, "min_move_m": min_move, "max_quiet": max_quiet}
+
 @app.route("/update_user_location", methods=["POST"])
+@admit("normal")
+@rate_limit("ping")
 def update_user_location():
     if "user_id" not in session or session.get("role") != "user":
         return jsonify({"ok": False, "error": "user only"}), 403
@@ -159,17 +287,34 @@ def update_user_location():
     except:
         return jsonify({"ok": False, "error": "invalid coords"}), 400
 
-    conn = get_db_connection(); cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO user_location (user_id, latitude, longitude, updated_at)
-        VALUES (%s,%s,%s,NOW())
-        ON CONFLICT (user_id) DO UPDATE
-          SET latitude=EXCLUDED.latitude, longitude=EXCLUDED.longitude, updated_at=NOW()
-    """, (uid, lat, lon))
-    conn.commit(); cur.close(); conn.close()
-    return jsonify({"ok": True})
+    with pooled_connection() as conn:
+        execute_prepared(conn, "upsert_user_location", (uid, lat, lon)).close()
+        cur = execute_prepared(conn, "user_booking_state", (uid,))
+        row = cur.fetchone(); cur.close()
+        conn.commit()
+    state = {"Accepted": "trip", "Pending": "waiting"}.get(row[0] if row else None, "off")
+    return jsonify({"ok": True, **ping_cadence(state)})
+
+def record_driver_ping(driver_id: int, lat: float, lon: float):
+    """
+    Upsert the driver's location and sync is_online.
+    Returns (made_online, cadence dict for the client).
+    """
+    with pooled_connection() as conn:
+        execute_prepared(conn, "upsert_driver_location",
+                         (driver_id, lat, lon, regions.region_of(lat, lon))).close()
+        # Only verified drivers can be online. If not verified, force offline.
+        made_online = is_user_verified(conn, driver_id)
+        set_driver_online(conn, driver_id, made_online)
+        cur = execute_prepared(conn, "driver_has_trip", (driver_id,))
+        on_trip = cur.fetchone() is not None; cur.close()
+        conn.commit()
+    state = "trip" if on_trip else ("idle" if made_online else "off")
+    return made_online, ping_cadence(state)
 
 @app.route("/update_driver_location", methods=["POST"])
+@admit("normal")
+@rate_limit("ping")
 def update_driver_location():
     if "user_id" not in session or session.get("role") != "driver":
         return jsonify({"ok": False, "error": "driver only"}), 403
@@ -179,27 +324,13 @@ def update_driver_location():
     except:
         return jsonify({"ok": False, "error": "invalid coords"}), 400
 
-    conn = get_db_connection(); cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO driver_location (driver_id, latitude, longitude, updated_at)
-        VALUES (%s,%s,%s,NOW())
-        ON CONFLICT (driver_id) DO UPDATE
-          SET latitude=EXCLUDED.latitude, longitude=EXCLUDED.longitude, updated_at=NOW()
-    """, (did, lat, lon))
-
-    # Only verified drivers can be online. If not verified, force offline.
-    if is_user_verified(conn, did):
-        cur.execute("UPDATE users SET is_online=TRUE, last_online_at=NOW() WHERE id=%s", (did,))
-        made_online = True
-    else:
-        cur.execute("UPDATE users SET is_online=FALSE WHERE id=%s", (did,))
-        made_online = False
-
-    conn.commit(); cur.close(); conn.close()
+    made_online, cadence = record_driver_ping(did, lat, lon)
     session["driver_is_online"] = made_online
-    return jsonify({"ok": True, "online": made_online, "verified": session.get("driver_is_verified", False)})
+    return jsonify({"ok": True, "online": made_online, "verified": session.get("driver_is_verified", False),
+                    **cadence})
 
 @app.route("/driver/set_status", methods=["POST"])
+@db_route("write")
 def driver_set_status():
     if "user_id" not in session or session.get("role") != "driver":
         flash("Sign in as driver."); return redirect("/signin")
@@ -225,11 +356,11 @@ def driver_set_status():
         return redirect(request.headers.get("Referer") or url_for("driver_requests"))
 
     if state == "online":
-        cur.execute("UPDATE users SET is_online=TRUE, last_online_at=NOW() WHERE id=%s", (did,))
+        set_driver_online(conn, did, True)
         session["driver_is_online"] = True
         flash("Status: Online")
     else:
-        cur.execute("UPDATE users SET is_online=FALSE WHERE id=%s", (did,))
+        set_driver_online(conn, did, False)
         session["driver_is_online"] = False
         flash("Status: Offline")
     conn.commit(); cur.close(); conn.close()
@@ -241,6 +372,7 @@ def driver_set_status():
 # Booking flow
 # ------------------------------
 @app.route("/book", methods=["GET", "POST"])
+@admit("critical")
 def book():
     if "user_id" not in session or session.get("role") != "user":
         flash("Sign in as user to book."); return redirect("/signin")
@@ -254,30 +386,64 @@ def book():
         return redirect("/choose_driver")
     return render_template("book.html")
 
-def fetch_driver_cards(conn):
+# Expanding-ring search: rings (km) are tried in order until at least
+# SEARCH_MIN_CANDIDATES drivers turn up; each ring is one bounding-box query
+# capped at SEARCH_MAX_CANDIDATES rows (nearest first).
+SEARCH_RINGS_KM = tuple(float(r) for r in os.environ.get("SEARCH_RINGS_KM", "2,5,10,25,50").split(","))
+SEARCH_MIN_CANDIDATES = int(os.environ.get("SEARCH_MIN_CANDIDATES", "5"))
+SEARCH_MAX_CANDIDATES = int(os.environ.get("SEARCH_MAX_CANDIDATES", "25"))
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) enclosing a circle of radius_km."""
+    from math import radians, cos
+    dlat = radius_km / 111.32
+    dlon = radius_km / (111.32 * max(cos(radians(lat)), 0.01))
+    return (lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+
+def fetch_driver_cards(conn, near=None, radius_km=None, limit=SEARCH_MAX_CANDIDATES):
     """
     Verified + Online + fresh location (<=5m) + not busy (no Accepted booking).
     Offline drivers are automatically excluded here.
+    With near=(lat, lon) and radius_km, only drivers inside the bounding box
+    are considered (idx_driver_location_lat_lon), only the regions the box
+    overlaps are scanned, and the nearest come first; otherwise the most
+    recently seen drivers are returned.
     """
+    from math import radians, cos
+    box_sql, order_sql, params = "", "dl.updated_at DESC", []
+    if near is not None:
+        lat, lon = near
+        if radius_km is not None:
+            box = bounding_box(lat, lon, radius_km)
+            box_sql = "AND dl.region = ANY(%s) AND dl.latitude BETWEEN %s AND %s AND dl.longitude BETWEEN %s AND %s"
+            params += [regions.regions_in_box(*box), *box]
+        order_sql = "(dl.latitude - %s)^2 + ((dl.longitude - %s) * %s)^2"
+        params += [lat, lon, cos(radians(lat))]
+    params.append(limit)
     cur = conn.cursor()
-    cur.execute("""
-        WITH busy AS (
-            SELECT DISTINCT driver_id FROM bookings WHERE status='Accepted'
+    cur.execute(f"""
+        WITH cand AS (
+            SELECT u.id, u.username, dl.latitude, dl.longitude
+            FROM driver_location dl
+            JOIN users u ON u.id = dl.driver_id
+            WHERE u.role='driver'
+              AND u.is_verified=TRUE
+              AND u.is_online=TRUE
+              AND dl.updated_at > NOW() - INTERVAL '5 minutes'
+              {box_sql}
+              AND NOT EXISTS (SELECT 1 FROM bookings b
+                              WHERE b.driver_id = u.id AND b.status='Accepted')
+            ORDER BY {order_sql}
+            LIMIT %s
         )
-        SELECT u.id, u.username,
+        SELECT c.id, c.username,
                COALESCE(AVG(dr.stars), 0) AS avg_rating,
                COUNT(dr.id) AS rating_count,
-               dl.latitude, dl.longitude
-        FROM users u
-        LEFT JOIN driver_ratings dr ON dr.driver_id = u.id
-        JOIN driver_location dl ON dl.driver_id = u.id
-        WHERE u.role='driver'
-          AND u.is_verified=TRUE
-          AND u.is_online=TRUE
-          AND dl.updated_at > NOW() - INTERVAL '5 minutes'
-          AND u.id NOT IN (SELECT driver_id FROM busy)
-        GROUP BY u.id, u.username, dl.latitude, dl.longitude
-    """)
+               c.latitude, c.longitude
+        FROM cand c
+        LEFT JOIN driver_ratings dr ON dr.driver_id = c.id
+        GROUP BY c.id, c.username, c.latitude, c.longitude
+    """, params)
     rows = cur.fetchall(); cur.close()
     drivers = []
     for (driver_id, name, avg_rating, count, lat, lon) in rows:
@@ -291,7 +457,49 @@ def fetch_driver_cards(conn):
         })
     return drivers
 
+def find_nearby_drivers(conn, lat, lon):
+    """
+    Widen the search ring by ring; stop at the first ring holding
+    SEARCH_MIN_CANDIDATES drivers. Returns (drivers, radius_km searched).
+    """
+    drivers, radius = [], SEARCH_RINGS_KM[-1]
+    for radius in SEARCH_RINGS_KM:
+        drivers = fetch_driver_cards(conn, near=(lat, lon), radius_km=radius)
+        if len(drivers) >= SEARCH_MIN_CANDIDATES:
+            break
+    return drivers, radius
+
+def rank_drivers(conn, near=None):
+    """
+    Available drivers for a pickup at near=(lat, lon), best first.
+    score = 0.7 rating + 0.3 (1 - distance_norm); distance is normalized to
+    the ring the candidates came from.
+    """
+    if near:
+        all_drivers, radius_km = find_nearby_drivers(conn, *near)
+    else:
+        all_drivers, radius_km = fetch_driver_cards(conn), 10.0
+    drivers_scored = []
+    for d in all_drivers:
+        dist = None
+        if near and d["lat"] is not None and d["lon"] is not None:
+            dist = distance_km(near[0], near[1], float(d["lat"]), float(d["lon"]))
+        rating = d["avg_rating"] or 0.0
+        r_norm = max(0.0, min(1.0, rating/5.0))
+        d_norm = 1.0 if dist is None else max(0.0, min(1.0, dist/radius_km))
+        score  = 0.7*r_norm + 0.3*(1.0 - d_norm)
+        drivers_scored.append({
+            "driver_id": d["driver_id"], "name": d["name"],
+            "avg_rating": rating, "rating_count": d["rating_count"],
+            "is_verified": d["is_verified"],
+            "dist_km": None if dist is None else round(dist, 2),
+            "score": score
+        })
+    drivers_scored.sort(key=lambda x: x["score"], reverse=True)
+    return drivers_scored
+
 @app.route("/choose_driver")
+@admit("critical")
 def choose_driver():
     if "user_id" not in session or session.get("role") != "user":
         flash("Sign in as user to book."); return redirect("/signin")
@@ -302,7 +510,11 @@ def choose_driver():
     user_lat = session.get("book_lat"); user_lon = session.get("book_lon")
 
     conn = get_db_connection()
-    all_drivers = fetch_driver_cards(conn)
+    try:
+        near = (float(user_lat), float(user_lon)) if user_lat and user_lon else None
+    except ValueError:
+        near = None
+    drivers_scored = rank_drivers(conn, near)
 
     # Recent reviews
     cur = conn.cursor()
@@ -318,67 +530,205 @@ def choose_driver():
     for (did, rater, stars, comment) in rev_rows:
         reviews.setdefault(did, []).append({"rater": rater, "stars": stars, "comment": comment})
 
-    # score = 0.7 rating + 0.3 (1 - distance_norm)
-    drivers_scored = []
-    for d in all_drivers:
-        dist = None
-        if user_lat and user_lon and d["lat"] is not None and d["lon"] is not None:
-            dist = distance_km(float(user_lat), float(user_lon), float(d["lat"]), float(d["lon"]))
-        rating = d["avg_rating"] or 0.0
-        r_norm = max(0.0, min(1.0, rating/5.0))
-        d_norm = 1.0 if dist is None else max(0.0, min(1.0, dist/10.0))
-        score  = 0.7*r_norm + 0.3*(1.0 - d_norm)
-        drivers_scored.append({
-            "driver_id": d["driver_id"], "name": d["name"],
-            "avg_rating": rating, "rating_count": d["rating_count"],
-            "is_verified": d["is_verified"],
-            "dist_km": None if dist is None else round(dist, 2),
-            "score": score
-        })
-    drivers_scored.sort(key=lambda x: x["score"], reverse=True)
-
     return render_template("choose_driver.html",
                            drivers=drivers_scored, reviews=reviews,
                            patient=patient, phone=phone, dest=dest, pick=pick,
                            user_lat=user_lat, user_lon=user_lon)
 
+def create_booking(conn, user_id, driver_id, priority="Normal"):
+    """Insert a Pending booking from the request form and count its pickup; returns its id."""
+    patient = request.form.get("patient_name") or ""
+    phone   = request.form.get("phone_no") or ""
+    dest    = request.form.get("destination") or ""
+    pick    = request.form.get("pickup_location") or ""
+    user_lat = request.form.get("user_lat"); user_lon = request.form.get("user_lon")
+    pickup_combined = pick or (f"GPS({user_lat},{user_lon})" if user_lat and user_lon else "")
+    try:
+        gps = (float(user_lat), float(user_lon))
+    except (TypeError, ValueError):
+        gps = None   # no GPS pickup: no region, nothing to count
+    region = regions.region_of(*gps) if gps else None
+
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO bookings (user_id, driver_id, patient_name, phone_no, pickup_location, destination,
+                              status, priority, region)
+        VALUES (%s,%s,%s,%s,%s,%s,'Pending',%s,%s)
+        RETURNING id
+    """, (user_id, driver_id, patient, phone, pickup_combined, dest, priority, region))
+    booking_id = cur.fetchone()[0]; cur.close()
+    if gps:
+        heatmap.record_pickup(conn, *gps)
+    publish(conn, "booking", booking_id=booking_id, status="Pending",
+            user_id=user_id, driver_id=driver_id)
+    return booking_id
+
+def _forget_booking_form():
+    for k in ["book_patient","book_phone","book_dest","book_pick","book_lat","book_lon"]:
+        session.pop(k, None)
+
 @app.route("/request_driver", methods=["POST"])
+@admit("critical")
+@db_route("write")
 def request_driver():
     if "user_id" not in session or session.get("role") != "user":
         flash("Sign in as user."); return redirect("/signin")
 
     user_id = session["user_id"]
     driver_id = int(request.form.get("driver_id"))
-    patient = request.form.get("patient_name") or ""
-    phone   = request.form.get("phone_no") or ""
-    dest    = request.form.get("destination") or ""
-    pick    = request.form.get("pickup_location") or ""
-    user_lat = request.form.get("user_lat"); user_lon = request.form.get("user_lon")
-    pickup_combined = pick or (f"GPS({user_lat},{user_lon})" if user_lat and user_lon else "")
 
     conn = get_db_connection()
     if not is_user_verified(conn, driver_id):
         conn.close(); flash("Selected driver is not verified yet. Choose another driver.")
         return redirect("/choose_driver")
 
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO bookings (user_id, driver_id, patient_name, phone_no, pickup_location, destination, status, priority)
-        VALUES (%s,%s,%s,%s,%s,%s,'Pending','Normal')
-        RETURNING id
-    """, (user_id, driver_id, patient, phone, pickup_combined, dest))
-    booking_id = cur.fetchone()[0]
+    booking_id = create_booking(conn, user_id, driver_id)
+    offers.open_offer(conn, booking_id, driver_id)
 
     create_notification(conn, driver_id, "New Booking Request",
                         f"Booking #{booking_id}. Please accept or reject.")
-    conn.commit(); cur.close(); conn.close()
-
-    for k in ["book_patient","book_phone","book_dest","book_pick","book_lat","book_lon"]:
-        session.pop(k, None)
+    conn.commit(); conn.close()
+    _forget_booking_form()
 
     flash(f"Request sent. Booking #{booking_id} is Pending.")
     return redirect("/mybookings")
 
+@app.route("/request_emergency", methods=["POST"])
+@admit("critical")
+@db_route("write")
+def request_emergency():
+    """Emergency booking: offered to the nearest drivers at once, first to accept takes it."""
+    if "user_id" not in session or session.get("role") != "user":
+        flash("Sign in as user."); return redirect("/signin")
+
+    user_id = session["user_id"]
+    conn = get_db_connection()
+    try:
+        near = (float(request.form.get("user_lat")), float(request.form.get("user_lon")))
+    except (TypeError, ValueError):
+        near = pickup_point(conn, user_id, None)
+    booking_id = create_booking(conn, user_id, None, priority="Emergency")
+    reached = broadcast_offer(conn, booking_id, user_id, near)
+    conn.commit(); conn.close()
+    _forget_booking_form()
+
+    if reached:
+        flash(f"Emergency booking #{booking_id} sent to {len(reached)} nearby driver(s).")
+    else:
+        flash(f"No driver is available for emergency booking #{booking_id} right now. Please call emergency services.")
+    return redirect("/mybookings")
+
+
+# ------------------------------
+# Cascading offers (see offers.py)
+# ------------------------------
+def pickup_point(conn, user_id, pickup_location):
+    """(lat, lon) of a booking's pickup: its GPS(...) text, else the rider's last ping."""
+    text = pickup_location or ""
+    if text.startswith("GPS(") and text.endswith(")"):
+        try:
+            lat, lon = (float(v) for v in text[4:-1].split(","))
+            return lat, lon
+        except ValueError:
+            pass
+    cur = conn.cursor()
+    cur.execute("SELECT latitude, longitude FROM user_location WHERE user_id=%s", (user_id,))
+    row = cur.fetchone(); cur.close()
+    return (row[0], row[1]) if row and row[0] is not None else None
+
+def cascade_offer(conn, booking_id, from_driver, outcome):
+    """
+    Close from_driver's offer on booking_id as outcome ('rejected'/'expired')
+    and re-offer the booking to the best-ranked driver who hasn't had it yet.
+    No-op unless the booking is still Pending with from_driver (an expiry also
+    needs the offer to still be open). Runs in the caller's transaction.
+    Returns the new driver id, or None when nobody is left.
+    """
+    row = offers.lock_booking(conn, booking_id)
+    if not row or row[2] != "Pending":
+        return None
+    user_id, holder, _, pickup = row
+    if holder is None:
+        # broadcast: the next round goes out once every offer of this one is closed
+        if not offers.close_offer(conn, booking_id, from_driver, outcome) \
+                or offers.has_open_offers(conn, booking_id):
+            return None
+        reached = broadcast_offer(conn, booking_id, user_id, pickup_point(conn, user_id, pickup))
+        return reached[0] if reached else None
+    if holder != from_driver:
+        return None
+    if not offers.close_offer(conn, booking_id, from_driver, outcome) and outcome == "expired":
+        return None
+    tried = offers.offered_drivers(conn, booking_id) | {from_driver}
+    nxt = None
+    if len(tried) < offers.OFFER_MAX_ATTEMPTS:
+        ranked = rank_drivers(conn, pickup_point(conn, user_id, pickup))
+        nxt = next((d for d in ranked if d["driver_id"] not in tried), None)
+    if not nxt:
+        unassign_booking(conn, booking_id, user_id,
+                         f"No driver accepted booking #{booking_id}. Please book again with another driver.")
+        return None
+    cur = conn.cursor()
+    cur.execute("UPDATE bookings SET driver_id=%s WHERE id=%s", (nxt["driver_id"], booking_id))
+    cur.close()
+    publish(conn, "booking", booking_id=booking_id, status="Pending",
+            user_id=user_id, driver_id=nxt["driver_id"], previous_driver_id=from_driver)
+    offers.open_offer(conn, booking_id, nxt["driver_id"])
+    create_notifications(conn, [nxt["driver_id"]], "New Booking Request",
+                         f"Booking #{booking_id}. Please accept or reject.")
+    create_notifications(conn, [user_id], "Finding another driver",
+                         f"Booking #{booking_id} was passed on to {nxt['name']}.")
+    return nxt["driver_id"]
+
+def broadcast_offer(conn, booking_id, user_id, near):
+    """
+    Offer booking_id to the EMERGENCY_FANOUT nearest drivers not yet asked
+    (capped at EMERGENCY_MAX_DRIVERS per booking). Returns the drivers reached;
+    if none, the booking is closed as Unassigned. Runs in the caller's transaction.
+    """
+    tried = offers.offered_drivers(conn, booking_id)
+    room = min(offers.EMERGENCY_FANOUT, offers.EMERGENCY_MAX_DRIVERS - len(tried))
+    reached = []
+    if near and room > 0:
+        nearby, _ = find_nearby_drivers(conn, *near)
+        nearby.sort(key=lambda d: distance_km(near[0], near[1], float(d["lat"]), float(d["lon"])))
+        reached = [d["driver_id"] for d in nearby if d["driver_id"] not in tried][:room]
+    for driver_id in reached:
+        offers.open_offer(conn, booking_id, driver_id, timeout=offers.EMERGENCY_TIMEOUT)
+    if reached:
+        create_notifications(conn, reached, "Emergency request",
+                             f"Emergency booking #{booking_id} nearby. First to accept takes it.")
+        publish(conn, "booking", booking_id=booking_id, status="Pending",
+                user_id=user_id, driver_ids=reached)
+    else:
+        unassign_booking(conn, booking_id, user_id,
+                         f"No driver accepted emergency booking #{booking_id}. Please call emergency services.")
+    return reached
+
+def unassign_booking(conn, booking_id, user_id, message):
+    """
+    Close a Pending booking nobody took: status Unassigned, no driver. The
+    rider sees it in My Bookings with a link to book again. Runs in the
+    caller's transaction.
+    """
+    cur = conn.cursor()
+    cur.execute("UPDATE bookings SET status='Unassigned', driver_id=NULL WHERE id=%s AND status='Pending'",
+                (booking_id,))
+    closed = cur.rowcount
+    cur.close()
+    if closed:
+        publish(conn, "booking", booking_id=booking_id, status="Unassigned", user_id=user_id, driver_id=None)
+        create_notifications(conn, [user_id], "No driver available", message)
+
+@jobs.task("offer_expire", max_attempts=3)
+def expire_offer(offer_id):
+    """Deadline of one offer: if nobody answered, move the booking on."""
+    conn = get_db_connection()
+    offer = offers.get_offer(conn, offer_id)
+    if offer and offer[2] == "open":
+        cascade_offer(conn, offer[0], offer[1], "expired")
+    conn.commit(); conn.close()
+
 
 # ------------------------------
 # Driver Requests (integrated workboard) & Trips (history)
@@ -388,6 +738,34 @@ def driver_workboard():
     """Legacy link: redirect to unified requests page."""
     return redirect("/driver/requests")
 
+def fetch_driver_board(conn, driver_id):
+    """
+    Active (Accepted) and Pending bookings of a driver in one statement,
+    including Emergency broadcasts they hold an open offer on.
+    Active rows carry the rider's username, pending rows the patient name:
+      (id, name, phone_no, pickup_location, destination, booking_time, status, priority)
+    """
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT b.id, b.status, u.username, b.patient_name,
+               b.phone_no, b.pickup_location, b.destination, b.booking_time, b.priority
+        FROM bookings b
+        LEFT JOIN users u ON u.id = b.user_id
+        WHERE (b.status='Accepted' OR (b.status='Pending' AND b.{LIVE_BOOKINGS}))
+          AND (b.driver_id=%s
+               OR (b.driver_id IS NULL AND b.id IN (SELECT booking_id FROM booking_offers
+                                                     WHERE driver_id=%s AND status='open')))
+        ORDER BY b.priority = 'Emergency' DESC, b.booking_time DESC
+    """, (driver_id, driver_id))
+    rows = cur.fetchall(); cur.close()
+    active, pending = [], []
+    for (bid, status, user_name, patient, phone, pick, dest, ts, priority) in rows:
+        if status == "Accepted":
+            active.append((bid, user_name, phone, pick, dest, ts, status, priority))
+        else:
+            pending.append((bid, patient, phone, pick, dest, ts, status, priority))
+    return active, pending
+
 @app.route("/driver/requests")
 def driver_requests():
     """
@@ -399,25 +777,9 @@ def driver_requests():
         flash("Sign in as driver."); return redirect("/signin")
     did = session["user_id"]
 
-    conn = get_db_connection(); cur = conn.cursor()
-    # Active (Accepted)
-    cur.execute("""
-        SELECT id, (SELECT username FROM users WHERE id=user_id) AS user_name,
-               phone_no, pickup_location, destination, booking_time, status
-        FROM bookings
-        WHERE driver_id=%s AND status='Accepted'
-        ORDER BY booking_time DESC
-    """, (did,))
-    active_rows = cur.fetchall()
-    # Pending
-    cur.execute("""
-        SELECT id, patient_name, phone_no, pickup_location, destination, booking_time, status
-        FROM bookings
-        WHERE driver_id=%s AND status='Pending'
-        ORDER BY booking_time DESC
-    """, (did,))
-    pending_rows = cur.fetchall()
-    cur.close(); conn.close()
+    conn = get_db_connection()
+    active_rows, pending_rows = fetch_driver_board(conn, did)
+    conn.close()
 
     can_accept = session.get("driver_is_verified", False)
     return render_template("driver_requests.html",
@@ -426,21 +788,24 @@ def driver_requests():
                            can_accept=can_accept)
 
 @app.route("/driver/trips")
+@admit("low")
+@db_route("read")
 def driver_trips():
     """History only: COMPLETED trips with rider details."""
     if "user_id" not in session or session.get("role") != "driver":
         flash("Sign in as driver."); return redirect("/signin")
     driver_id = session["user_id"]
-    conn = get_db_connection(); cur = conn.cursor()
+    conn = get_read_connection(); cur = conn.cursor()
     cur.execute("""
         SELECT b.id,
-               (SELECT username FROM users WHERE id=b.user_id) AS user_name,
+               u.username AS user_name,
                b.phone_no,
                b.pickup_location,
                b.destination,
                b.status,
                b.booking_time
         FROM bookings b
+        LEFT JOIN users u ON u.id = b.user_id
         WHERE b.driver_id=%s AND b.status='Completed'
         ORDER BY b.booking_time DESC
     """, (driver_id,))
@@ -448,6 +813,8 @@ def driver_trips():
     return render_template("driver_trips.html", rows=rows)
 
 @app.post("/driver/accept/<int:booking_id>")
+@admit("critical")
+@db_route("write")
 def driver_accept(booking_id):
     if "user_id" not in session or session.get("role") != "driver":
         flash("Sign in as driver."); return redirect("/signin")
@@ -456,31 +823,37 @@ def driver_accept(booking_id):
     if not is_user_verified(conn, driver_id):
         conn.close(); flash("Not verified yet. Complete KYC.")
         return redirect("/driver/requests")
-    cur = conn.cursor()
-    cur.execute("UPDATE bookings SET status='Accepted' WHERE id=%s AND driver_id=%s AND status='Pending'",
-                (booking_id, driver_id))
-    cur.execute("SELECT user_id FROM bookings WHERE id=%s", (booking_id,))
-    row = cur.fetchone()
-    if row:
-        create_notification(conn, row[0], "Booking Accepted", f"Your booking #{booking_id} was accepted.")
-    conn.commit(); cur.close(); conn.close()
+    claimed = offers.claim(conn, booking_id, driver_id)
+    if claimed is None:
+        conn.rollback(); conn.close()
+        flash("This request is no longer available.")
+        return redirect("/driver/requests")
+    user_id, withdrawn = claimed
+    publish(conn, "booking", booking_id=booking_id, status="Accepted",
+            user_id=user_id, driver_id=driver_id, withdrawn=withdrawn)
+    if withdrawn:
+        create_notifications(conn, withdrawn, "Request taken",
+                             f"Booking #{booking_id} was accepted by another driver.")
+    create_notification(conn, user_id, "Booking Accepted", f"Your booking #{booking_id} was accepted.")
+    conn.commit(); conn.close()
     flash("Accepted.")
     return redirect("/driver/requests")
 
 @app.post("/driver/reject/<int:booking_id>")
+@admit("critical")
+@db_route("write")
 def driver_reject(booking_id):
     if "user_id" not in session or session.get("role") != "driver":
         flash("Sign in as driver."); return redirect("/signin")
-    conn = get_db_connection(); cur = conn.cursor()
-    cur.execute("SELECT user_id FROM bookings WHERE id=%s", (booking_id,))
-    row = cur.fetchone()
-    if row:
-        create_notification(conn, row[0], "Booking Rejected", f"Driver rejected booking #{booking_id}.")
-    conn.commit(); cur.close(); conn.close()
+    conn = get_db_connection()
+    cascade_offer(conn, booking_id, session["user_id"], "rejected")
+    conn.commit(); conn.close()
     flash("Rejected.")
     return redirect("/driver/requests")
 
 @app.post("/driver/complete/<int:booking_id>")
+@admit("critical")
+@db_route("write")
 def driver_complete(booking_id):
     if "user_id" not in session or session.get("role") != "driver":
         flash("Sign in as driver."); return redirect("/signin")
@@ -492,8 +865,12 @@ def driver_complete(booking_id):
     cur = conn.cursor()
     cur.execute("UPDATE bookings SET status='Completed' WHERE id=%s AND driver_id=%s AND status='Accepted'",
                 (booking_id, driver_id))
+    completed = cur.rowcount == 1
     cur.execute("SELECT user_id FROM bookings WHERE id=%s", (booking_id,))
     row = cur.fetchone()
+    if row and completed:
+        publish(conn, "booking", booking_id=booking_id, status="Completed",
+                user_id=row[0], driver_id=driver_id)
     if row:
         create_notification(conn, row[0], "Trip Completed", f"Booking #{booking_id} completed. Please rate your driver.")
     conn.commit(); cur.close(); conn.close()
@@ -505,16 +882,17 @@ def driver_complete(booking_id):
 # User bookings + rating (one per booking)
 # ------------------------------
 @app.route("/mybookings")
+@db_route("read")
 def my_bookings():
     if "user_id" not in session or session.get("role") != "user":
         flash("Sign in as user."); return redirect("/signin")
     uid = session["user_id"]
-    conn = get_db_connection(); cur = conn.cursor()
+    conn = get_read_connection(); cur = conn.cursor()
     cur.execute("""
-        SELECT b.id,
-               (SELECT username FROM users WHERE id=b.driver_id) as driver_name,
+        SELECT b.id, d.username AS driver_name,
                b.destination, b.status, b.booking_time
         FROM bookings b
+        LEFT JOIN users d ON d.id = b.driver_id
         WHERE b.user_id=%s
         ORDER BY b.booking_time DESC
     """, (uid,))
@@ -522,6 +900,7 @@ def my_bookings():
     return render_template("my_bookings.html", rows=rows)
 
 @app.route("/rate_driver/<int:booking_id>", methods=["GET", "POST"])
+@db_route("write")
 def rate_driver(booking_id):
     if "user_id" not in session or session.get("role") != "user":
         flash("Sign in as user."); return redirect("/signin")
@@ -554,16 +933,18 @@ def rate_driver(booking_id):
 # Dashboards (user/driver/admin)
 # ------------------------------
 @app.route("/dashboard/user")
+@admit("low")
+@db_route("read")
 def dashboard_user():
     if "user_id" not in session or session.get("role") != "user":
         flash("Sign in as user."); return redirect("/signin")
     uid = session["user_id"]
-    conn = get_db_connection(); cur = conn.cursor()
+    conn = get_read_connection(); cur = conn.cursor()
     cur.execute("""
-        SELECT b.id,
-               (SELECT username FROM users WHERE id=b.driver_id) as driver_name,
+        SELECT b.id, d.username AS driver_name,
                b.destination, b.status, b.booking_time
         FROM bookings b
+        LEFT JOIN users d ON d.id = b.driver_id
         WHERE b.user_id=%s
         ORDER BY b.booking_time DESC
         LIMIT 10
@@ -581,76 +962,82 @@ def dashboard_user():
     return render_template("dashboard_user.html", trips=trips, notifs=notifs)
 
 @app.route("/dashboard/driver")
+@admit("low")
+@db_route("read")
 def dashboard_driver():
     if "user_id" not in session or session.get("role") != "driver":
         flash("Sign in as driver."); return redirect("/signin")
     did = session["user_id"]
-    conn = get_db_connection(); cur = conn.cursor()
+    conn = get_read_connection(); cur = conn.cursor()
     cur.execute("""
-        SELECT b.id, (SELECT username FROM users WHERE id=b.user_id),
+        SELECT b.id, u.username,
                b.destination, b.status, b.booking_time
         FROM bookings b
+        LEFT JOIN users u ON u.id = b.user_id
         WHERE b.driver_id=%s
         ORDER BY b.booking_time DESC
         LIMIT 10
     """, (did,))
     trips = cur.fetchall()
+    # latest reviews + overall average/count in one pass (window runs before LIMIT)
     cur.execute("""
-        SELECT stars, COALESCE(comment,''), (SELECT username FROM users WHERE id=rater_user_id), created_at
-        FROM driver_ratings
-        WHERE driver_id=%s
-        ORDER BY created_at DESC
+        SELECT dr.stars, COALESCE(dr.comment,''), u.username, dr.created_at,
+               AVG(dr.stars) OVER (), COUNT(*) OVER ()
+        FROM driver_ratings dr
+        LEFT JOIN users u ON u.id = dr.rater_user_id
+        WHERE dr.driver_id=%s
+        ORDER BY dr.created_at DESC
         LIMIT 10
     """, (did,))
-    reviews = cur.fetchall()
-    cur.execute("SELECT COALESCE(AVG(stars),0) FROM driver_ratings WHERE driver_id=%s", (did,))
-    avg_star = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM driver_ratings WHERE driver_id=%s", (did,))
-    total_reviews = cur.fetchone()[0]
+    rows = cur.fetchall()
     cur.close(); conn.close()
+    reviews = [r[:4] for r in rows]
+    avg_star = rows[0][4] if rows else 0
+    total_reviews = rows[0][5] if rows else 0
     return render_template("dashboard_driver.html", trips=trips, reviews=reviews, avg_star=avg_star, total_reviews=total_reviews)
 
 @app.route("/dashboard/admin")
+@admit("low")
+@db_route("read")
 def dashboard_admin():
     if "user_id" not in session or session.get("role") != "admin":
         flash("Admin only."); return redirect("/signin")
-    conn = get_db_connection(); cur = conn.cursor()
+    conn = get_read_connection(); cur = conn.cursor()
     cur.execute("""
-        SELECT b.id,
-               (SELECT username FROM users WHERE id=b.user_id) as user_name,
-               (SELECT username FROM users WHERE id=b.driver_id) as driver_name,
+        SELECT b.id, u.username AS user_name, d.username AS driver_name,
                b.destination, b.status, b.booking_time
         FROM bookings b
+        LEFT JOIN users u ON u.id = b.user_id
+        LEFT JOIN users d ON d.id = b.driver_id
         ORDER BY b.booking_time DESC
         LIMIT 20
     """)
     bookings = cur.fetchall()
-    cur.execute("SELECT id, username, role, is_verified FROM users ORDER BY id ASC LIMIT 100")
-    users = cur.fetchall()
+    # users, top drivers and KYC preview in one round trip (no timestamps, so JSON is lossless)
     cur.execute("""
-        SELECT u.id, u.username, COALESCE(AVG(dr.stars),0) as avg, COUNT(dr.id) as cnt
-        FROM users u
-        JOIN driver_ratings dr ON dr.driver_id = u.id
-        WHERE u.role='driver'
-        GROUP BY u.id, u.username
-        ORDER BY avg DESC, cnt DESC
-        LIMIT 10
-    """)
-    top_drivers = cur.fetchall()
-    # KYC preview
-    cur.execute("""
-        SELECT id, username, role, is_verified, kyc_role,
-               email,
-               citizenship_path, license_doc_path, bluebook_doc_path, ambulance_photo_path
-        FROM users
-        WHERE citizenship_path IS NOT NULL
-           OR license_doc_path IS NOT NULL
-           OR bluebook_doc_path IS NOT NULL
-           OR ambulance_photo_path IS NOT NULL
-        ORDER BY id DESC
-        LIMIT 60
+        SELECT
+          (SELECT COALESCE(json_agg(json_build_array(id, username, role, is_verified) ORDER BY id), '[]')
+           FROM (SELECT id, username, role, is_verified FROM users ORDER BY id ASC LIMIT 100) x),
+          (SELECT COALESCE(json_agg(json_build_array(id, username, avg, cnt) ORDER BY avg DESC, cnt DESC), '[]')
+           FROM (SELECT u.id, u.username, COALESCE(AVG(dr.stars),0) as avg, COUNT(dr.id) as cnt
+                 FROM users u
+                 JOIN driver_ratings dr ON dr.driver_id = u.id
+                 WHERE u.role='driver'
+                 GROUP BY u.id, u.username
+                 ORDER BY avg DESC, cnt DESC
+                 LIMIT 10) x),
+          (SELECT COALESCE(json_agg(json_build_array(id, username, role, is_verified, kyc_role, email,
+                                                     citizenship_path, license_doc_path,
+                                                     bluebook_doc_path, ambulance_photo_path) ORDER BY id DESC), '[]')
+           FROM (SELECT * FROM users
+                 WHERE citizenship_path IS NOT NULL
+                    OR license_doc_path IS NOT NULL
+                    OR bluebook_doc_path IS NOT NULL
+                    OR ambulance_photo_path IS NOT NULL
+                 ORDER BY id DESC
+                 LIMIT 60) x)
     """)
-    kycs = cur.fetchall()
+    users, top_drivers, kycs = cur.fetchone()
     cur.close(); conn.close()
     return render_template("dashboard_admin.html",
                            bookings=bookings, users=users, top_drivers=top_drivers, kycs=kycs)
@@ -670,28 +1057,188 @@ def admin_user_detail(user_id):
         flash("User not found."); return redirect("/dashboard/admin")
     return render_template("admin_user_detail.html", u=u)
 
+@app.get("/admin/api/search")
+@db_route("read")
+def admin_api_search():
+    """Admin: ?q= over users (name, email) and bookings (patient, phone, places)."""
+    if "user_id" not in session or session.get("role") != "admin":
+        return {"error": "forbidden"}, 403
+    q = request.args.get("q", "")
+    scope = request.args.get("scope", "all")
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return {"error": "bad limit"}, 400
+    conn = get_read_connection()
+    out = {"q": q}
+    if scope in ("all", "users"):
+        out["users"] = search.search_users(conn, q, limit)
+    if scope in ("all", "bookings"):
+        out["bookings"] = search.search_bookings(conn, q, limit)
+    conn.close()
+    return out
+
+@app.get("/admin/api/autocomplete")
+@db_route("read")
+def admin_api_autocomplete():
+    """Admin: up to 10 usernames/emails/patient names starting with ?q=."""
+    if "user_id" not in session or session.get("role") != "admin":
+        return {"error": "forbidden"}, 403
+    conn = get_read_connection()
+    out = search.autocomplete(conn, request.args.get("q", ""))
+    conn.close()
+    return {"suggestions": out}
+
+@app.get("/admin/export/<kind>.<fmt>")
+@admit("low")
+@db_route("read")
+def admin_export(kind, fmt):
+    """Admin: stream bookings/ratings as CSV or NDJSON (?from=&to=YYYY-MM-DD, ?status=a,b)."""
+    if "user_id" not in session or session.get("role") != "admin":
+        return {"error": "forbidden"}, 403
+    if kind not in export.EXPORTS or fmt not in export.FORMATS:
+        return {"error": "unknown export"}, 404
+    try:
+        start = date.fromisoformat(request.args["from"]) if request.args.get("from") else None
+        end = date.fromisoformat(request.args["to"]) if request.args.get("to") else None
+    except ValueError:
+        return {"error": "from/to must be YYYY-MM-DD"}, 400
+    statuses = [s for s in (request.args.get("status") or "").split(",") if s]
+    if any(s not in export.STATUSES for s in statuses):
+        return {"error": f"status must be among {', '.join(export.STATUSES)}"}, 400
+    sql, params = export.build_query(kind, start, end, statuses)
+    conn = get_read_connection()
+    filename = f"{kind}-{datetime.now():%Y%m%d-%H%M}.{fmt}"
+    resp = Response(export.stream(conn, kind, fmt, sql, params), mimetype=export.FORMATS[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"',
+                             "X-Accel-Buffering": "no"})
+    resp.call_on_close(conn.close)   # also when the client leaves before the first chunk
+    return resp
+
 @app.post("/admin/verify_user/<int:user_id>")
+@db_route("write")
 def admin_verify_user(user_id):
     if "user_id" not in session or session.get("role") != "admin":
         flash("Admin only."); return redirect("/signin")
     conn = get_db_connection(); cur = conn.cursor()
     cur.execute("UPDATE users SET is_verified=TRUE WHERE id=%s", (user_id,))
+    publish(conn, "user_verified", user_id=user_id, is_verified=True)
     conn.commit(); cur.close(); conn.close()
     flash(f"User #{user_id} verified.")
     return redirect(request.headers.get("Referer") or url_for("dashboard_admin"))
 
 @app.post("/admin/reject_user/<int:user_id>")
+@db_route("write")
 def admin_reject_user(user_id):
     if "user_id" not in session or session.get("role") != "admin":
         flash("Admin only."); return redirect("/signin")
     reason = request.form.get("reason") or "Not approved"
     conn = get_db_connection(); cur = conn.cursor()
     cur.execute("UPDATE users SET is_verified=FALSE, is_online=FALSE WHERE id=%s", (user_id,))
+    publish(conn, "user_verified", user_id=user_id, is_verified=False)
     create_notification(conn, user_id, "KYC Rejected", reason)
     conn.commit(); cur.close(); conn.close()
     flash(f"User #{user_id} rejected.")
     return redirect(request.headers.get("Referer") or url_for("dashboard_admin"))
 
+BULK_MAX = 1000
+
+def _bulk_user_ids():
+    """Ids from JSON {"user_ids": [...]} or repeated form field user_ids; None if invalid."""
+    data = request.get_json(silent=True) or {}
+    raw = data.get("user_ids", request.form.getlist("user_ids"))
+    try:
+        ids = sorted({int(x) for x in raw})
+    except (TypeError, ValueError):
+        return None
+    return ids if 0 < len(ids) <= BULK_MAX else None
+
+def _bulk_done(action, ids):
+    if request.is_json:
+        return jsonify({"ok": True, action: ids})
+    flash(f"{len(ids)} user(s) {action}.")
+    return redirect(request.headers.get("Referer") or url_for("dashboard_admin"))
+
+@app.post("/admin/users/bulk_verify")
+@db_route("write")
+def admin_bulk_verify():
+    """Verify many users in one transaction (set-based UPDATE)."""
+    if "user_id" not in session or session.get("role") != "admin":
+        return {"error": "forbidden"}, 403
+    ids = _bulk_user_ids()
+    if ids is None:
+        return {"error": f"send 1-{BULK_MAX} integer user_ids"}, 400
+    conn = get_db_connection(); cur = conn.cursor()
+    cur.execute("""
+        UPDATE users SET is_verified=TRUE
+        WHERE id = ANY(%s) AND role <> 'admin' AND is_verified=FALSE
+        RETURNING id
+    """, (ids,))
+    done = sorted(r[0] for r in cur.fetchall())
+    if done:
+        publish_ids(conn, "user_verified", done, is_verified=True)
+    conn.commit(); cur.close(); conn.close()
+    return _bulk_done("verified", done)
+
+@app.post("/admin/users/bulk_reject")
+@db_route("write")
+def admin_bulk_reject():
+    """Reject many users in one transaction; one batched notification insert."""
+    if "user_id" not in session or session.get("role") != "admin":
+        return {"error": "forbidden"}, 403
+    ids = _bulk_user_ids()
+    if ids is None:
+        return {"error": f"send 1-{BULK_MAX} integer user_ids"}, 400
+    reason = (request.get_json(silent=True) or {}).get("reason") or request.form.get("reason") or "Not approved"
+    conn = get_db_connection(); cur = conn.cursor()
+    cur.execute("""
+        UPDATE users SET is_verified=FALSE, is_online=FALSE
+        WHERE id = ANY(%s) AND role <> 'admin'
+        RETURNING id
+    """, (ids,))
+    done = sorted(r[0] for r in cur.fetchall())
+    if done:
+        publish_ids(conn, "user_verified", done, is_verified=False)
+        create_notifications(conn, done, "KYC Rejected", reason)
+    conn.commit(); cur.close(); conn.close()
+    return _bulk_done("rejected", done)
+
+@app.get("/admin/api/admission")
+def admin_api_admission():
+    """Admin: per-class admitted/shed/in-flight counters for this worker."""
+    if "user_id" not in session or session.get("role") != "admin":
+        return {"error": "forbidden"}, 403
+    return {"pid": os.getpid(), "classes": admission.snapshot()}
+
+@app.get("/admin/api/ratelimit")
+def admin_api_ratelimit():
+    """Admin: allowed/throttled calls per rate-limited endpoint (this worker)."""
+    if "user_id" not in session or session.get("role") != "admin":
+        return {"error": "forbidden"}, 403
+    return {"pid": os.getpid(), **ratelimit.snapshot()}
+
+@app.get("/admin/api/regions")
+def admin_api_regions():
+    """Admin: available drivers and pending bookings per region."""
+    if "user_id" not in session or session.get("role") != "admin":
+        return {"error": "forbidden"}, 403
+    conn = get_db_connection(); cur = conn.cursor()
+    cur.execute("""
+        SELECT dl.region, COUNT(*) FROM driver_location dl
+        JOIN users u ON u.id = dl.driver_id
+        WHERE u.is_online=TRUE AND u.is_verified=TRUE AND dl.updated_at > NOW() - INTERVAL '5 minutes'
+        GROUP BY dl.region
+    """)
+    drivers = dict(cur.fetchall())
+    cur.execute(f"SELECT region, COUNT(*) FROM bookings WHERE status='Pending' AND {LIVE_BOOKINGS} GROUP BY region")
+    pending = dict(cur.fetchall())
+    cur.close(); conn.close()
+    names = list(regions.REGIONS) + [regions.OTHER]
+    return {"regions": [{"region": r, "box": regions.REGIONS.get(r),
+                         "online_drivers": drivers.get(r, 0), "pending_bookings": pending.get(r, 0)}
+                        for r in names],
+            "pending_unplaced": pending.get(None, 0)}
+
 
 # ------------------------------
 # KYC uploads
@@ -704,6 +1251,7 @@ def _save_upload(field_name):
     f.save(path); return path
 
 @app.route("/kyc", methods=["GET", "POST"])
+@db_route("write")
 def kyc():
     if "user_id" not in session:
         flash("Sign in."); return redirect("/signin")
@@ -731,11 +1279,13 @@ def kyc():
 # Notifications
 # ------------------------------
 @app.route("/notifications")
+@admit("low")
+@db_route("read")
 def notifications():
     if "user_id" not in session:
         flash("Sign in."); return redirect("/signin")
     uid = session["user_id"]
-    conn = get_db_connection(); cur = conn.cursor()
+    conn = get_read_connection(); cur = conn.cursor()
     cur.execute("""
         SELECT id, title, body, is_read, created_at
         FROM notifications
@@ -747,15 +1297,17 @@ def notifications():
     return render_template("notifications.html", notes=notes)
 
 @app.get("/api/notifications/unread_count")
+@admit("low")
 def api_unread_count():
     if "user_id" not in session: return {"count": 0}
     uid = session["user_id"]
-    conn = get_db_connection(); cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM notifications WHERE user_id=%s AND is_read=FALSE", (uid,))
-    count = cur.fetchone()[0]; cur.close(); conn.close()
+    with pooled_connection() as conn:
+        cur = execute_prepared(conn, "unread_count", (uid,))
+        count = cur.fetchone()[0]; cur.close()
     return {"count": int(count)}
 
 @app.post("/api/notifications/mark_read")
+@db_route("write")
 def api_mark_read():
     if "user_id" not in session: return {"ok": False}, 403
     uid = session["user_id"]
@@ -811,6 +1363,8 @@ def track_booking(booking_id):
     return render_template("track.html", booking_id=booking_id)
 
 @app.route("/api/booking_positions/<int:booking_id>")
+@admit("normal")
+@rate_limit("poll")
 def api_booking_positions(booking_id):
     if "user_id" not in session:
         return {"error": "auth required"}, 403
@@ -846,18 +1400,19 @@ def api_booking_positions(booking_id):
 # --- LIVE UPDATE HOOKS ---
 
 @app.get("/api/driver/pending_count")
+@admit("low")
 def api_driver_pending_count():
     """Driver: how many pending requests assigned to me? Used to detect new bookings live."""
     if "user_id" not in session or session.get("role") != "driver":
         return {"count": 0}, 200
     did = session["user_id"]
-    conn = get_db_connection(); cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM bookings WHERE driver_id=%s AND status='Pending'", (did,))
-    cnt = cur.fetchone()[0]
-    cur.close(); conn.close()
+    with pooled_connection() as conn:
+        cur = execute_prepared(conn, "pending_count", (did,))
+        cnt = cur.fetchone()[0]; cur.close()
     return {"count": int(cnt)}
 
 @app.get("/api/user/suggestions_count")
+@admit("low")
 def api_user_suggestions_count():
     """User: how many drivers currently available within recent ping window? (rough signal to refresh list)"""
     if "user_id" not in session or session.get("role") != "user":
@@ -866,9 +1421,6 @@ def api_user_suggestions_count():
     conn = get_db_connection()
     cur = conn.cursor()
     cur.execute("""
-        WITH busy AS (
-            SELECT DISTINCT driver_id FROM bookings WHERE status='Accepted'
-        )
         SELECT COUNT(*)
         FROM users u
         JOIN driver_location dl ON dl.driver_id = u.id
@@ -876,12 +1428,35 @@ def api_user_suggestions_count():
           AND u.is_verified=TRUE
           AND u.is_online=TRUE
           AND dl.updated_at > NOW() - INTERVAL '5 minutes'
-          AND u.id NOT IN (SELECT driver_id FROM busy)
+          AND NOT EXISTS (SELECT 1 FROM bookings b
+                          WHERE b.driver_id = u.id AND b.status='Accepted')
     """)
     cnt = cur.fetchone()[0]
     cur.close(); conn.close()
     return {"count": int(cnt)}
 
+@app.get("/api/heatmap")
+@admit("low")
+@db_route("read")
+def api_heatmap():
+    """Admin/driver: pickup demand per geohash cell over the last ?hours= (default 24)."""
+    if "user_id" not in session or session.get("role") not in ("admin", "driver"):
+        return {"error": "forbidden"}, 403
+    try:
+        hours = int(request.args.get("hours", 24))
+        bbox = request.args.get("bbox")
+        bbox = tuple(float(v) for v in bbox.split(",")) if bbox else None
+        if bbox is not None and len(bbox) != 4:
+            raise ValueError
+    except ValueError:
+        return {"error": "bad hours/bbox"}, 400
+    conn = get_read_connection()
+    cells = heatmap.cells(conn, hours, bbox)
+    conn.close()
+    resp = jsonify({"hours": hours, "precision": heatmap.PRECISION, "cells": cells})
+    resp.headers["Cache-Control"] = "private, max-age=60"
+    return resp
+
 # ------------------------------
 # Driver API (compatibility endpoints)
 # ------------------------------
@@ -908,6 +1483,7 @@ def driver_api_profile():
     })
 
 @app.get("/driver/api/assigned")
+@admit("low")
 def driver_api_assigned():
     """Compatibility: list bookings assigned to the current driver.
     Returns separate arrays for active (Accepted) and pending (Pending).
@@ -915,31 +1491,9 @@ def driver_api_assigned():
     if "user_id" not in session or session.get("role") != "driver":
         return jsonify({"ok": False, "error": "driver only"}), 403
     did = session["user_id"]
-    conn = get_db_connection(); cur = conn.cursor()
-    # Active (Accepted)
-    cur.execute(
-        """
-        SELECT id, (SELECT username FROM users WHERE id=user_id) AS user_name,
-               phone_no, pickup_location, destination, booking_time, status
-        FROM bookings
-        WHERE driver_id=%s AND status='Accepted'
-        ORDER BY booking_time DESC
-        """,
-        (did,)
-    )
-    active_rows = cur.fetchall()
-    # Pending
-    cur.execute(
-        """
-        SELECT id, patient_name, phone_no, pickup_location, destination, booking_time, status
-        FROM bookings
-        WHERE driver_id=%s AND status='Pending'
-        ORDER BY booking_time DESC
-        """,
-        (did,)
-    )
-    pending_rows = cur.fetchall()
-    cur.close(); conn.close()
+    conn = get_db_connection()
+    active_rows, pending_rows = fetch_driver_board(conn, did)
+    conn.close()
 
     def row_to_dict(r):
         return {
@@ -959,6 +1513,8 @@ def driver_api_assigned():
     })
 
 @app.post("/driver/api/location")
+@admit("normal")
+@rate_limit("ping")
 def driver_api_location():
     """Compatibility: update driver location (same as /update_driver_location).
     Accepts form or JSON body with lat, lon.
@@ -975,28 +1531,116 @@ def driver_api_location():
     except Exception:
         return jsonify({"ok": False, "error": "invalid coords"}), 400
 
-    conn = get_db_connection(); cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO driver_location (driver_id, latitude, longitude, updated_at)
-        VALUES (%s,%s,%s,NOW())
-        ON CONFLICT (driver_id) DO UPDATE
-          SET latitude=EXCLUDED.latitude, longitude=EXCLUDED.longitude, updated_at=NOW()
-        """,
-        (did, lat, lon),
-    )
-
-    if is_user_verified(conn, did):
-        cur.execute("UPDATE users SET is_online=TRUE, last_online_at=NOW() WHERE id=%s", (did,))
-        made_online = True
-    else:
-        cur.execute("UPDATE users SET is_online=FALSE WHERE id=%s", (did,))
-        made_online = False
-
-    conn.commit(); cur.close(); conn.close()
+    made_online, cadence = record_driver_ping(did, lat, lon)
     session["driver_is_online"] = made_online
-    return jsonify({"ok": True, "online": made_online, "verified": session.get("driver_is_verified", False)})
+    return jsonify({"ok": True, "online": made_online, "verified": session.get("driver_is_verified", False),
+                    **cadence})
 
+@app.post("/driver/api/locations")
+@admit("normal")
+@rate_limit("batch")
+def driver_api_locations():
+    """
+    Batch of buffered fixes (JSON or compact binary, see locations.py): one
+    bulk history insert, the newest fix becomes the current position.
+    """
+    if "user_id" not in session or session.get("role") != "driver":
+        return jsonify({"ok": False, "error": "driver only"}), 403
+    did = session["user_id"]
+    try:
+        fixes, dropped = locations.parse_fixes(request.get_data(), request.content_type)
+    except locations.BadBatch as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if not fixes:
+        return jsonify({"ok": False, "error": "no valid fixes", "rejected": dropped}), 400
+
+    with pooled_connection() as conn:
+        locations.record_fixes(conn, did, fixes)
+        made_online = is_user_verified(conn, did)
+        set_driver_online(conn, did, made_online)
+        cur = execute_prepared(conn, "driver_has_trip", (did,))
+        on_trip = cur.fetchone() is not None; cur.close()
+        conn.commit()
+    session["driver_is_online"] = made_online
+    state = "trip" if on_trip else ("idle" if made_online else "off")
+    return jsonify({"ok": True, "accepted": len(fixes), "rejected": dropped, "online": made_online,
+                    "verified": session.get("driver_is_verified", False), **ping_cadence(state)})
+
+# ------------------------------
+# Background jobs (see jobs.py)
+# ------------------------------
+@recurring("sweep_stale_drivers", every=60)
+def sweep_stale_drivers():
+    """Drivers marked online whose last ping is older than 10 minutes go offline."""
+    conn = get_db_connection(); cur = conn.cursor()
+    cur.execute("""
+        UPDATE users u SET is_online=FALSE
+        WHERE u.role='driver' AND u.is_online=TRUE
+          AND NOT EXISTS (SELECT 1 FROM driver_location dl
+                          WHERE dl.driver_id = u.id AND dl.updated_at > NOW() - INTERVAL '10 minutes')
+        RETURNING u.id
+    """)
+    for (driver_id,) in cur.fetchall():
+        publish(conn, "driver_status", user_id=driver_id, is_online=False)
+    conn.commit(); cur.close(); conn.close()
+
+@recurring("sweep_sessions", every=600)
+def sweep_sessions():
+    if isinstance(app.session_interface, PgSessionInterface):
+        app.session_interface.store.sweep()
+
+@recurring("prune_demand_cells", every=86400)
+def prune_demand_cells():
+    conn = get_db_connection(); cur = conn.cursor()
+    cur.execute("DELETE FROM demand_cells WHERE window_start < NOW() - make_interval(hours => %s)",
+                (heatmap.MAX_HOURS,))
+    conn.commit(); cur.close(); conn.close()
+
+@recurring("prune_location_history", every=86400)
+def prune_location_history():
+    conn = get_db_connection(); cur = conn.cursor()
+    cur.execute("DELETE FROM driver_location_history WHERE recorded_at < NOW() - make_interval(days => %s)",
+                (locations.HISTORY_DAYS,))
+    conn.commit(); cur.close(); conn.close()
+
+@recurring("reconcile_unread_counters", every=3600)
+def reconcile_unread_counters_job():
+    """Triggers keep notification_counters exact; this catches anything that bypassed them."""
+    conn = get_db_connection()
+    fixed = reconcile_unread_counters(conn)
+    if fixed:
+        print(f"⚠️ unread counters: corrected {fixed} drifted user(s)")
+    conn.close()
+
+@recurring("prune_rate_limit_buckets", every=3600)
+def prune_rate_limit_buckets():
+    """Shared buckets idle for an hour are full again; dropping them changes nothing."""
+    conn = get_db_connection(); cur = conn.cursor()
+    cur.execute("DELETE FROM rate_limit_buckets WHERE updated_at < NOW() - INTERVAL '1 hour'")
+    conn.commit(); cur.close(); conn.close()
+
+@recurring("maintain_booking_partitions", every=86400)
+def maintain_booking_partitions():
+    """Keep next months' partitions created; archive old fully Completed months."""
+    conn = get_db_connection(); cur = conn.cursor()
+    if partitions.is_partitioned(cur):
+        partitions.ensure_partitions(cur)
+        conn.commit()
+        archived = partitions.archive(conn)
+        if archived:
+            print("📦 archived booking partitions:", ", ".join(archived))
+    cur.close(); conn.close()
+
+@app.get("/admin/api/jobs")
+def admin_api_jobs():
+    """Admin: job queue depth by task/status and the oldest due job's lag."""
+    if "user_id" not in session or session.get("role") != "admin":
+        return {"error": "forbidden"}, 403
+    conn = get_db_connection()
+    out = jobs.depth(conn)
+    conn.close()
+    return out
+
 # ------------------------------
 # Errors
 # ------------------------------
@@ -0,0 +1,119 @@
+# assets.py — fingerprinted, precompressed static assets
+"""
+Build step:
+    python assets.py            (or: flask --app app build-assets)
+
+Copies every CSS/JS file under static/ to static/dist/<path>.<hash>.<ext>,
+writes .gz (and .br when the optional `brotli` package is installed) next to
+each copy, and records the mapping in static/dist/manifest.json.
+
+At runtime init_app() rewrites url_for('static', filename='css/style.css') to
+the fingerprinted name and serves dist/ files with far-future immutable
+caching, picking the precompressed variant from Accept-Encoding. Without a
+manifest (or in debug mode) plain files are served as before.
+"""
+import os
+import sys
+import json
+import gzip
+import shutil
+import hashlib
+import mimetypes
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+ASSET_EXTS = (".css", ".js")
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+ENCODINGS = ((".br", "br"), (".gz", "gzip"))
+
+
+def build(static_folder):
+    """Fingerprint + precompress assets; returns {logical path: dist path}."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(d for d in dirs if d not in (DIST_DIR, "uploads"))
+        for fn in sorted(files):
+            if not fn.endswith(ASSET_EXTS):
+                continue
+            src = os.path.join(root, fn)
+            rel = os.path.relpath(src, static_folder).replace(os.sep, "/")
+            with open(src, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            stem, ext = os.path.splitext(rel)
+            out_rel = f"{DIST_DIR}/{stem}.{digest}{ext}"
+            out = os.path.join(static_folder, out_rel)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            with open(out, "wb") as f:
+                f.write(data)
+            with open(out + ".gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(out + ".br", "wb") as f:
+                    f.write(brotli.compress(data, quality=11))
+            manifest[rel] = out_rel
+    os.makedirs(dist, exist_ok=True)
+    with open(os.path.join(dist, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_app(app):
+    static_folder = app.static_folder
+    manifest = load_manifest(static_folder)
+    app.extensions["asset_manifest"] = manifest
+
+    @app.url_defaults
+    def _fingerprint_static(endpoint, values):
+        if app.debug:
+            return
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = manifest[values["filename"]]
+
+    def serve_static(filename):
+        if not filename.startswith(DIST_DIR + "/"):
+            return app.send_static_file(filename)
+        mimetype = mimetypes.guess_type(filename)[0]
+        resp = None
+        for suffix, coding in ENCODINGS:
+            if coding in request.accept_encodings and os.path.isfile(os.path.join(static_folder, filename + suffix)):
+                resp = send_from_directory(static_folder, filename + suffix, mimetype=mimetype)
+                resp.headers["Content-Encoding"] = coding
+                break
+        if resp is None:
+            resp = send_from_directory(static_folder, filename, mimetype=mimetype)
+        resp.headers["Cache-Control"] = IMMUTABLE
+        resp.vary.add("Accept-Encoding")
+        return resp
+
+    if "static" in app.view_functions:
+        app.view_functions["static"] = serve_static
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Fingerprint and precompress static CSS/JS."""
+        out = build(static_folder)
+        print(f"Built {len(out)} assets into {os.path.join(static_folder, DIST_DIR)}")
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    for src, dst in sorted(build(folder).items()):
+        print(f"{src} -> {dst}")
@@ -0,0 +1,244 @@
+# benchmarks/generate_data.py — bulk synthetic data for load and query-plan testing
+"""
+Usage:
+    python benchmarks/generate_data.py [--users 100000] [--drivers 10000]
+        [--bookings 1000000] [--rated 0.5] [--notifications 200000]
+        [--months 12] [--seed 42] [--database ambulance_db]
+
+Fills the schema with realistic-looking volumes: drivers clustered around a
+handful of Nepali cities, bookings spread over the last --months with a
+day/night curve (old trips Completed, the last few hours a Pending/Accepted/
+Completed mix), ratings for a share of completed trips, and notifications.
+
+Everything is streamed in with COPY in CHUNK-row batches, so memory stays flat
+and a few million bookings load in minutes. Ids are reserved up front from
+each table's sequence, which lets bookings/ratings reference users without
+reading anything back. The same --seed produces the same data (relative to
+the day it runs). Run it against a scratch database: it only adds rows.
+"""
+import io
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from werkzeug.security import generate_password_hash
+import database as dbmod
+import partitions
+import regions
+
+CHUNK = 50000
+PASSWORD = "password123"   # every generated account
+LIVE_HOURS = 6             # bookings newer than this may still be open
+EMERGENCY_RATE = 0.08
+
+# name, lat, lon, share of users/bookings, spread (km)
+CITIES = (
+    ("Kathmandu", 27.7172, 85.3240, 0.40, 5.0),
+    ("Lalitpur", 27.6588, 85.3247, 0.10, 3.0),
+    ("Pokhara", 28.2096, 83.9856, 0.14, 4.0),
+    ("Biratnagar", 26.4525, 87.2718, 0.10, 4.0),
+    ("Birgunj", 27.0104, 84.8770, 0.08, 3.5),
+    ("Butwal", 27.7006, 83.4483, 0.07, 3.5),
+    ("Dharan", 26.8125, 87.2836, 0.05, 3.0),
+    ("Nepalgunj", 28.0500, 81.6167, 0.06, 3.0),
+)
+HOSPITALS = ("Bir Hospital", "Teaching Hospital", "Patan Hospital", "Civil Hospital",
+             "Manipal Teaching Hospital", "BP Koirala Institute", "Narayani Hospital",
+             "Lumbini Provincial Hospital", "Bheri Hospital", "Grande International")
+FIRST = ("Aarav", "Sita", "Ram", "Gita", "Hari", "Anita", "Bikash", "Sunita", "Prakash",
+         "Kabita", "Suman", "Manisha", "Rajesh", "Puja", "Dipak", "Sarita", "Nabin", "Asmita")
+LAST = ("Shrestha", "Gurung", "Tamang", "Thapa", "Rai", "Magar", "Karki", "Adhikari",
+        "Bhandari", "Poudel", "Khadka", "Maharjan", "Limbu", "Sharma", "Yadav", "Joshi")
+# bookings per hour of day (relative)
+HOUR_WEIGHTS = (2, 1, 1, 1, 1, 2, 4, 6, 8, 8, 8, 7, 7, 7, 7, 7, 8, 9, 9, 8, 6, 5, 4, 3)
+LIVE_MIX = (("Pending", 0.25), ("Accepted", 0.35), ("Completed", 0.40))
+STAR_WEIGHTS = (2, 3, 8, 30, 57)   # 1..5
+NOTIFICATION_TITLES = ("Driver assigned", "Trip completed", "Rate your driver",
+                       "Account verified", "New job assigned", "Booking received")
+
+
+def _text(v):
+    """One COPY text-format field."""
+    if v is None:
+        return r"\N"
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    if isinstance(v, datetime):
+        return v.isoformat(sep=" ")
+    return str(v).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+class _Copier:
+    """Buffers rows for one table and COPYs them CHUNK at a time."""
+    def __init__(self, cur, table, columns):
+        self.cur, self.sql = cur, f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        self.buf, self.pending, self.rows = io.StringIO(), 0, 0
+
+    def add(self, *row):
+        self.buf.write("\t".join(map(_text, row)) + "\n")
+        self.pending += 1
+        if self.pending >= CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.buf.seek(0)
+            self.cur.copy_expert(self.sql, self.buf)
+            self.rows += self.pending
+            self.buf, self.pending = io.StringIO(), 0
+        return self.rows
+
+def _reserve(cur, table, n):
+    """Take n consecutive ids from table's id sequence; returns the first."""
+    cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+    seq = cur.fetchone()[0] or f"{table}_id_seq"
+    cur.execute("SELECT nextval(%s)", (seq,))
+    first = cur.fetchone()[0]
+    if n > 1:
+        cur.execute("SELECT setval(%s, %s)", (seq, first + n - 1))
+    return first
+
+def _point(rng, city):
+    _, lat, lon, _, spread = city
+    dlat = rng.gauss(0, spread) / 111.0
+    dlon = rng.gauss(0, spread) / 111.0
+    return round(lat + dlat, 6), round(lon + dlon, 6)
+
+def _name(rng):
+    return f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+
+def _phone(rng):
+    return f"98{rng.randrange(10**8):08d}"
+
+
+def generate(conn, users=100000, drivers=10000, bookings=1000000, rated=0.5,
+             notifications=200000, months=12, seed=42, log=print):
+    """Insert the synthetic data set in one transaction; returns row counts."""
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    oldest = now - timedelta(days=30 * months)
+    pw_hash = generate_password_hash(PASSWORD, method="pbkdf2:sha256", salt_length=16)
+    weights = [c[3] for c in CITIES]
+    cur = conn.cursor()
+    if partitions.is_partitioned(cur):
+        partitions.ensure_partitions(cur, start=oldest.date())
+
+    # users: patients first, then drivers (each driver lives in one city)
+    t0 = time.perf_counter()
+    first_user = _reserve(cur, "users", users + drivers)
+    user_ids = range(first_user, first_user + users)
+    driver_ids = range(first_user + users, first_user + users + drivers)
+    out = _Copier(cur, "users", ("id", "username", "email", "password", "role",
+                                 "is_verified", "kyc_role", "is_online", "last_online_at"))
+    for uid in user_ids:
+        out.add(uid, _name(rng), f"gen{uid}@example.test", pw_hash, "user", True, None, False, None)
+    driver_city, by_city = {}, {c[0]: [] for c in CITIES}
+    online = {}
+    for did in driver_ids:
+        city = rng.choices(CITIES, weights)[0]
+        driver_city[did] = city
+        by_city[city[0]].append(did)
+        online[did] = rng.random() < 0.35
+        seen = now - timedelta(seconds=rng.randrange(5, 60)) if online[did] else \
+            now - timedelta(minutes=rng.randrange(10, 60 * 24 * 14))
+        out.add(did, _name(rng), f"gen{did}@example.test", pw_hash, "driver",
+                rng.random() < 0.9, "driver", online[did], seen)
+    out.flush()
+    loc = _Copier(cur, "driver_location", ("driver_id", "region", "latitude", "longitude", "updated_at"))
+    for did in driver_ids:
+        lat, lon = _point(rng, driver_city[did])
+        age = timedelta(seconds=rng.randrange(5, 60)) if online[did] else \
+            timedelta(minutes=rng.randrange(10, 60 * 24 * 14))
+        loc.add(did, regions.region_of(lat, lon), lat, lon, now - age)
+    loc.flush()
+    log(f"users: {users} patients + {drivers} drivers in {time.perf_counter() - t0:.1f}s")
+
+    # bookings (+ ratings for a share of completed trips), streamed together
+    t0 = time.perf_counter()
+    first_booking = _reserve(cur, "bookings", bookings)
+    book = _Copier(cur, "bookings", ("id", "user_id", "driver_id", "patient_name", "phone_no",
+                                     "pickup_location", "destination", "booking_time",
+                                     "status", "priority", "region"))
+    rate = _Copier(cur, "driver_ratings", ("booking_id", "rater_user_id", "driver_id",
+                                           "stars", "comment", "created_at"))
+    span_days = max((now - oldest).days, 1)
+    live_cutoff = now - timedelta(hours=LIVE_HOURS)
+    busy = set()
+    for bid in range(first_booking, first_booking + bookings):
+        day = now - timedelta(days=rng.randrange(span_days))
+        hour = rng.choices(range(24), HOUR_WEIGHTS)[0]
+        at = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+        if at > now:
+            at -= timedelta(days=1)
+        status = "Completed"
+        if at >= live_cutoff:
+            status = rng.choices([s for s, _ in LIVE_MIX], [w for _, w in LIVE_MIX])[0]
+        city = rng.choices(CITIES, weights)[0]
+        lat, lon = _point(rng, city)
+        pool = by_city[city[0]] or driver_ids
+        driver = rng.choice(pool) if status != "Pending" and pool else None
+        if driver is None:
+            status = "Pending"
+        elif status == "Accepted":
+            # a driver carries one open trip at a time
+            status = "Completed" if driver in busy else status
+            busy.add(driver)
+        uid = rng.choice(user_ids) if users else None
+        book.add(bid, uid, driver, _name(rng), _phone(rng), f"GPS({lat},{lon})",
+                 f"{rng.choice(HOSPITALS)}, {city[0]}", at, status,
+                 "Emergency" if rng.random() < EMERGENCY_RATE else "Normal", regions.region_of(lat, lon))
+        if status == "Completed" and driver and uid and rng.random() < rated:
+            stars = rng.choices(range(1, 6), STAR_WEIGHTS)[0]
+            comment = rng.choice((None, None, "Quick response", "Very helpful driver",
+                                  "Took a while to arrive", "Smooth ride"))
+            rate.add(bid, uid, driver, stars, comment, at + timedelta(minutes=rng.randrange(30, 2880)))
+    n_bookings, n_ratings = book.flush(), rate.flush()
+    log(f"bookings: {n_bookings} (+{n_ratings} ratings) in {time.perf_counter() - t0:.1f}s")
+
+    # notifications
+    t0 = time.perf_counter()
+    note = _Copier(cur, "notifications", ("user_id", "title", "body", "is_read", "created_at"))
+    everyone = range(first_user, first_user + users + drivers)
+    for _ in range(notifications if everyone else 0):
+        at = now - timedelta(seconds=rng.randrange(span_days * 86400))
+        title = rng.choice(NOTIFICATION_TITLES)
+        note.add(rng.choice(everyone), title, f"{title}.", rng.random() < 0.75, at)
+    n_notes = note.flush()
+    log(f"notifications: {n_notes} in {time.perf_counter() - t0:.1f}s")
+
+    conn.commit()
+    for table in ("users", "driver_location", "bookings", "driver_ratings", "notifications"):
+        cur.execute(f"ANALYZE {table}")
+    conn.commit(); cur.close()
+    return {"users": users, "drivers": drivers, "bookings": n_bookings,
+            "ratings": n_ratings, "notifications": n_notes}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=100000)
+    ap.add_argument("--drivers", type=int, default=10000)
+    ap.add_argument("--bookings", type=int, default=1000000)
+    ap.add_argument("--rated", type=float, default=0.5, help="share of completed trips that get a rating")
+    ap.add_argument("--notifications", type=int, default=200000)
+    ap.add_argument("--months", type=int, default=12, help="how far back bookings go")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--database", default=dbmod.DB_CFG["database"])
+    args = ap.parse_args()
+
+    dbmod.DB_CFG["database"] = args.database
+    dbmod.initialize_db()
+    conn = dbmod.get_db_connection()
+    t0 = time.perf_counter()
+    counts = generate(conn, args.users, args.drivers, args.bookings, args.rated,
+                      args.notifications, args.months, args.seed)
+    conn.close()
+    total = sum(counts.values())
+    elapsed = time.perf_counter() - t0
+    print(f"{total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s) into {args.database}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/login_storm.py — driver ping latency while a login burst is hashing
+"""
+Usage:
+    python benchmarks/login_storm.py [--logins 200] [--concurrency 20]
+
+Runs the storm twice in fresh interpreters under eventlet: once with hashing
+inline (HASH_POOL_SIZE=0, the old behaviour) and once on the process pool,
+then prints ping latency percentiles for both. Uses the database in DB_CFG.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def _pct(values, p):
+    if not values: return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+def run_once(logins, concurrency):
+    import eventlet
+    eventlet.monkey_patch()
+    sys.path.insert(0, ROOT)
+    import database as dbmod
+    from werkzeug.security import generate_password_hash
+    import passwords
+    from app import app
+
+    conn = dbmod.get_db_connection(); cur = conn.cursor()
+    for email, role in (("bench_login@example.com", "user"), ("bench_driver@example.com", "driver")):
+        cur.execute("""
+            INSERT INTO users (username, email, password, role, is_verified)
+            VALUES (%s,%s,%s,%s,TRUE)
+            ON CONFLICT (email) DO UPDATE SET password=EXCLUDED.password
+        """, (email.split("@")[0], email, generate_password_hash("benchpw"), role))
+    conn.commit(); cur.close(); conn.close()
+
+    def signin(client, email):
+        return client.post("/signin", data={"email": email, "password": "benchpw"})
+
+    driver = app.test_client()
+    signin(driver, "bench_driver@example.com")
+
+    done = {"logins": 0}
+    def storm():
+        c = app.test_client()
+        while done["logins"] < logins:
+            done["logins"] += 1
+            signin(c, "bench_login@example.com")
+            c.get("/logout")
+
+    latencies = []
+    def pinger():
+        while done["logins"] < logins:
+            t0 = time.perf_counter()
+            driver.post("/update_driver_location", data={"lat": "27.70", "lon": "85.33"})
+            latencies.append((time.perf_counter() - t0) * 1000)
+            eventlet.sleep(0.05)
+
+    t0 = time.perf_counter()
+    pool = eventlet.GreenPool(concurrency + 1)
+    pool.spawn(pinger)
+    for _ in range(concurrency):
+        pool.spawn(storm)
+    pool.waitall()
+    elapsed = time.perf_counter() - t0
+    passwords.shutdown()
+    return {
+        "hash_pool_size": int(os.environ.get("HASH_POOL_SIZE", "-1")),
+        "logins": logins, "seconds": round(elapsed, 2),
+        "pings": len(latencies),
+        "ping_p50_ms": round(_pct(latencies, 50) or 0, 1),
+        "ping_p95_ms": round(_pct(latencies, 95) or 0, 1),
+        "ping_max_ms": round(max(latencies) if latencies else 0, 1),
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logins", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_once(args.logins, args.concurrency)), flush=True)
+        os._exit(0)  # skip eventlet's interpreter teardown
+
+    results = []
+    for label, size in (("inline", "0"), ("pool", os.environ.get("HASH_POOL_SIZE", "4"))):
+        env = dict(os.environ, HASH_POOL_SIZE=size)
+        out = subprocess.run([sys.executable, __file__, "--child",
+                              "--logins", str(args.logins), "--concurrency", str(args.concurrency)],
+                             env=env, capture_output=True, text=True, check=True).stdout
+        res = json.loads(out.strip().splitlines()[-1]); res["mode"] = label
+        results.append(res)
+
+    print(f"{'mode':<8}{'logins':>8}{'secs':>8}{'pings':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['logins']:>8}{r['seconds']:>8}{r['pings']:>8}"
+              f"{r['ping_p50_ms']:>10}{r['ping_p95_ms']:>10}{r['ping_max_ms']:>10}")
+
+if __name__ == "__main__":
+    main()
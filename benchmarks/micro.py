@@ -0,0 +1,227 @@
+# benchmarks/micro.py — microbenchmarks for per-request hot paths, with regression check
+"""
+Usage:
+    python benchmarks/micro.py run [--out results.json] [--only NAME] [--min-time 0.5] [--no-db]
+    python benchmarks/micro.py compare BASE.json HEAD.json [--threshold 0.10]
+
+`run` times each benchmark in repeated batches (loop count calibrated so a
+batch takes ~min-time/REPEATS) and writes per-call min/median/mean in
+microseconds, plus the git commit, to a JSON file. `compare` lines two such
+files up and exits 1 if any median got slower by more than --threshold, so
+
+    git stash; python benchmarks/micro.py run --out base.json; git stash pop
+    python benchmarks/micro.py run --out head.json
+    python benchmarks/micro.py compare base.json head.json
+
+guards a change. Database benchmarks insert their drivers inside a
+transaction that is rolled back, using the database in DB_CFG.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+REPEATS = 7
+DRIVER_COUNTS = (10, 1000, 10000)
+BENCH_POINT = (0.5, 0.5)   # empty ocean: benchmark drivers never mix with real ones
+
+_benches = []   # (name, needs_db, generator fn)
+
+
+def bench(name, db=False):
+    """
+    Register a benchmark. The function is a generator yielding (label, fn)
+    pairs — fn is timed with no arguments; code after the last yield is
+    cleanup. label is appended to name ("fetch_driver_cards[n=1000]").
+    """
+    def deco(fn):
+        _benches.append((name, db, fn))
+        return fn
+    return deco
+
+def measure(fn, min_time=0.5, repeats=REPEATS):
+    """Per-call timings of fn in microseconds: {loops, min_us, median_us, mean_us}."""
+    loops, target = 1, min_time / repeats
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        took = time.perf_counter() - t0
+        if took >= target or loops >= 1 << 20:
+            break
+        loops *= 2 if took <= 0 else max(2, min(10, int(target / took) + 1))
+    batches = [took / loops]
+    for _ in range(repeats - 1):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        batches.append((time.perf_counter() - t0) / loops)
+    return {"loops": loops,
+            "min_us": round(min(batches) * 1e6, 3),
+            "median_us": round(statistics.median(batches) * 1e6, 3),
+            "mean_us": round(statistics.fmean(batches) * 1e6, 3)}
+
+def compare(base, head, threshold=0.10):
+    """[(name, base_us, head_us, ratio, verdict)] for benchmarks present in both runs."""
+    rows = []
+    for name, b in base["results"].items():
+        h = head["results"].get(name)
+        if h is None:
+            continue
+        ratio = h["median_us"] / b["median_us"] if b["median_us"] else 1.0
+        verdict = "REGRESSION" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else ""
+        rows.append((name, b["median_us"], h["median_us"], ratio, verdict))
+    return rows
+
+
+# ------------------------------
+# Benchmarks
+# ------------------------------
+def _app():
+    os.environ.setdefault("EVENT_BUS", "0")
+    os.environ.setdefault("JOB_WORKERS", "0")
+    import app as appmod
+    return appmod
+
+@bench("distance_km")
+def bench_distance():
+    appmod = _app()
+    yield "", lambda: appmod.distance_km(27.7172, 85.3240, 28.2096, 83.9856)
+
+@bench("verify_password")
+def bench_verify_password():
+    import hashlib
+    from werkzeug.security import generate_password_hash
+    from passwords import verify_password
+    hashes = {
+        "pbkdf2": generate_password_hash("secret", method="pbkdf2:sha256", salt_length=16),
+        "scrypt": generate_password_hash("secret", method="scrypt"),
+        "sha256-legacy": hashlib.sha256(b"secret").hexdigest(),
+    }
+    for kind, stored in hashes.items():
+        yield f"[{kind}]", lambda stored=stored: verify_password("secret", stored)
+
+@bench("booking_visible_to_current_user_for_track")
+def bench_track_visibility():
+    appmod = _app()
+    from flask import session
+    with appmod.app.test_request_context("/track/1"):
+        session["user_id"], session["role"] = 7, "driver"
+        yield "", lambda: appmod.booking_visible_to_current_user_for_track((1, 3, 7, "Accepted"))
+
+@bench("render")
+def bench_templates():
+    appmod = _app()
+    from flask import render_template, session
+    drivers = [{"driver_id": i, "name": f"Driver {i}", "avg_rating": 4.2, "rating_count": 17,
+                "is_verified": True, "dist_km": 1.5 + i / 10, "score": 0.8} for i in range(25)]
+    reviews = {i: [{"rater": "rider", "stars": 5, "comment": "Quick"}] * 3 for i in range(25)}
+    now = datetime.now()
+    bookings = [(i, f"user{i}", f"driver{i}", "Bir Hospital", "Completed", now) for i in range(20)]
+    users = [[i, f"user{i}", "driver" if i % 5 == 0 else "user", i % 2 == 0] for i in range(100)]
+    top = [[i, f"driver{i}", 4.5, 30] for i in range(10)]
+    kycs = [[i, f"driver{i}", "driver", False, "driver", f"d{i}@example.com",
+             "uploads/a.jpg", "uploads/b.jpg", "uploads/c.jpg", "uploads/d.jpg"] for i in range(60)]
+    with appmod.app.test_request_context("/"):
+        session["user_id"], session["role"] = 1, "user"
+        yield "[choose_driver.html]", lambda: render_template(
+            "choose_driver.html", drivers=drivers, reviews=reviews, patient="P", phone="1",
+            dest="Bir Hospital", pick="", user_lat="27.7", user_lon="85.3")
+        session["role"] = "admin"
+        yield "[dashboard_admin.html]", lambda: render_template(
+            "dashboard_admin.html", bookings=bookings, users=users, top_drivers=top, kycs=kycs)
+
+def _seed_drivers(cur, n):
+    import regions
+    cur.execute("SELECT setseed(0.42)")
+    cur.execute("""
+        WITH u AS (
+            INSERT INTO users (username, email, password, role, is_verified, is_online)
+            SELECT 'bench' || g, 'bench' || g || '@bench.test', 'x', 'driver', TRUE, TRUE
+            FROM generate_series(1, %s) g
+            RETURNING id
+        )
+        INSERT INTO driver_location (driver_id, region, latitude, longitude, updated_at)
+        SELECT id, %s, %s + (random() - 0.5) * 0.5, %s + (random() - 0.5) * 0.5, NOW() FROM u
+    """, (n, regions.region_of(*BENCH_POINT), *BENCH_POINT))
+    cur.execute("ANALYZE users, driver_location")   # as autovacuum would have by now
+
+@bench("driver_search", db=True)
+def bench_driver_search():
+    appmod = _app()
+    import database as dbmod
+    for n in DRIVER_COUNTS:
+        conn = dbmod.get_db_connection()
+        cur = conn.cursor()
+        try:
+            _seed_drivers(cur, n)
+            yield f"[fetch_driver_cards n={n}]", lambda: appmod.fetch_driver_cards(
+                conn, near=BENCH_POINT, radius_km=appmod.SEARCH_RINGS_KM[0])
+            yield f"[rank_drivers n={n}]", lambda: appmod.rank_drivers(conn, BENCH_POINT)
+        finally:
+            cur.close(); conn.rollback(); conn.close()
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(only=None, min_time=0.5, db=True, log=print):
+    results = {}
+    for name, needs_db, gen in _benches:
+        if (needs_db and not db) or (only and only not in name):
+            continue
+        for label, fn in gen():
+            key = name + label
+            results[key] = measure(fn, min_time)
+            log(f"{key:<58}{results[key]['median_us']:>14.2f} us")
+    return {"meta": {"commit": _git_commit(), "python": platform.python_version(),
+                     "machine": platform.node(), "at": datetime.now().isoformat(timespec="seconds")},
+            "results": results}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run")
+    r.add_argument("--out", default="micro_results.json")
+    r.add_argument("--only", help="run benchmarks whose name contains this")
+    r.add_argument("--min-time", type=float, default=0.5, help="seconds per benchmark")
+    r.add_argument("--no-db", action="store_true", help="skip benchmarks that need Postgres")
+    c = sub.add_parser("compare")
+    c.add_argument("base"); c.add_argument("head")
+    c.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)")
+    args = ap.parse_args()
+
+    if args.cmd == "run":
+        out = run(args.only, args.min_time, db=not args.no_db)
+        with open(args.out, "w") as f:
+            json.dump(out, f, indent=2)
+        print(f"wrote {len(out['results'])} results to {args.out}")
+        return
+
+    with open(args.base) as f: base = json.load(f)
+    with open(args.head) as f: head = json.load(f)
+    rows = compare(base, head, args.threshold)
+    print(f"{'benchmark':<58}{'base us':>12}{'head us':>12}{'ratio':>8}")
+    for name, b, h, ratio, verdict in rows:
+        print(f"{name:<58}{b:>12.2f}{h:>12.2f}{ratio:>8.2f}  {verdict}")
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} "
+          f"({base['meta'].get('commit')} -> {head['meta'].get('commit')})")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/prepared_statements.py — planning overhead of the hot SQL, plain vs prepared
+"""
+Usage:
+    python benchmarks/prepared_statements.py [--iterations 5000]
+
+For each statement in database.PREPARED, runs it N times as plain SQL on a
+regular connection and N times via EXECUTE on a pooled connection (writes are
+rolled back), then prints per-call latency and the planning time Postgres
+reports for the plain form. Uses the database in DB_CFG.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import database as dbmod
+
+def _params(cur, name):
+    cur.execute("SELECT id FROM users ORDER BY id LIMIT 1")
+    row = cur.fetchone()
+    uid = row[0] if row else 1
+    return (uid, 27.7, 85.33) if name.startswith("upsert_") else (uid,)
+
+def _planning_ms(cur, name, params):
+    cur.execute("EXPLAIN (ANALYZE, SUMMARY) " + dbmod.PREPARED[name][1], params)
+    for (line,) in cur.fetchall():
+        if line.startswith("Planning Time:"):
+            return float(line.split(":")[1].split()[0])
+    return None
+
+def _time(conn, name, params, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        cur = dbmod.execute_prepared(conn, name, params)
+        if cur.description: cur.fetchall()
+        cur.close()
+    conn.rollback()
+    return (time.perf_counter() - t0) / n * 1e6
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iterations", type=int, default=5000)
+    args = ap.parse_args()
+
+    plain = dbmod.get_db_connection()
+    cur = plain.cursor()
+    print(f"{'statement':<24}{'plan ms':>10}{'plain us':>12}{'prepared us':>14}{'saved':>8}")
+    with dbmod.pooled_connection() as pooled:
+        for name in dbmod.PREPARED:
+            params = _params(cur, name)
+            plan = _planning_ms(cur, name, params); plain.rollback()
+            t_plain = _time(plain, name, params, args.iterations)
+            t_prep = _time(pooled, name, params, args.iterations)
+            saved = (1 - t_prep / t_plain) * 100 if t_plain else 0
+            print(f"{name:<24}{plan if plan is not None else float('nan'):>10.3f}"
+                  f"{t_plain:>12.1f}{t_prep:>14.1f}{saved:>7.0f}%")
+    cur.close(); plain.close()
+
+if __name__ == "__main__":
+    main()
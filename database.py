@@ -1,7 +1,21 @@
 # database.py — ensure PBKDF2 admin + unique review constraint
+import os
+import re
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+from functools import wraps
 import psycopg2
+import psycopg2.errors
+from psycopg2 import pool
 from werkzeug.security import generate_password_hash
 
+import partitions
+import regions
+import search
+from partitions import LIVE_BOOKINGS
+
 DB_CFG = {
     "database": "ambulance_db",
     "user": "postgres",
@@ -10,8 +24,265 @@ DB_CFG = {
     "port": 5432,
 }
 
+def _replica_cfgs_from_env():
+    """DB_REPLICAS="host[:port],host[:port]" -> list of DB_CFG-shaped dicts."""
+    cfgs = []
+    for item in (os.environ.get("DB_REPLICAS") or "").split(","):
+        item = item.strip()
+        if not item: continue
+        host, _, port = item.partition(":")
+        cfg = dict(DB_CFG)
+        cfg["host"] = host
+        if port: cfg["port"] = int(port)
+        cfgs.append(cfg)
+    return cfgs
+
+# Read replicas, same keys as DB_CFG. Empty -> every read goes to the primary.
+REPLICA_CFGS = _replica_cfgs_from_env()
+# Read-your-writes: after a write, the session keeps reading the primary this long.
+STICKY_SECONDS = float(os.environ.get("DB_STICKY_SECONDS", "5"))
+
+_route = threading.local()
+_replica_rr = itertools.count()
+_trace = threading.local()
+
+class TracedCursor(psycopg2.extensions.cursor):
+    """Records (sql, seconds) — or (sql, seconds, vars) — into the active query trace, if any."""
+    def execute(self, query, vars=None):
+        log = getattr(_trace, "log", None)
+        if log is None:
+            return super().execute(query, vars)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - t0
+            log.append((query, elapsed, vars) if _trace.params else (query, elapsed))
+
+    def executemany(self, query, vars_list):
+        log = getattr(_trace, "log", None)
+        if log is None:
+            return super().executemany(query, vars_list)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            elapsed = time.perf_counter() - t0
+            log.append((query, elapsed, None) if _trace.params else (query, elapsed))
+
+def start_query_trace(params=False):
+    """
+    Start collecting statements run on this thread; returns the live list.
+    params=True also keeps each statement's parameters (third element).
+    """
+    _trace.log = []
+    _trace.params = params
+    return _trace.log
+
+def stop_query_trace():
+    """Stop collecting; returns [(sql, seconds), ...] (or None if not tracing)."""
+    log = getattr(_trace, "log", None)
+    _trace.log = None
+    return log
+
 def get_db_connection():
-    return psycopg2.connect(**DB_CFG)
+    return psycopg2.connect(**DB_CFG, cursor_factory=TracedCursor)
+
+def db_route(mode):
+    """
+    Decorator for routes / helpers: mode='read' lets get_read_connection() use a
+    replica inside the call; mode='write' keeps it on the primary and records that
+    a write happened (see consume_write_flag) so the caller can pin the session.
+    """
+    if mode not in ("read", "write"):
+        raise ValueError("db_route mode must be 'read' or 'write'")
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            prev = getattr(_route, "mode", None)
+            _route.mode = mode
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _route.mode = prev
+                if mode == "write":
+                    _route.wrote = True
+        return wrapper
+    return deco
+
+def pin_primary(pinned=True):
+    """Force reads of the current request/thread onto the primary (read-your-writes)."""
+    _route.pinned = bool(pinned)
+
+def consume_write_flag():
+    """True once if a db_route('write') call ran on this thread since the last check."""
+    wrote = getattr(_route, "wrote", False)
+    _route.wrote = False
+    return wrote
+
+def get_read_connection():
+    """
+    Replica connection when called inside db_route('read') and the session isn't
+    pinned to the primary; otherwise (or if the replica is down) the primary.
+    """
+    if (not REPLICA_CFGS or getattr(_route, "mode", None) != "read"
+            or getattr(_route, "pinned", False)):
+        return get_db_connection()
+    start = next(_replica_rr)
+    for i in range(len(REPLICA_CFGS)):
+        cfg = REPLICA_CFGS[(start + i) % len(REPLICA_CFGS)]
+        try:
+            return psycopg2.connect(**cfg, cursor_factory=TracedCursor)
+        except psycopg2.OperationalError:
+            continue
+    return get_db_connection()
+
+# ------------------------------
+# Connection pool + prepared statements for the hot SQL
+# ------------------------------
+POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.environ.get("DB_POOL_MAX", "20"))
+
+# name -> (argument types, SQL with %s placeholders). Handlers call
+# execute_prepared(conn, name, params); on a pooled connection the statement is
+# PREPAREd once and then EXECUTEd by name, elsewhere it runs as plain SQL.
+PREPARED = {
+    # driver_id, lat, lon, regions.region_of(lat, lon) (see regions.py)
+    "upsert_driver_location": ("int, float8, float8, text",
+        "SELECT set_driver_location(%s, %s, %s, %s, NOW()::timestamp)"),
+    "upsert_user_location": ("int, float8, float8", """
+        INSERT INTO user_location (user_id, latitude, longitude, updated_at)
+        VALUES (%s,%s,%s,NOW())
+        ON CONFLICT (user_id) DO UPDATE
+          SET latitude=EXCLUDED.latitude, longitude=EXCLUDED.longitude, updated_at=NOW()
+    """),
+    "user_is_verified": ("int", "SELECT is_verified FROM users WHERE id=%s"),
+    "unread_count": ("int", "SELECT COALESCE((SELECT unread FROM notification_counters WHERE user_id=%s), 0)"),
+    "pending_count": ("int", f"SELECT COUNT(*) FROM bookings WHERE driver_id=%s AND status='Pending' AND {LIVE_BOOKINGS}"),
+    "driver_has_trip": ("int", "SELECT 1 FROM bookings WHERE driver_id=%s AND status='Accepted' LIMIT 1"),
+    "user_booking_state": ("int", f"""
+        SELECT status FROM bookings
+        WHERE user_id=%s AND (status='Accepted' OR (status='Pending' AND {LIVE_BOOKINGS}))
+        ORDER BY (status='Accepted') DESC
+        LIMIT 1
+    """),
+}
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Remembers which PREPARED names exist on this server session."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.pooled = False
+
+_pool = None
+_pool_cfg = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool, _pool_cfg
+    with _pool_lock:
+        if _pool is None or _pool_cfg != DB_CFG:
+            if _pool is not None:
+                _pool.closeall()
+            _pool_cfg = dict(DB_CFG)
+            _pool = pool.ThreadedConnectionPool(
+                POOL_MIN, POOL_MAX, connection_factory=PreparingConnection,
+                cursor_factory=TracedCursor, **_pool_cfg)
+        return _pool
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrow a long-lived connection (rolled back and returned on exit). Falls back
+    to a one-off connection when the pool is exhausted. Broken connections are
+    discarded, so their replacement re-prepares statements on first use.
+    """
+    p = _get_pool()
+    try:
+        conn = p.getconn(); conn.pooled = True
+    except pool.PoolError:
+        p, conn = None, psycopg2.connect(**DB_CFG, cursor_factory=TracedCursor)
+    try:
+        yield conn
+    finally:
+        if p is None:
+            conn.close()
+        else:
+            if not conn.closed:
+                try: conn.rollback()
+                except psycopg2.Error: pass
+            p.putconn(conn, close=bool(conn.closed))
+
+def _prepare_sql(name):
+    types, sql = PREPARED[name]
+    n = itertools.count(1)
+    body = re.sub(r"%s", lambda m: f"${next(n)}", sql)
+    return f"PREPARE {name} ({types}) AS {body}"
+
+def execute_prepared(conn, name, params=()):
+    """Run a PREPARED statement by name on conn; returns the cursor."""
+    cur = conn.cursor()
+    if not getattr(conn, "pooled", False):
+        cur.execute(PREPARED[name][1], params)
+        return cur
+    idle = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    if name not in conn.prepared:
+        cur.execute(_prepare_sql(name))
+        conn.prepared.add(name)
+    args = ", ".join(["%s"] * len(params))
+    try:
+        cur.execute(f"EXECUTE {name} ({args})" if args else f"EXECUTE {name}", params)
+    except psycopg2.errors.InvalidSqlStatementName:
+        # server forgot it (DISCARD ALL / pooler reset). Re-prepare once if no
+        # earlier work of the caller's transaction would be lost by the rollback.
+        conn.prepared.clear()
+        if not idle:
+            raise
+        conn.rollback()
+        cur = conn.cursor()
+        cur.execute(_prepare_sql(name)); conn.prepared.add(name)
+        cur.execute(f"EXECUTE {name} ({args})" if args else f"EXECUTE {name}", params)
+    return cur
+
+def reconcile_unread_counters(conn) -> int:
+    """
+    Reset notification_counters that drifted from the real unread counts;
+    returns how many were off. One lock-free comparison finds the suspects,
+    then each is recounted in its own short transaction holding only that
+    user's counter row (which the trigger needs too), so notification writes
+    for everyone else never wait on it.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT u.user_id
+        FROM (SELECT user_id FROM notification_counters
+              UNION SELECT user_id FROM notifications WHERE is_read=FALSE) u
+        LEFT JOIN notification_counters c ON c.user_id = u.user_id
+        LEFT JOIN (SELECT user_id, COUNT(*) AS unread FROM notifications
+                   WHERE is_read=FALSE GROUP BY user_id) n ON n.user_id = u.user_id
+        WHERE u.user_id IS NOT NULL AND COALESCE(c.unread, 0) <> COALESCE(n.unread, 0)
+    """)
+    suspects = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    fixed = 0
+    for user_id in suspects:
+        cur.execute("""
+            INSERT INTO notification_counters (user_id, unread)
+            SELECT id, 0 FROM users WHERE id=%s
+            ON CONFLICT (user_id) DO NOTHING
+        """, (user_id,))
+        cur.execute("SELECT unread FROM notification_counters WHERE user_id=%s FOR UPDATE", (user_id,))
+        row = cur.fetchone()
+        if row:   # else the user is gone
+            cur.execute("SELECT COUNT(*) FROM notifications WHERE user_id=%s AND is_read=FALSE", (user_id,))
+            actual = cur.fetchone()[0]
+            if actual != row[0]:
+                cur.execute("UPDATE notification_counters SET unread=%s WHERE user_id=%s", (actual, user_id))
+                fixed += 1
+        conn.commit()
+    cur.close()
+    return fixed
 
 def initialize_db():
     admin_conn = psycopg2.connect(database="postgres", user=DB_CFG["user"], password=DB_CFG["password"], host=DB_CFG["host"], port=DB_CFG["port"])
@@ -44,37 +315,52 @@ def initialize_db():
         """)
         cur.execute("CREATE INDEX IF NOT EXISTS idx_users_is_online ON users (is_online);")
 
-        # bookings
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS bookings (
-            id SERIAL PRIMARY KEY,
-            user_id INT REFERENCES users(id),
-            driver_id INT REFERENCES users(id),
-            patient_name VARCHAR(100) NOT NULL,
-            phone_no VARCHAR(20) NOT NULL,
-            pickup_location TEXT,
-            destination TEXT NOT NULL,
-            booking_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status VARCHAR(20) NOT NULL DEFAULT 'Pending' CHECK (status IN ('Pending','Accepted','Completed')),
-            priority VARCHAR(20) DEFAULT 'Normal' CHECK (priority IN ('Normal','Emergency'))
-        );
-        """)
+        # bookings: monthly partitions on booking_time (see partitions.py). An older
+        # plain table keeps working until `flask --app app bookings-migrate`.
+        partitions.create_table(cur)
+        partitions.ensure_status_check(cur)
+        if partitions.is_partitioned(cur):
+            partitions.ensure_partitions(cur)
+        else:
+            print("ℹ️ bookings is not partitioned yet; run: flask --app app bookings-migrate")
 
-        # locations
+        # locations: driver_location is partitioned by region (see regions.py)
+        regions.create_table(cur)
+        # bounding-box prefilter for the expanding-ring driver search (one per region)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_driver_location_lat_lon ON driver_location (latitude, longitude);")
+        cur.execute("ALTER TABLE bookings ADD COLUMN IF NOT EXISTS region TEXT;")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_pending_region ON bookings (region) WHERE status='Pending';")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_accepted_driver ON bookings (driver_id) WHERE status='Accepted';")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_time ON bookings (booking_time, id);")
+        # admin search: full-text + prefix indexes (see search.py)
+        search.create_indexes(cur)
         cur.execute("""
-        CREATE TABLE IF NOT EXISTS driver_location (
-            driver_id INT PRIMARY KEY REFERENCES users(id),
+        CREATE TABLE IF NOT EXISTS user_location (
+            user_id INT PRIMARY KEY REFERENCES users(id),
             latitude DOUBLE PRECISION,
             longitude DOUBLE PRECISION,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
         """)
+
+        # past driver positions, mostly from offline batches (see locations.py)
         cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_location (
-            user_id INT PRIMARY KEY REFERENCES users(id),
-            latitude DOUBLE PRECISION,
-            longitude DOUBLE PRECISION,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        CREATE TABLE IF NOT EXISTS driver_location_history (
+            driver_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            recorded_at TIMESTAMP NOT NULL,
+            latitude DOUBLE PRECISION NOT NULL,
+            longitude DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (driver_id, recorded_at)
+        );
+        """)
+
+        # shared token buckets for RATE_LIMIT_BACKEND=postgres (see ratelimit.py);
+        # unlogged: losing them in a crash only refills everyone's bucket
+        cur.execute("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+            key TEXT PRIMARY KEY,
+            tokens DOUBLE PRECISION NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL
         );
         """)
 
@@ -82,7 +368,7 @@ def initialize_db():
         cur.execute("""
         CREATE TABLE IF NOT EXISTS driver_ratings (
             id SERIAL PRIMARY KEY,
-            booking_id INT REFERENCES bookings(id) ON DELETE CASCADE,
+            booking_id INT,   -- no FK: bookings is partitioned (PK is id + booking_time)
             rater_user_id INT REFERENCES users(id) ON DELETE CASCADE,
             driver_id INT REFERENCES users(id) ON DELETE CASCADE,
             stars INT NOT NULL CHECK (stars BETWEEN 1 AND 5),
@@ -94,6 +380,8 @@ def initialize_db():
         cur.execute("SELECT 1 FROM pg_constraint WHERE conname='uniq_rating_per_booking'")
         if not cur.fetchone():
             cur.execute("ALTER TABLE driver_ratings ADD CONSTRAINT uniq_rating_per_booking UNIQUE (booking_id, rater_user_id)")
+        # exports stream in (time, id) order straight off these instead of sorting (see export.py)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_driver_ratings_created ON driver_ratings (created_at, id);")
 
         # notifications
         cur.execute("""
@@ -107,6 +395,126 @@ def initialize_db():
         );
         """)
         cur.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications (user_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_notifications_unread ON notifications (user_id) WHERE is_read=FALSE;")
+
+        # unread badge: per-user counter kept by statement-level triggers, so bulk
+        # inserts/mark-read touch each user's counter once (see reconcile_unread_counters)
+        cur.execute("SELECT to_regclass('public.notification_counters') IS NULL")
+        backfill = cur.fetchone()[0]
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS notification_counters (
+            user_id INT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            unread INT NOT NULL DEFAULT 0
+        );
+        """)
+        cur.execute("""
+        CREATE OR REPLACE FUNCTION notifications_count_unread() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                UPDATE notification_counters c SET unread = c.unread - d.n
+                FROM (SELECT user_id, COUNT(*) AS n FROM old_rows
+                      WHERE NOT is_read GROUP BY user_id) d
+                WHERE c.user_id = d.user_id;
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO notification_counters AS c (user_id, unread)
+                SELECT user_id, COUNT(*) FROM new_rows
+                WHERE NOT is_read AND user_id IS NOT NULL GROUP BY user_id
+                ON CONFLICT (user_id) DO UPDATE SET unread = c.unread + EXCLUDED.unread;
+                RETURN NULL;
+            END IF;
+            INSERT INTO notification_counters AS c (user_id, unread)
+            SELECT user_id, SUM(delta) FROM (
+                SELECT user_id, 1 AS delta FROM new_rows WHERE NOT is_read
+                UNION ALL
+                SELECT user_id, -1 FROM old_rows WHERE NOT is_read
+            ) x
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id
+            HAVING SUM(delta) <> 0
+            ON CONFLICT (user_id) DO UPDATE SET unread = c.unread + EXCLUDED.unread;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+        """)
+        for event, refs in (("INSERT", "NEW TABLE AS new_rows"),
+                            ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+                            ("DELETE", "OLD TABLE AS old_rows")):
+            name = f"notifications_unread_{event.lower()}"
+            cur.execute("SELECT 1 FROM pg_trigger WHERE tgname=%s", (name,))
+            if not cur.fetchone():
+                cur.execute(f"""
+                    CREATE TRIGGER {name} AFTER {event} ON notifications
+                    REFERENCING {refs} FOR EACH STATEMENT
+                    EXECUTE FUNCTION notifications_count_unread()
+                """)
+        if backfill:
+            reconcile_unread_counters(conn)
+
+        # server-side sessions (see sessions.py)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            sid VARCHAR(32) PRIMARY KEY,
+            data TEXT NOT NULL,
+            expires_at TIMESTAMP NOT NULL
+        );
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at);")
+
+        # pickup demand per geohash cell per hour (see heatmap.py)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS demand_cells (
+            window_start TIMESTAMP NOT NULL,
+            cell VARCHAR(12) NOT NULL,
+            lat DOUBLE PRECISION NOT NULL,
+            lon DOUBLE PRECISION NOT NULL,
+            bookings INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (window_start, cell)
+        );
+        """)
+
+        # one row per driver offer of a Pending booking (see offers.py)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS booking_offers (
+            id BIGSERIAL PRIMARY KEY,
+            booking_id INT NOT NULL,   -- no FK: bookings is partitioned
+            driver_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            status VARCHAR(10) NOT NULL DEFAULT 'open'
+                CHECK (status IN ('open','accepted','rejected','expired','withdrawn')),
+            offered_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            expires_at TIMESTAMP NOT NULL,
+            closed_at TIMESTAMP
+        );
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_booking_offers_booking ON booking_offers (booking_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_booking_offers_open_driver ON booking_offers (driver_id) WHERE status='open';")
+
+        # background jobs (see jobs.py)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id BIGSERIAL PRIMARY KEY,
+            task VARCHAR(64) NOT NULL,
+            payload JSONB NOT NULL DEFAULT '{}',
+            status VARCHAR(10) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued','running','done','failed')),
+            run_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            attempts INT NOT NULL DEFAULT 0,
+            max_attempts INT NOT NULL DEFAULT 5,
+            last_error TEXT,
+            locked_by VARCHAR(120),
+            locked_at TIMESTAMP,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            finished_at TIMESTAMP
+        );
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (run_at, id) WHERE status IN ('queued','running');")
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS job_schedules (
+            name VARCHAR(64) PRIMARY KEY,
+            every_s INT NOT NULL,
+            next_run_at TIMESTAMP NOT NULL
+        );
+        """)
 
         # Admin seed (PBKDF2)
         admin_email = "raj@gmail.com"
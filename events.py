@@ -0,0 +1,124 @@
+# events.py — cross-worker event bus over Postgres LISTEN/NOTIFY
+"""
+publish() queues a NOTIFY on the caller's connection, so the event is only
+delivered if (and when) that transaction commits. Every worker process runs
+one listener thread (start_listener) that LISTENs on CHANNEL and hands each
+event to the local subscribers registered for its topic.
+
+Topics in use:
+  booking          {"booking_id", "status", "user_id", "driver_id"}
+  notification     {"user_id"} or {"user_ids"} (bulk)
+  driver_status    {"user_id", "is_online"}
+  user_verified    {"user_id" or "user_ids", "is_verified"}
+
+Bulk events go through publish_ids(), which splits the ids over as many
+events as needed: a NOTIFY payload must stay under 8000 bytes.
+"""
+import os
+import json
+import select
+import threading
+import time
+from collections import defaultdict
+
+import database
+
+CHANNEL = "ambulance_events"
+IDS_PER_EVENT = 500   # 500 ids of up to 10 digits stay well under the 8000-byte limit
+
+_subscribers = defaultdict(dict)   # topic -> {(module, qualname): fn}
+_listener = None
+_listening = threading.Event()
+_stop = threading.Event()
+
+
+def subscribe(topic):
+    """Decorator: call fn(payload) for every `topic` event seen by this worker."""
+    def deco(fn):
+        # keyed by name so re-importing a module replaces rather than duplicates
+        _subscribers[topic][(fn.__module__, fn.__qualname__)] = fn
+        return fn
+    return deco
+
+def publish(conn, topic: str, **payload):
+    """NOTIFY inside the caller's transaction; delivered on commit."""
+    payload["topic"] = topic
+    payload["pid"] = os.getpid()
+    cur = conn.cursor()
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, json.dumps(payload, default=str)))
+    cur.close()
+
+def publish_ids(conn, topic: str, ids, **payload):
+    """publish(topic, user_ids=chunk, **payload) per IDS_PER_EVENT ids, in one statement."""
+    ids = list(ids)
+    payload["topic"] = topic
+    payload["pid"] = os.getpid()
+    messages = [json.dumps(dict(payload, user_ids=ids[i:i + IDS_PER_EVENT]), default=str)
+                for i in range(0, len(ids), IDS_PER_EVENT)]
+    cur = conn.cursor()
+    cur.execute("SELECT pg_notify(%s, m) FROM unnest(%s::text[]) AS m", (CHANNEL, messages))
+    cur.close()
+
+def dispatch(topic: str, payload: dict):
+    for fn in list(_subscribers.get(topic, {}).values()):
+        try:
+            fn(payload)
+        except Exception as e:
+            print(f"⚠️ event subscriber {fn.__qualname__} failed on {topic}:", e)
+
+def listening() -> bool:
+    """True while this worker's listener is connected (i.e. invalidations arrive)."""
+    return _listening.is_set()
+
+
+# ------------------------------
+# Listener thread (one per worker process)
+# ------------------------------
+def _listen_forever():
+    backoff = 1.0
+    while not _stop.is_set():
+        conn = None
+        try:
+            conn = database.get_db_connection()
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {CHANNEL}")
+            cur.close()
+            _listening.set(); backoff = 1.0
+            while not _stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    try:
+                        payload = json.loads(note.payload)
+                    except ValueError:
+                        continue
+                    dispatch(payload.get("topic"), payload)
+        except Exception as e:
+            print("⚠️ event listener disconnected:", e)
+        finally:
+            _listening.clear()
+            if conn is not None:
+                try: conn.close()
+                except Exception: pass
+        if not _stop.is_set():
+            time.sleep(backoff); backoff = min(backoff * 2, 30.0)
+
+def start_listener():
+    """Start the per-process listener thread (idempotent)."""
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return _listener
+    _stop.clear()
+    _listener = threading.Thread(target=_listen_forever, name="event-listener", daemon=True)
+    _listener.start()
+    return _listener
+
+def stop_listener(timeout=5.0):
+    global _listener
+    _stop.set()
+    if _listener is not None:
+        _listener.join(timeout)
+    _listener = None
@@ -0,0 +1,83 @@
+# export.py — streaming CSV/NDJSON exports through server-side cursors
+"""
+Rows are pulled from a named (server-side) cursor ITERSIZE at a time and
+written out in chunks as they arrive, so an export of millions of rows runs
+in constant memory and the first bytes leave immediately. The view opens the
+connection and closes it with Response.call_on_close, which runs when the
+download finishes or is aborted, even if the generator never started.
+
+Exports come out in (time, id) order, read straight off idx_bookings_time /
+idx_driver_ratings_created (bookings: one index scan per month partition,
+merged), so nothing is sorted before the first row is sent.
+"""
+import io
+import csv
+import json
+from datetime import date, datetime
+
+from partitions import STATUSES
+
+ITERSIZE = 2000
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# kind -> (select list + FROM, time column, has status filter, column names)
+EXPORTS = {
+    "bookings": ("""
+        SELECT b.id, b.booking_time, b.status, b.priority, b.patient_name, b.phone_no,
+               b.pickup_location, b.destination, b.user_id, u.username, b.driver_id, d.username
+        FROM bookings b
+        LEFT JOIN users u ON u.id = b.user_id
+        LEFT JOIN users d ON d.id = b.driver_id
+    """, "b.booking_time", True,
+        ("id", "booking_time", "status", "priority", "patient_name", "phone_no",
+         "pickup_location", "destination", "user_id", "user_name", "driver_id", "driver_name")),
+    "ratings": ("""
+        SELECT r.id, r.created_at, r.booking_id, r.stars, r.comment,
+               r.rater_user_id, u.username, r.driver_id, d.username
+        FROM driver_ratings r
+        LEFT JOIN users u ON u.id = r.rater_user_id
+        LEFT JOIN users d ON d.id = r.driver_id
+    """, "r.created_at", False,
+        ("id", "created_at", "booking_id", "stars", "comment",
+         "rater_user_id", "rater_name", "driver_id", "driver_name")),
+}
+
+
+def build_query(kind, start=None, end=None, statuses=None):
+    """SQL + params for one export; start/end are dates (end inclusive)."""
+    select, time_col, has_status, _ = EXPORTS[kind]
+    where, params = [], []
+    if start:
+        where.append(f"{time_col} >= %s"); params.append(start)
+    if end:
+        where.append(f"{time_col} < %s::date + 1"); params.append(end)
+    if statuses and has_status:
+        where.append("b.status = ANY(%s)"); params.append(list(statuses))
+    sql = select + (" WHERE " + " AND ".join(where) if where else "") + f" ORDER BY {time_col}, 1"
+    return sql, params
+
+def _cell(v):
+    return v.isoformat() if isinstance(v, (date, datetime)) else v
+
+def stream(conn, kind, fmt, sql, params):
+    """Yield CSV/NDJSON text chunks. conn stays open; the caller closes it."""
+    columns = EXPORTS[kind][3]
+    cur = conn.cursor(name=f"export_{kind}")
+    cur.itersize = ITERSIZE
+    cur.execute(sql, params)
+    buf = io.StringIO()
+    writer = csv.writer(buf) if fmt == "csv" else None
+    if writer:
+        writer.writerow(columns)
+        yield buf.getvalue(); buf.seek(0); buf.truncate()
+    n = 0
+    for row in cur:
+        if writer:
+            writer.writerow([_cell(v) for v in row])
+        else:
+            buf.write(json.dumps(dict(zip(columns, map(_cell, row)))) + "\n")
+        n += 1
+        if n % ITERSIZE == 0:
+            yield buf.getvalue(); buf.seek(0); buf.truncate()
+    yield buf.getvalue()
+    cur.close()
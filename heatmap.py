@@ -0,0 +1,85 @@
+# heatmap.py — pickup demand bucketed into geohash cells per hour
+"""
+Every booking with GPS pickup coordinates bumps one row in demand_cells
+(cell, hourly window) inside the booking's own transaction, so reading the
+heatmap only scans cells x windows in the requested range — never bookings.
+
+Cells are geohashes of HEATMAP_PRECISION characters (6 ≈ 1.2 km x 0.6 km).
+"""
+import os
+from datetime import datetime, timedelta
+
+PRECISION = int(os.environ.get("HEATMAP_PRECISION", "6"))
+MAX_CELLS = int(os.environ.get("HEATMAP_MAX_CELLS", "500"))
+MAX_HOURS = 24 * 30
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(lat: float, lon: float, precision: int = PRECISION) -> str:
+    lat_rng, lon_rng = [-90.0, 90.0], [-180.0, 180.0]
+    out, bits, ch, even = [], 0, 0, True
+    while len(out) < precision:
+        rng, val = (lon_rng, lon) if even else (lat_rng, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if val >= mid:
+            ch = (ch << 1) | 1; rng[0] = mid
+        else:
+            ch <<= 1; rng[1] = mid
+        even = not even; bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch]); bits, ch = 0, 0
+    return "".join(out)
+
+def bounds(cell: str):
+    """(south, west, north, east) of a geohash cell."""
+    lat_rng, lon_rng = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for c in cell:
+        n = _BASE32.index(c)
+        for shift in range(4, -1, -1):
+            rng = lon_rng if even else lat_rng
+            mid = (rng[0] + rng[1]) / 2
+            if (n >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_rng[0], lon_rng[0], lat_rng[1], lon_rng[1]
+
+
+def record_pickup(conn, lat: float, lon: float, at: datetime = None):
+    """Count one pickup in its cell/hour; runs in the caller's transaction."""
+    cell = encode(lat, lon)
+    s, w, n, e = bounds(cell)
+    window = (at or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO demand_cells (window_start, cell, lat, lon, bookings)
+        VALUES (%s,%s,%s,%s,1)
+        ON CONFLICT (window_start, cell) DO UPDATE SET bookings = demand_cells.bookings + 1
+    """, (window, cell, (s + n) / 2, (w + e) / 2))
+    cur.close()
+
+def cells(conn, hours: int = 24, bbox=None, limit: int = MAX_CELLS):
+    """
+    [[cell, south, west, north, east, count], ...] for the last `hours`,
+    busiest first; bbox=(south, west, north, east) narrows to the visible map.
+    """
+    hours = max(1, min(int(hours), MAX_HOURS))
+    since = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    box_sql, params = "", [since]
+    if bbox:
+        box_sql = "AND lat BETWEEN %s AND %s AND lon BETWEEN %s AND %s"
+        params += [bbox[0], bbox[2], bbox[1], bbox[3]]
+    params.append(limit)
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT cell, SUM(bookings) AS n
+        FROM demand_cells
+        WHERE window_start >= %s {box_sql}
+        GROUP BY cell
+        ORDER BY n DESC
+        LIMIT %s
+    """, params)
+    rows = cur.fetchall(); cur.close()
+    return [[cell, *(round(v, 5) for v in bounds(cell)), int(n)] for cell, n in rows]
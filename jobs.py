@@ -0,0 +1,202 @@
+# jobs.py — durable background jobs in Postgres (SELECT ... FOR UPDATE SKIP LOCKED)
+"""
+enqueue() inserts a row into `jobs` inside the caller's transaction, so a job
+exists only if the work that asked for it committed. Workers claim one due
+job at a time with FOR UPDATE SKIP LOCKED (many workers never block on each
+other), commit the claim, then run the handler outside any lock.
+
+Failures are retried with exponential backoff up to max_attempts; a job whose
+worker died is reclaimed once its lease (JOB_LEASE seconds) runs out.
+@recurring tasks are enqueued by whichever worker first sees them due.
+
+Workers run either inside the web process (start_workers, JOB_WORKERS threads)
+or standalone:  flask --app app jobs-worker --concurrency 4
+"""
+import os
+import json
+import socket
+import threading
+import time
+
+import click
+
+import database
+
+POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1"))
+LEASE = int(os.environ.get("JOB_LEASE", "300"))
+BACKOFF_BASE = int(os.environ.get("JOB_BACKOFF_BASE", "10"))
+BACKOFF_MAX = int(os.environ.get("JOB_BACKOFF_MAX", "3600"))
+
+_tasks = {}       # name -> fn(**payload)
+_schedules = {}   # name -> every (seconds)
+_synced = {}      # schedules already written to job_schedules by this process
+_threads = []
+_stop = threading.Event()
+
+
+def task(name, max_attempts=5):
+    """Decorator: register fn(**payload) as job handler `name`."""
+    def deco(fn):
+        fn.max_attempts = max_attempts
+        _tasks[name] = fn
+        return fn
+    return deco
+
+def recurring(name, every, max_attempts=1):
+    """Decorator: like @task, and enqueue it every `every` seconds."""
+    def deco(fn):
+        _schedules[name] = int(every)
+        return task(name, max_attempts)(fn)
+    return deco
+
+def enqueue(conn, name, delay=0, **payload):
+    """Queue job `name` in the caller's transaction; returns its id."""
+    if name not in _tasks:
+        raise KeyError(f"unknown job {name!r}")
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO jobs (task, payload, run_at, max_attempts)
+        VALUES (%s, %s, NOW() + make_interval(secs => %s), %s)
+        RETURNING id
+    """, (name, json.dumps(payload, default=str), delay, _tasks[name].max_attempts))
+    job_id = cur.fetchone()[0]; cur.close()
+    return job_id
+
+
+# ------------------------------
+# Worker side
+# ------------------------------
+def backoff(attempts: int) -> int:
+    return min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+
+def enqueue_due(conn):
+    """Enqueue every @recurring task that is due; returns their names."""
+    cur = conn.cursor()
+    for name, every in _schedules.items():
+        if _synced.get(name) == every:
+            continue
+        cur.execute("""
+            INSERT INTO job_schedules (name, every_s, next_run_at) VALUES (%s, %s, NOW())
+            ON CONFLICT (name) DO UPDATE SET every_s = EXCLUDED.every_s
+        """, (name, every))
+        _synced[name] = every
+    cur.execute("""
+        UPDATE job_schedules s SET next_run_at = NOW() + make_interval(secs => s.every_s)
+        WHERE s.name IN (
+            SELECT name FROM job_schedules
+            WHERE next_run_at <= NOW() AND name = ANY(%s)
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING s.name
+    """, (list(_schedules),))
+    due = [r[0] for r in cur.fetchall()]
+    cur.close()
+    for name in due:
+        enqueue(conn, name)
+    conn.commit()
+    return due
+
+def work_once(worker: str) -> bool:
+    """Claim and run one due job; False when there was nothing to do."""
+    with database.pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE jobs SET status='running', attempts = attempts + 1,
+                   locked_by = %s, locked_at = NOW()
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE (status='queued' AND run_at <= NOW())
+                   OR (status='running' AND locked_at < NOW() - make_interval(secs => %s))
+                ORDER BY run_at, id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, task, payload, attempts, max_attempts
+        """, (worker, LEASE))
+        row = cur.fetchone()
+        conn.commit()
+        if row is None:
+            cur.close()
+            return False
+
+        job_id, name, payload, attempts, max_attempts = row
+        try:
+            fn = _tasks.get(name)
+            if fn is None:
+                raise KeyError(f"no handler for job {name!r}")
+            fn(**(payload or {}))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempts < max_attempts:
+                cur.execute("""
+                    UPDATE jobs SET status='queued', last_error=%s, locked_by=NULL, locked_at=NULL,
+                           run_at = NOW() + make_interval(secs => %s)
+                    WHERE id=%s
+                """, (error, backoff(attempts), job_id))
+            else:
+                cur.execute("""
+                    UPDATE jobs SET status='failed', last_error=%s, finished_at=NOW() WHERE id=%s
+                """, (error, job_id))
+                print(f"⚠️ job #{job_id} {name} failed for good:", error)
+        else:
+            cur.execute("UPDATE jobs SET status='done', finished_at=NOW() WHERE id=%s", (job_id,))
+        conn.commit(); cur.close()
+        return True
+
+def depth(conn) -> dict:
+    """{task: {status: count}} plus the age of the oldest due job, in seconds."""
+    cur = conn.cursor()
+    cur.execute("SELECT task, status, COUNT(*) FROM jobs WHERE status <> 'done' GROUP BY task, status")
+    out = {}
+    for name, status, n in cur.fetchall():
+        out.setdefault(name, {})[status] = n
+    cur.execute("""
+        SELECT EXTRACT(EPOCH FROM NOW() - MIN(run_at)) FROM jobs
+        WHERE status='queued' AND run_at <= NOW()
+    """)
+    lag = cur.fetchone()[0]; cur.close()
+    return {"tasks": out, "oldest_due_s": float(lag or 0)}
+
+def _loop(worker: str, schedules: bool):
+    while not _stop.is_set():
+        try:
+            if schedules and _schedules:
+                with database.pooled_connection() as conn:
+                    enqueue_due(conn)
+            while work_once(worker) and not _stop.is_set():
+                pass
+        except Exception as e:
+            print(f"⚠️ job worker {worker} error:", e)
+        _stop.wait(POLL_INTERVAL)
+
+def start_workers(concurrency=1):
+    """Start `concurrency` worker threads in this process (idempotent)."""
+    if any(t.is_alive() for t in _threads):
+        return _threads
+    _stop.clear(); _threads.clear()
+    base = f"{socket.gethostname()}:{os.getpid()}"
+    for i in range(concurrency):
+        t = threading.Thread(target=_loop, args=(f"{base}:{i}", i == 0),
+                             name=f"job-worker-{i}", daemon=True)
+        t.start(); _threads.append(t)
+    return _threads
+
+def stop_workers(timeout=5.0):
+    _stop.set()
+    for t in _threads:
+        t.join(timeout)
+    _threads.clear()
+
+
+def init_app(app):
+    @app.cli.command("jobs-worker")
+    @click.option("--concurrency", default=2, show_default=True, help="Worker threads.")
+    def jobs_worker_command(concurrency):
+        """Run background job workers until interrupted."""
+        start_workers(concurrency)
+        print(f"Running {concurrency} job worker(s); Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stop_workers()
@@ -0,0 +1,87 @@
+# locations.py — batched GPS fixes from driver apps (offline replay)
+"""
+A driver app that lost connectivity uploads its buffered fixes in one request
+instead of replaying them one by one. Two encodings are accepted:
+
+  JSON   {"fixes": [{"t": <unix seconds>, "lat": .., "lon": ..}, ...]} (or a bare list)
+  binary application/octet-stream, FIX_STRUCT records back to back:
+         uint32 unix seconds, int32 lat * 1e6, int32 lon * 1e6 (little-endian, 12 bytes)
+
+Fixes with bad coordinates, from the future (beyond MAX_SKEW) or older than
+MAX_AGE are dropped and counted; the rest are ordered by time and de-duplicated.
+All of them go into driver_location_history in one INSERT (replays are
+idempotent on (driver_id, recorded_at)); the newest also moves the current
+position in driver_location (set_driver_location, in its region's partition),
+unless a newer one is already there.
+"""
+import os
+import json
+import struct
+import time
+
+import regions
+
+BATCH_MAX = int(os.environ.get("LOCATION_BATCH_MAX", "1000"))
+MAX_AGE = int(os.environ.get("LOCATION_MAX_AGE", str(24 * 3600)))
+MAX_SKEW = 60
+HISTORY_DAYS = int(os.environ.get("LOCATION_HISTORY_DAYS", "30"))
+FIX_STRUCT = struct.Struct("<Iii")
+
+
+class BadBatch(ValueError):
+    """The payload itself could not be read (as opposed to individual bad fixes)."""
+
+
+def _decode(body: bytes, content_type: str):
+    if (content_type or "").startswith("application/octet-stream"):
+        if len(body) % FIX_STRUCT.size:
+            raise BadBatch(f"binary batch must be a multiple of {FIX_STRUCT.size} bytes")
+        return [(t, la / 1e6, lo / 1e6) for t, la, lo in FIX_STRUCT.iter_unpack(body)]
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        raise BadBatch("invalid JSON")
+    if isinstance(data, dict):
+        data = data.get("fixes")
+    if not isinstance(data, list):
+        raise BadBatch("expected a list of fixes")
+    out = []
+    for f in data:
+        try:
+            out.append((float(f["t"]), float(f["lat"]), float(f["lon"])))
+        except (TypeError, KeyError, ValueError):
+            out.append(None)
+    return out
+
+def parse_fixes(body: bytes, content_type: str, now: float = None):
+    """
+    ([(unix_seconds, lat, lon), ...] oldest first, number of fixes dropped).
+    Raises BadBatch for an unreadable or oversized payload.
+    """
+    raw = _decode(body, content_type)
+    if len(raw) > BATCH_MAX:
+        raise BadBatch(f"at most {BATCH_MAX} fixes per batch")
+    now = time.time() if now is None else now
+    good = {}
+    for fix in raw:
+        if fix is None:
+            continue
+        t, lat, lon = fix
+        if -90 <= lat <= 90 and -180 <= lon <= 180 and now - MAX_AGE <= t <= now + MAX_SKEW:
+            good[t] = (min(t, now), lat, lon)
+    fixes = sorted(good.values())
+    return fixes, len(raw) - len(fixes)
+
+def record_fixes(conn, driver_id, fixes):
+    """History rows + current position for fixes (oldest first); caller commits."""
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO driver_location_history (driver_id, recorded_at, latitude, longitude)
+        SELECT %s, to_timestamp(t)::timestamp, lat, lon
+        FROM unnest(%s::float8[], %s::float8[], %s::float8[]) AS f(t, lat, lon)
+        ON CONFLICT DO NOTHING
+    """, (driver_id, [f[0] for f in fixes], [f[1] for f in fixes], [f[2] for f in fixes]))
+    t, lat, lon = fixes[-1]
+    cur.execute("SELECT set_driver_location(%s, %s, %s, %s, to_timestamp(%s)::timestamp)",
+                (driver_id, lat, lon, regions.region_of(lat, lon), t))
+    cur.close()
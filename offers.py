@@ -0,0 +1,109 @@
+# offers.py — time-boxed driver offers for Pending bookings
+"""
+A Pending booking is offered to one driver at a time: bookings.driver_id is
+whoever holds the current offer, and booking_offers keeps one row per offer
+with its deadline and outcome. open_offer() also queues an `offer_expire` job
+for the deadline, so the jobs workers are the timer wheel.
+
+On rejection or timeout the caller (app.cascade_offer) closes the offer and
+hands the booking to the next-ranked driver who hasn't seen it yet, at most
+OFFER_MAX_ATTEMPTS offers per booking; time-to-accept is therefore bounded by
+OFFER_TIMEOUT x OFFER_MAX_ATTEMPTS.
+
+Emergency bookings are broadcast instead: driver_id stays NULL while the
+EMERGENCY_FANOUT nearest drivers hold open offers at once (EMERGENCY_TIMEOUT
+each). claim() lets the first of them take it and withdraws the rest; when
+every offer of a round is closed, the next round goes out, up to
+EMERGENCY_MAX_DRIVERS drivers in all.
+
+Every transition first locks the booking row (lock_booking), so an accept
+racing a timeout, a rejection or another accept resolves to exactly one outcome.
+"""
+import os
+
+import jobs
+
+OFFER_TIMEOUT = int(os.environ.get("OFFER_TIMEOUT", "30"))
+OFFER_MAX_ATTEMPTS = int(os.environ.get("OFFER_MAX_ATTEMPTS", "5"))
+EMERGENCY_FANOUT = int(os.environ.get("EMERGENCY_FANOUT", "5"))
+EMERGENCY_TIMEOUT = int(os.environ.get("EMERGENCY_TIMEOUT", "20"))
+EMERGENCY_MAX_DRIVERS = int(os.environ.get("EMERGENCY_MAX_DRIVERS", "15"))
+
+
+def open_offer(conn, booking_id, driver_id, timeout=OFFER_TIMEOUT) -> int:
+    """Offer booking_id to driver_id until now + timeout; caller commits."""
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO booking_offers (booking_id, driver_id, expires_at)
+        VALUES (%s, %s, NOW() + make_interval(secs => %s))
+        RETURNING id
+    """, (booking_id, driver_id, timeout))
+    offer_id = cur.fetchone()[0]; cur.close()
+    jobs.enqueue(conn, "offer_expire", delay=timeout, offer_id=offer_id)
+    return offer_id
+
+def lock_booking(conn, booking_id):
+    """(user_id, driver_id, status, pickup_location), row-locked until commit."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT user_id, driver_id, status, pickup_location FROM bookings
+        WHERE id=%s FOR UPDATE
+    """, (booking_id,))
+    row = cur.fetchone(); cur.close()
+    return row
+
+def close_offer(conn, booking_id, driver_id, outcome) -> bool:
+    """Close driver_id's open offer on booking_id as outcome; False if none was open."""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE booking_offers SET status=%s, closed_at=NOW()
+        WHERE booking_id=%s AND driver_id=%s AND status='open'
+    """, (outcome, booking_id, driver_id))
+    closed = cur.rowcount > 0; cur.close()
+    return closed
+
+def get_offer(conn, offer_id):
+    """(booking_id, driver_id, status) or None."""
+    cur = conn.cursor()
+    cur.execute("SELECT booking_id, driver_id, status FROM booking_offers WHERE id=%s", (offer_id,))
+    row = cur.fetchone(); cur.close()
+    return row
+
+def offered_drivers(conn, booking_id) -> set:
+    """Every driver booking_id has been offered to so far."""
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT driver_id FROM booking_offers WHERE booking_id=%s", (booking_id,))
+    out = {r[0] for r in cur.fetchall()}; cur.close()
+    return out
+
+def has_open_offers(conn, booking_id) -> bool:
+    """True while any driver still holds an open offer on booking_id."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM booking_offers WHERE booking_id=%s AND status='open' LIMIT 1", (booking_id,))
+    row = cur.fetchone(); cur.close()
+    return row is not None
+
+def claim(conn, booking_id, driver_id):
+    """
+    First-accept-wins: driver_id takes booking_id if it is still Pending and
+    either assigned to them or broadcast with their offer open. Returns
+    (user_id, [drivers whose offers were withdrawn]) or None if they lost.
+    """
+    row = lock_booking(conn, booking_id)
+    if not row or row[2] != "Pending":
+        return None
+    user_id, holder = row[0], row[1]
+    if holder not in (None, driver_id):
+        return None
+    if not close_offer(conn, booking_id, driver_id, "accepted") and holder is None:
+        return None   # broadcast, but this driver's offer is gone
+    cur = conn.cursor()
+    cur.execute("UPDATE bookings SET status='Accepted', driver_id=%s WHERE id=%s",
+                (driver_id, booking_id))
+    cur.execute("""
+        UPDATE booking_offers SET status='withdrawn', closed_at=NOW()
+        WHERE booking_id=%s AND status='open'
+        RETURNING driver_id
+    """, (booking_id,))
+    withdrawn = [r[0] for r in cur.fetchall()]; cur.close()
+    return user_id, withdrawn
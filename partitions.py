@@ -0,0 +1,201 @@
+# partitions.py — monthly range partitions for bookings, plus archival
+"""
+bookings is partitioned by RANGE (booking_time), one partition per month
+(bookings_YYYY_MM) plus bookings_default for anything out of range.
+ensure_partitions() keeps MONTHS_AHEAD months pre-created; archive() detaches
+month partitions older than KEEP_MONTHS with no open (Pending/Accepted) trip and
+moves them into the `archive` schema (still queryable, no longer scanned).
+
+Pending listings and counts add LIVE_BOOKINGS so the planner prunes everything
+but the current and previous month. Lookups by id and "has an Accepted trip"
+checks never do: a trip may outlive the window. They stay cheap through the
+primary key and idx_bookings_accepted_driver (one probe per partition).
+
+Existing installs with a plain bookings table keep working until
+    flask --app app bookings-migrate
+copies it into the partitioned layout (one transaction, table locked).
+"""
+import os
+import re
+from datetime import date
+
+ARCHIVE_SCHEMA = "archive"
+MONTHS_AHEAD = int(os.environ.get("BOOKINGS_MONTHS_AHEAD", "2"))
+KEEP_MONTHS = int(os.environ.get("BOOKINGS_KEEP_MONTHS", "6"))
+LIVE_BOOKINGS = "booking_time >= date_trunc('month', NOW()) - INTERVAL '1 month'"
+
+# Unassigned: closed without a driver (every offer declined or expired)
+STATUSES = ("Pending", "Accepted", "Completed", "Unassigned")
+STATUS_LIST = ", ".join(f"'{s}'" for s in STATUSES)
+COLUMNS = ("id, user_id, driver_id, patient_name, phone_no, pickup_location, "
+           "destination, booking_time, status, priority, region")
+_PART_RE = re.compile(r"^bookings_(\d{4})_(\d{2})$")
+
+
+def _add_months(d: date, n: int) -> date:
+    y, m = divmod(d.year * 12 + d.month - 1 + n, 12)
+    return date(y, m + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"bookings_{month.year:04d}_{month.month:02d}"
+
+def is_partitioned(cur) -> bool:
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('public.bookings')")
+    row = cur.fetchone()
+    return bool(row and row[0] == "p")
+
+def create_table(cur):
+    """Partitioned bookings parent (no-op if any bookings table exists)."""
+    cur.execute("CREATE SEQUENCE IF NOT EXISTS bookings_id_seq")
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS bookings (
+        id INT NOT NULL DEFAULT nextval('bookings_id_seq'),
+        user_id INT REFERENCES users(id),
+        driver_id INT REFERENCES users(id),
+        patient_name VARCHAR(100) NOT NULL,
+        phone_no VARCHAR(20) NOT NULL,
+        pickup_location TEXT,
+        destination TEXT NOT NULL,
+        booking_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        status VARCHAR(20) NOT NULL DEFAULT 'Pending' CHECK (status IN ({STATUS_LIST})),
+        priority VARCHAR(20) DEFAULT 'Normal' CHECK (priority IN ('Normal','Emergency')),
+        region TEXT,
+        PRIMARY KEY (id, booking_time)
+    ) PARTITION BY RANGE (booking_time);
+    """)
+    if is_partitioned(cur):
+        cur.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id")
+
+def ensure_status_check(cur):
+    """Widen an older bookings_status_check to every status in STATUSES."""
+    cur.execute("""
+        SELECT pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = 'public.bookings'::regclass AND conname = 'bookings_status_check'
+    """)
+    row = cur.fetchone()
+    if row and all(f"'{s}'" in row[0] for s in STATUSES):
+        return
+    cur.execute("ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_status_check")
+    cur.execute(f"ALTER TABLE bookings ADD CONSTRAINT bookings_status_check CHECK (status IN ({STATUS_LIST}))")
+
+def ensure_partitions(cur, start: date = None, months_ahead: int = MONTHS_AHEAD):
+    """
+    Create month partitions from `start` (default: this month) through
+    months_ahead. Rows that already landed in bookings_default for a new
+    month are moved into it before it is attached.
+    """
+    cur.execute("SELECT to_regclass('public.bookings_default') IS NOT NULL")
+    has_default = cur.fetchone()[0]
+    this_month = date.today().replace(day=1)
+    month = (start or this_month).replace(day=1)
+    last = _add_months(this_month, months_ahead)
+    while month <= last:
+        nxt, name = _add_months(month, 1), partition_name(month)
+        bounds = f"FROM ('{month.isoformat()}') TO ('{nxt.isoformat()}')"
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"public.{name}",))
+        exists = cur.fetchone()[0]
+        if not exists and has_default:
+            _attach_from_default(cur, name, month, nxt)
+        elif not exists:
+            cur.execute(f"CREATE TABLE {name} PARTITION OF bookings FOR VALUES {bounds}")
+        month = nxt
+    if not has_default:
+        cur.execute("CREATE TABLE bookings_default PARTITION OF bookings DEFAULT")
+
+def _attach_from_default(cur, name, month, nxt):
+    """
+    Create month partition `name` next to an existing bookings_default.
+    CREATE ... PARTITION OF fails once the default holds a row for that month
+    (a booking made before its partition existed), so the table is built
+    detached, those rows are moved over, and then it is attached.
+    """
+    cur.execute(f"CREATE TABLE {name} (LIKE bookings INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cur.execute(f"""
+        WITH moved AS (
+            DELETE FROM bookings_default
+            WHERE booking_time >= %s AND booking_time < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (month, nxt))
+    cur.execute(f"ALTER TABLE bookings ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{nxt.isoformat()}')")
+
+def migrate(conn) -> int:
+    """Copy a plain bookings table into the partitioned layout; returns rows moved."""
+    cur = conn.cursor()
+    if is_partitioned(cur):
+        cur.close()
+        return 0
+    cur.execute("LOCK TABLE bookings IN ACCESS EXCLUSIVE MODE")
+    # a partitioned table can't back a FK on id alone
+    cur.execute("ALTER TABLE driver_ratings DROP CONSTRAINT IF EXISTS driver_ratings_booking_id_fkey")
+    cur.execute("ALTER SEQUENCE bookings_id_seq OWNED BY NONE")
+    cur.execute("ALTER TABLE bookings RENAME TO bookings_legacy")
+    cur.execute("ALTER TABLE bookings_legacy ADD COLUMN IF NOT EXISTS region TEXT")   # pre-regions tables
+    cur.execute("ALTER INDEX IF EXISTS bookings_pkey RENAME TO bookings_legacy_pkey")
+    cur.execute("DROP INDEX IF EXISTS idx_bookings_accepted_driver")
+    create_table(cur)
+    cur.execute("SELECT MIN(booking_time) FROM bookings_legacy")
+    oldest = cur.fetchone()[0]
+    ensure_partitions(cur, start=oldest.date() if oldest else None)
+    cur.execute(f"""
+        INSERT INTO bookings ({COLUMNS})
+        SELECT id, user_id, driver_id, patient_name, phone_no, pickup_location,
+               destination, COALESCE(booking_time, NOW()), status, priority, region
+        FROM bookings_legacy
+    """)
+    moved = cur.rowcount
+    cur.execute("SELECT setval('bookings_id_seq', GREATEST((SELECT MAX(id) FROM bookings), 1))")
+    cur.execute("DROP TABLE bookings_legacy")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_accepted_driver ON bookings (driver_id) WHERE status='Accepted'")
+    conn.commit(); cur.close()
+    return moved
+
+def archive(conn, keep_months: int = KEEP_MONTHS):
+    """
+    Detach month partitions that ended more than keep_months ago and hold only
+    closed (Completed/Unassigned) bookings; move them to the archive schema. Returns their names.
+    """
+    cutoff = _add_months(date.today().replace(day=1), -keep_months)
+    cur = conn.cursor()
+    if not is_partitioned(cur):
+        cur.close()
+        return []
+    cur.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.bookings'::regclass
+        ORDER BY c.relname
+    """)
+    archived = []
+    for (name,) in cur.fetchall():
+        m = _PART_RE.match(name)
+        if not m or _add_months(date(int(m[1]), int(m[2]), 1), 1) > cutoff:
+            continue
+        cur.execute(f"SELECT 1 FROM {name} WHERE status IN ('Pending','Accepted') LIMIT 1")
+        if cur.fetchone():
+            continue   # a trip in it is still open; try again next time
+        cur.execute(f"ALTER TABLE bookings DETACH PARTITION {name}")
+        cur.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+        archived.append(name)
+    conn.commit(); cur.close()
+    return archived
+
+
+def init_app(app, get_connection):
+    @app.cli.command("bookings-migrate")
+    def bookings_migrate_command():
+        """Move a plain bookings table into monthly partitions."""
+        conn = get_connection()
+        print(f"Moved {migrate(conn)} bookings into partitions")
+        conn.close()
+
+    @app.cli.command("bookings-archive")
+    def bookings_archive_command():
+        """Detach old, fully Completed month partitions into the archive schema."""
+        conn = get_connection()
+        names = archive(conn)
+        conn.close()
+        print("Archived: " + (", ".join(names) or "nothing"))
@@ -0,0 +1,119 @@
+# passwords.py — PBKDF2/scrypt hashing off the request thread
+"""
+Password hashing is CPU-bound; under eventlet it stalls every green thread on
+the worker. Hash/verify calls are shipped to a small process pool instead.
+The pool is bounded (HASH_POOL_SIZE workers + HASH_MAX_QUEUED waiting calls);
+beyond that, or past HASH_TIMEOUT seconds, callers get HashingBusy.
+HASH_POOL_SIZE=0 runs everything inline (handy for debugging).
+"""
+import os
+import hashlib
+import hmac
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+POOL_SIZE = int(os.environ.get("HASH_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+MAX_QUEUED = int(os.environ.get("HASH_MAX_QUEUED", "64"))
+TIMEOUT = float(os.environ.get("HASH_TIMEOUT", "5"))
+
+class HashingBusy(Exception):
+    """Pool saturated or the hash did not finish within HASH_TIMEOUT."""
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(1, POOL_SIZE + MAX_QUEUED))
+
+
+# ------------------------------
+# Pure functions (run inside the pool)
+# ------------------------------
+def _is_legacy_sha256(stored_hash: str) -> bool:
+    sh = (stored_hash or "").strip().lower()
+    return len(sh) == 64 and all(c in "0123456789abcdef" for c in sh)
+
+def verify_password(input_password: str, stored_hash: str) -> bool:
+    """Accept PBKDF2/Scrypt (werkzeug) and legacy SHA-256 hex."""
+    if not stored_hash:
+        return False
+    if stored_hash.startswith(("pbkdf2:", "scrypt:")):
+        return check_password_hash(stored_hash, input_password)
+    if _is_legacy_sha256(stored_hash):
+        digest = hashlib.sha256(input_password.encode()).hexdigest()
+        return hmac.compare_digest(digest, stored_hash.strip().lower())
+    return False
+
+def _verify_and_upgrade(input_password, stored_hash):
+    """(ok, new_hash) — new_hash is set only when a legacy hash matched."""
+    ok = verify_password(input_password, stored_hash)
+    if ok and _is_legacy_sha256(stored_hash):
+        return True, generate_password_hash(input_password)
+    return ok, None
+
+
+# ------------------------------
+# Pool plumbing
+# ------------------------------
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=POOL_SIZE)
+        return _pool
+
+def _reset_pool(wait=False):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=True)
+        _pool = None
+
+def shutdown():
+    """Stop the worker processes (e.g. before a worker process exits)."""
+    _reset_pool(wait=True)
+
+def _submit(fn, *args):
+    try:
+        return _get_pool().submit(fn, *args)
+    except BrokenProcessPool:
+        _reset_pool()
+        return _get_pool().submit(fn, *args)
+
+def _run(fn, *args):
+    if POOL_SIZE <= 0:
+        return fn(*args)
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy("password hashing queue is full")
+    try:
+        fut = _submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # the slot is freed when the worker is done with the call, not when we stop
+    # waiting: a timed-out hash still occupies a worker until it finishes
+    fut.add_done_callback(lambda _: _slots.release())
+    try:
+        return fut.result(timeout=TIMEOUT)
+    except FutureTimeout:
+        fut.cancel()
+        raise HashingBusy("password hashing timed out")
+    except BrokenProcessPool:
+        _reset_pool()
+        raise HashingBusy("password hashing worker died")
+
+
+# ------------------------------
+# Public API
+# ------------------------------
+def hash_password(password: str) -> str:
+    return _run(generate_password_hash, password)
+
+def check_password(input_password: str, stored_hash: str):
+    """
+    Verify in the pool. Returns (ok, upgraded_hash): upgraded_hash is a fresh
+    werkzeug hash when a legacy SHA-256 hash matched, so the caller can store it.
+    """
+    if not stored_hash:
+        return False, None
+    return _run(_verify_and_upgrade, input_password, stored_hash)
@@ -0,0 +1,174 @@
+# ratelimit.py — per-client token buckets for ping and polling endpoints
+"""
+Views opt in with @rate_limit(<budget>). Every (endpoint, client) pair gets a
+token bucket of BUDGETS[budget] = (refill per second, burst); the client is
+the signed-in user, or the remote address for anonymous calls. A call with no
+token left gets a 429 with Retry-After from the first before_request hook, so
+it never reaches the database (only the session load, which Flask does before
+any hook, has run).
+
+Budgets are overridable with RATE_<BUDGET>_PER_SEC / RATE_<BUDGET>_BURST.
+
+RATE_LIMIT_BACKEND picks where buckets live:
+    memory    per worker process (default); at most RATE_LIMIT_MAX_KEYS buckets,
+              least recently used dropped first (a dropped bucket starts full)
+    postgres  rate_limit_buckets, shared by all workers: one upsert per call
+              that only takes a token if one is there. If the database is
+              unreachable the call is let through and counted as an error.
+    off       no limiting
+Allowed/throttled counters per endpoint are exposed through snapshot().
+"""
+import os
+import math
+import time
+import threading
+from collections import OrderedDict
+
+from flask import jsonify, render_template, request, session
+
+import database
+
+BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "50000"))
+
+
+def _budget(name, per_sec, burst):
+    env = name.upper()
+    return (float(os.environ.get(f"RATE_{env}_PER_SEC", per_sec)),
+            float(os.environ.get(f"RATE_{env}_BURST", burst)))
+
+# name -> (tokens refilled per second, bucket size)
+BUDGETS = {
+    "ping":  _budget("ping", "0.5", "10"),    # live pings come every 5 s at the fastest
+    "batch": _budget("batch", "0.2", "5"),    # offline replays, one per reconnect
+    "poll":  _budget("poll", "1", "10"),      # trip map refreshes every 5 s
+}
+
+
+class MemoryBuckets:
+    """Token buckets in this process: key -> (tokens, last refill)."""
+    def __init__(self, max_keys=MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now=None):
+        """(allowed, seconds until the next token)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+class PgBuckets:
+    """Token buckets in rate_limit_buckets, shared by every worker."""
+    def take(self, key, rate, burst):
+        with database.pooled_connection() as conn:
+            cur = conn.cursor()
+            # refill and take in one statement; the row is left alone when empty
+            cur.execute("""
+                INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+                VALUES (%(key)s, %(burst)s - 1, clock_timestamp())
+                ON CONFLICT (key) DO UPDATE
+                  SET tokens = LEAST(%(burst)s, b.tokens + %(rate)s
+                                 * EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at)) - 1,
+                      updated_at = clock_timestamp()
+                  WHERE LEAST(%(burst)s, b.tokens + %(rate)s
+                              * EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at)) >= 1
+                RETURNING tokens
+            """, {"key": key, "rate": rate, "burst": burst})
+            allowed = cur.fetchone() is not None
+            wait = 0.0
+            if not allowed:
+                cur.execute("""
+                    SELECT LEAST(%s, tokens + %s * EXTRACT(EPOCH FROM clock_timestamp() - updated_at))
+                    FROM rate_limit_buckets WHERE key=%s
+                """, (burst, rate, key))
+                row = cur.fetchone()
+                wait = (1 - float(row[0])) / rate if row else 0.0
+            conn.commit(); cur.close()
+        return allowed, wait
+
+def _make_store(backend):
+    if backend == "postgres":
+        return PgBuckets()
+    if backend == "off":
+        return None
+    return MemoryBuckets()
+
+store = _make_store(BACKEND)
+
+_stats = {}   # endpoint -> {"allowed", "throttled", "errors"}
+_stats_lock = threading.Lock()
+
+
+def rate_limit(budget):
+    """View decorator: limit each client to BUDGETS[budget] on this endpoint."""
+    if budget not in BUDGETS:
+        raise ValueError(f"unknown rate-limit budget {budget!r}")
+    def deco(fn):
+        fn.rate_budget = budget
+        return fn
+    return deco
+
+def client_key() -> str:
+    uid = session.get("user_id")
+    return f"u{uid}" if uid is not None else f"ip{request.remote_addr}"
+
+def _count(endpoint, outcome):
+    with _stats_lock:
+        row = _stats.setdefault(endpoint, {"allowed": 0, "throttled": 0, "errors": 0})
+        row[outcome] += 1
+
+def snapshot() -> dict:
+    with _stats_lock:
+        routes = {ep: dict(row) for ep, row in _stats.items()}
+    out = {"backend": BACKEND if store is not None else "off",
+           "budgets": {name: {"per_sec": r, "burst": b} for name, (r, b) in BUDGETS.items()},
+           "routes": routes}
+    if isinstance(store, MemoryBuckets):
+        out["buckets"] = len(store)
+    return out
+
+
+def _throttled(retry_after):
+    if request.accept_mimetypes.best == "text/html":
+        body = render_template("error.html", code=429, message="Too many requests, slow down")
+        return body, 429, {"Retry-After": str(retry_after)}
+    resp = jsonify({"error": "rate_limited", "retry_after": retry_after})
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(retry_after)
+    return resp
+
+
+def init_app(app):
+    """Register the limiter hook; call before admission.init_app so throttled calls skip the gates too."""
+
+    @app.before_request
+    def _rate_limit_request():
+        if store is None or request.endpoint in (None, "static"):
+            return
+        budget = getattr(app.view_functions.get(request.endpoint), "rate_budget", None)
+        if budget is None:
+            return
+        rate, burst = BUDGETS[budget]
+        try:
+            allowed, wait = store.take(f"{request.endpoint}:{client_key()}", rate, burst)
+        except Exception as e:
+            app.logger.warning("rate limiter unavailable, letting call through: %s", e)
+            _count(request.endpoint, "errors")
+            return
+        if allowed:
+            _count(request.endpoint, "allowed")
+            return
+        _count(request.endpoint, "throttled")
+        return _throttled(max(1, math.ceil(wait)))
@@ -0,0 +1,152 @@
+# regions.py — region map and the region-partitioned driver_location table
+"""
+Every driver position and booking carries a region key derived from its
+coordinates. The map is a set of named boxes, REGIONS (name -> (min_lat,
+max_lat, min_lon, max_lon)); a point outside all of them is in OTHER. The
+default map covers the main Nepali cities; REGION_MAP=<path to JSON> replaces
+it with {"name": [min_lat, max_lat, min_lon, max_lon], ...}.
+
+driver_location is partitioned BY LIST (region): driver_location_<name> per
+region plus driver_location_other as the DEFAULT partition, so a city's pings,
+its indexes and its availability queries never touch another city's rows.
+Searches ask for regions_in_box(...) of their bounding box and the planner
+prunes the rest. All writes go through set_driver_location(), which moves a
+driver's row when their ping lands in another region.
+
+Regions added to the map get their partition on the next initialize_db; rows
+keep the region they were written with until the driver's next ping.
+"""
+import os
+import re
+import json
+
+OTHER = "other"
+
+DEFAULT_REGIONS = {
+    "kathmandu":  (27.55, 27.82, 85.18, 85.55),   # valley incl. Lalitpur, Bhaktapur
+    "pokhara":    (28.10, 28.32, 83.85, 84.10),
+    "biratnagar": (26.35, 26.65, 87.10, 87.45),
+    "dharan":     (26.70, 26.95, 87.15, 87.40),
+    "birgunj":    (26.90, 27.15, 84.75, 85.00),
+    "butwal":     (27.60, 27.80, 83.35, 83.55),
+    "nepalgunj":  (27.95, 28.15, 81.50, 81.75),
+}
+_NAME_RE = re.compile(r"^[a-z][a-z0-9_]{0,39}$")   # becomes part of a table name
+
+
+def load_map(path=None) -> dict:
+    """REGIONS from a JSON file (or the default map); raises ValueError on a bad map."""
+    if not path:
+        return dict(DEFAULT_REGIONS)
+    with open(path) as f:
+        raw = json.load(f)
+    out = {}
+    for name, box in raw.items():
+        if not _NAME_RE.match(name) or name == OTHER:
+            raise ValueError(f"bad region name {name!r}")
+        if len(box) != 4 or not (box[0] < box[1] and box[2] < box[3]):
+            raise ValueError(f"region {name!r}: expected [min_lat, max_lat, min_lon, max_lon]")
+        out[name] = tuple(float(v) for v in box)
+    return out
+
+REGIONS = load_map(os.environ.get("REGION_MAP"))
+
+
+def region_of(lat, lon) -> str:
+    """Region key of a point; OTHER outside the map (or without coordinates)."""
+    if lat is None or lon is None:
+        return OTHER
+    for name, (lat0, lat1, lon0, lon1) in REGIONS.items():
+        if lat0 <= lat <= lat1 and lon0 <= lon <= lon1:
+            return name
+    return OTHER
+
+def regions_in_box(min_lat, max_lat, min_lon, max_lon) -> list:
+    """Regions a search box overlaps; OTHER too unless one region contains the whole box."""
+    hits = []
+    for name, (lat0, lat1, lon0, lon1) in REGIONS.items():
+        if lat0 <= max_lat and min_lat <= lat1 and lon0 <= max_lon and min_lon <= lon1:
+            if lat0 <= min_lat and max_lat <= lat1 and lon0 <= min_lon and max_lon <= lon1:
+                return [name]
+            hits.append(name)
+    return hits + [OTHER]
+
+def partition_name(region: str) -> str:
+    return f"driver_location_{region}"
+
+
+# ------------------------------
+# driver_location storage
+# ------------------------------
+def _relkind(cur):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('public.driver_location')")
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def create_table(cur):
+    """
+    Partitioned driver_location with one partition per region. A plain table
+    from before regions is converted in place (one row per driver, so cheap).
+    """
+    legacy = _relkind(cur) == "r"
+    if legacy:
+        cur.execute("LOCK TABLE driver_location IN ACCESS EXCLUSIVE MODE")
+        cur.execute("ALTER TABLE driver_location RENAME TO driver_location_legacy")
+        cur.execute("DROP INDEX IF EXISTS idx_driver_location_lat_lon")
+        cur.execute("ALTER TABLE driver_location_legacy DROP CONSTRAINT IF EXISTS driver_location_pkey")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS driver_location (
+        driver_id INT NOT NULL REFERENCES users(id),
+        region TEXT NOT NULL,
+        latitude DOUBLE PRECISION,
+        longitude DOUBLE PRECISION,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (driver_id, region)
+    ) PARTITION BY LIST (region);
+    """)
+    ensure_partitions(cur)
+    # the one writer: staying in the region touches that partition only; a
+    # driver who changed region has the old row replaced. Older fixes never
+    # overwrite a newer position. The primary key can't say "one row per
+    # driver" across partitions, so each driver's writes are serialised with a
+    # transaction-level advisory lock (namespaced by the table's oid).
+    cur.execute("""
+    CREATE OR REPLACE FUNCTION set_driver_location(p_driver INT, p_lat FLOAT8, p_lon FLOAT8,
+                                                   p_region TEXT, p_at TIMESTAMP) RETURNS void AS $$
+    BEGIN
+        PERFORM pg_advisory_xact_lock('driver_location'::regclass::oid::int, p_driver);
+        UPDATE driver_location SET latitude=p_lat, longitude=p_lon, updated_at=p_at
+        WHERE driver_id=p_driver AND region=p_region AND (updated_at IS NULL OR updated_at <= p_at);
+        IF FOUND THEN
+            RETURN;
+        END IF;
+        IF EXISTS (SELECT 1 FROM driver_location WHERE driver_id=p_driver AND updated_at > p_at) THEN
+            RETURN;
+        END IF;
+        DELETE FROM driver_location WHERE driver_id=p_driver AND region<>p_region;
+        INSERT INTO driver_location (driver_id, region, latitude, longitude, updated_at)
+        VALUES (p_driver, p_region, p_lat, p_lon, p_at)
+        ON CONFLICT (driver_id, region) DO UPDATE
+          SET latitude=EXCLUDED.latitude, longitude=EXCLUDED.longitude, updated_at=EXCLUDED.updated_at;
+    END
+    $$ LANGUAGE plpgsql;
+    """)
+    if legacy:
+        cur.execute("SELECT driver_id, latitude, longitude, updated_at FROM driver_location_legacy")
+        rows = cur.fetchall()
+        cur.execute("""
+            INSERT INTO driver_location (driver_id, region, latitude, longitude, updated_at)
+            SELECT * FROM unnest(%s::int[], %s::text[], %s::float8[], %s::float8[], %s::timestamp[])
+        """, ([r[0] for r in rows], [region_of(r[1], r[2]) for r in rows],
+              [r[1] for r in rows], [r[2] for r in rows], [r[3] for r in rows]))
+        cur.execute("DROP TABLE driver_location_legacy")
+
+def ensure_partitions(cur):
+    """One partition per region in REGIONS, plus the DEFAULT one for OTHER."""
+    for region in list(REGIONS) + [OTHER]:
+        name = partition_name(region)
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"public.{name}",))
+        if cur.fetchone()[0]:
+            continue
+        bounds = "DEFAULT" if region == OTHER else f"FOR VALUES IN ('{region}')"
+        cur.execute(f"CREATE TABLE {name} PARTITION OF driver_location {bounds}")
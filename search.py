@@ -0,0 +1,100 @@
+# search.py — indexed admin search over users and bookings
+"""
+Full-text search with prefix matching ('raj:*'), backed by GIN indexes on the
+same tsvector expressions used in the queries below, plus btree
+text_pattern_ops indexes on lower(...) for autocomplete prefixes. Both are
+built into Postgres (no extension needed) and stay index-driven on large
+tables; every query is LIMITed.
+"""
+import re
+
+MIN_QUERY = 2
+MAX_LIMIT = 50
+
+USERS_DOC = "to_tsvector('simple', username || ' ' || email)"
+BOOKINGS_DOC = ("to_tsvector('simple', patient_name || ' ' || phone_no || ' ' || "
+                "COALESCE(pickup_location, '') || ' ' || destination)")
+
+_TERM_RE = re.compile(r"[\w@.+-]+", re.UNICODE)
+
+
+def create_indexes(cur):
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_users_search ON users USING GIN (({USERS_DOC}));")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_bookings_search ON bookings USING GIN (({BOOKINGS_DOC}));")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_username_prefix ON users (lower(username) text_pattern_ops);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_email_prefix ON users (lower(email) text_pattern_ops);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_patient_prefix ON bookings (lower(patient_name) text_pattern_ops);")
+
+def prefix_query(q: str):
+    """'ram 984' -> "'ram':* & '984':*", or None when nothing searchable is left."""
+    terms = [t.lower() for t in _TERM_RE.findall(q or "")]
+    if not terms or len("".join(terms)) < MIN_QUERY:
+        return None
+    return " & ".join(f"'{t}':*" for t in terms)
+
+def _limit(limit):
+    return max(1, min(int(limit), MAX_LIMIT))
+
+def search_users(conn, q: str, limit=20):
+    tsq = prefix_query(q)
+    if tsq is None:
+        return []
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT id, username, email, role, is_verified
+        FROM users
+        WHERE {USERS_DOC} @@ to_tsquery('simple', %s)
+        ORDER BY ts_rank({USERS_DOC}, to_tsquery('simple', %s)) DESC, id DESC
+        LIMIT %s
+    """, (tsq, tsq, _limit(limit)))
+    rows = cur.fetchall(); cur.close()
+    return [{"id": r[0], "username": r[1], "email": r[2], "role": r[3], "is_verified": r[4]} for r in rows]
+
+def search_bookings(conn, q: str, limit=20):
+    tsq = prefix_query(q)
+    if tsq is None:
+        return []
+    cur = conn.cursor()
+    cur.execute(f"""
+        WITH hits AS (
+            SELECT id, patient_name, phone_no, pickup_location, destination,
+                   status, booking_time, user_id, driver_id
+            FROM bookings
+            WHERE {BOOKINGS_DOC} @@ to_tsquery('simple', %s)
+            ORDER BY booking_time DESC
+            LIMIT %s
+        )
+        SELECT h.id, h.patient_name, h.phone_no, h.pickup_location, h.destination,
+               h.status, h.booking_time, u.username, d.username
+        FROM hits h
+        LEFT JOIN users u ON u.id = h.user_id
+        LEFT JOIN users d ON d.id = h.driver_id
+        ORDER BY h.booking_time DESC
+    """, (tsq, _limit(limit)))
+    rows = cur.fetchall(); cur.close()
+    return [{"id": r[0], "patient_name": r[1], "phone_no": r[2], "pickup_location": r[3],
+             "destination": r[4], "status": r[5], "booking_time": r[6].isoformat() if r[6] else None,
+             "user": r[7], "driver": r[8]} for r in rows]
+
+def autocomplete(conn, q: str, limit=10):
+    """Distinct usernames, emails and patient names starting with q."""
+    prefix = (q or "").strip().lower()
+    if len(prefix) < MIN_QUERY:
+        return []
+    pattern = prefix.replace("\\", "\\\\").replace("%", r"\%").replace("_", r"\_") + "%"
+    n = _limit(limit)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT v FROM (
+            (SELECT username AS v FROM users WHERE lower(username) LIKE %(p)s ORDER BY lower(username) LIMIT %(n)s)
+            UNION
+            (SELECT email FROM users WHERE lower(email) LIKE %(p)s ORDER BY lower(email) LIMIT %(n)s)
+            UNION
+            (SELECT patient_name FROM bookings WHERE lower(patient_name) LIKE %(p)s
+             ORDER BY lower(patient_name) LIMIT %(n)s)
+        ) s
+        ORDER BY lower(v)
+        LIMIT %(n)s
+    """, {"p": pattern, "n": n})
+    out = [r[0] for r in cur.fetchall()]; cur.close()
+    return out
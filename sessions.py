@@ -0,0 +1,245 @@
+# sessions.py — server-side sessions: Postgres table + in-process LRU front
+"""
+The cookie only carries a random opaque id (no payload, no HMAC); session
+data lives in the `sessions` table. Loading is lazy: nothing is read until a
+handler actually touches the session (the app's per-request hooks skip static
+files and cookieless requests, see has_data()). A loaded session is written
+back only when its data differs from what was loaded, or to push out its
+expiry, so in-place changes are saved and no-op writes are not. Each worker keeps a small LRU of
+serialized sessions, trusted only while the event bus listener is connected
+(other workers' writes evict entries through the "session" topic).
+Expired rows are swept every SWEEP_INTERVAL seconds by whichever worker saves.
+"""
+import os
+import re
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+
+import database
+import events
+
+LRU_SIZE = int(os.environ.get("SESSION_LRU_SIZE", "10000"))
+SWEEP_INTERVAL = int(os.environ.get("SESSION_SWEEP_INTERVAL", "600"))
+_SID_RE = re.compile(r"^[A-Za-z0-9_-]{22}$")
+
+
+class LazySession(SessionMixin):
+    """Dict-like session that loads its data on first access."""
+
+    def __init__(self, store, sid=None):
+        self._store = store
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.expires_at = None
+        self.replaced_sid = None
+        self._data = None
+        self._loaded_payload = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def data(self) -> dict:
+        self.accessed = True
+        if self._data is None:
+            data, expires_at = (None, None) if self.new else self._store.load(self.sid)
+            if data is None and not self.new:
+                self.sid, self.new = None, True   # unknown/expired id -> fresh session
+            self._data = data or {}
+            self.expires_at = expires_at
+            if not self.new:
+                self._loaded_payload = self._store.serializer.dumps(self._data)
+        return self._data
+
+    def changed(self) -> bool:
+        """Data differs from what was loaded (catches in-place edits too)."""
+        return self._store.serializer.dumps(dict(self.data)) != self._loaded_payload
+
+    def regenerate(self):
+        """Keep the data under a new id; the old row is deleted on save."""
+        self.data   # load before the id goes away
+        if not self.new:
+            self.replaced_sid = self.sid
+        self.sid, self.new, self.modified = None, True, True
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def has_data(session) -> bool:
+    """
+    False when there is nothing to read: no session id came with the request
+    and nothing has been set yet. Lets per-request hooks skip the load.
+    """
+    if isinstance(session, LazySession):
+        return session.sid is not None or bool(session._data)
+    return True
+
+def rotate(session):
+    """
+    Issue a new session id for the current data (call on login), so an id
+    planted before authentication never becomes an authenticated one. Cookie
+    sessions carry their data client-side and need nothing.
+    """
+    if isinstance(session, LazySession):
+        session.regenerate()
+
+
+class PgSessionStore:
+    def __init__(self, lru_size=LRU_SIZE):
+        self.serializer = TaggedJSONSerializer()
+        self.lru_size = lru_size
+        self._lru = OrderedDict()   # sid -> (payload, expires_at)
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    # LRU front -------------------------------------------------------
+    def _lru_get(self, sid):
+        if not events.listening():
+            return None
+        with self._lock:
+            hit = self._lru.get(sid)
+            if hit: self._lru.move_to_end(sid)
+            return hit
+
+    def _lru_put(self, sid, payload, expires_at):
+        with self._lock:
+            self._lru[sid] = (payload, expires_at)
+            self._lru.move_to_end(sid)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def evict(self, sid):
+        with self._lock:
+            self._lru.pop(sid, None)
+
+    # Storage ---------------------------------------------------------
+    def load(self, sid):
+        """(data, expires_at) or (None, None) if missing/expired."""
+        hit = self._lru_get(sid)
+        if hit is None:
+            conn = database.get_db_connection(); cur = conn.cursor()
+            cur.execute("SELECT data, expires_at FROM sessions WHERE sid=%s AND expires_at > %s",
+                        (sid, datetime.now()))
+            row = cur.fetchone(); cur.close(); conn.close()
+            if not row:
+                return None, None
+            hit = (row[0], row[1])
+            self._lru_put(sid, *hit)
+        payload, expires_at = hit
+        if expires_at <= datetime.now():
+            self.evict(sid)
+            return None, None
+        return self.serializer.loads(payload), expires_at
+
+    def save(self, sid, data, expires_at):
+        payload = self.serializer.dumps(dict(data))
+        conn = database.get_db_connection(); cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO sessions (sid, data, expires_at) VALUES (%s,%s,%s)
+            ON CONFLICT (sid) DO UPDATE SET data=EXCLUDED.data, expires_at=EXCLUDED.expires_at
+        """, (sid, payload, expires_at))
+        events.publish(conn, "session", sid=sid)
+        conn.commit(); cur.close(); conn.close()
+        self._lru_put(sid, payload, expires_at)
+        self.maybe_sweep()
+
+    def delete(self, sid):
+        conn = database.get_db_connection(); cur = conn.cursor()
+        cur.execute("DELETE FROM sessions WHERE sid=%s", (sid,))
+        events.publish(conn, "session", sid=sid)
+        conn.commit(); cur.close(); conn.close()
+        self.evict(sid)
+
+    def sweep(self):
+        """Delete expired sessions; returns the number removed."""
+        conn = database.get_db_connection(); cur = conn.cursor()
+        cur.execute("DELETE FROM sessions WHERE expires_at <= %s", (datetime.now(),))
+        removed = cur.rowcount
+        conn.commit(); cur.close(); conn.close()
+        return removed
+
+    def maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        try:
+            self.sweep()
+        except Exception as e:
+            print("⚠️ session sweep failed:", e)
+
+
+class PgSessionInterface(SessionInterface):
+    def __init__(self, store=None):
+        self.store = store or PgSessionStore()
+
+        @events.subscribe("session")
+        def _evict_session(payload):
+            if payload.get("pid") != os.getpid():
+                self.store.evict(payload.get("sid"))
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid or not _SID_RE.match(sid):
+            sid = None
+        return LazySession(self.store, sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session.loaded:
+            return   # handler never touched the session: nothing to do
+        response.vary.add("Cookie")
+        if session.replaced_sid:
+            self.store.delete(session.replaced_sid)
+            session.replaced_sid = None
+
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime
+        expires_at = datetime.now() + lifetime
+        stale = session.expires_at is None or session.expires_at - datetime.now() < lifetime / 2
+        if session.new:
+            session.sid = secrets.token_urlsafe(16)
+        elif not (stale or session.changed()):
+            return   # same data as loaded: keeps hot paths (pings) from rewriting the row
+        self.store.save(session.sid, session.data, expires_at)
+
+        if session.new or session.permanent:
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain, path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
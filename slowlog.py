@@ -0,0 +1,174 @@
+# slowlog.py — opt-in slow-request log with query plans
+"""
+With SLOW_REQUEST_MS set, every request is traced (database.start_query_trace)
+and those slower than the threshold write one JSON line to SLOW_LOG_PATH
+(rotated at SLOW_LOG_MAX_BYTES, SLOW_LOG_BACKUPS files kept): route, method,
+status, role, total ms, and each statement with its duration. Statements are
+logged as normalized shapes — literals become ?, parameters are only counted —
+so no user data ends up in the file.
+
+Statements slower than SLOW_QUERY_MS get explained once per shape per
+process, on a separate connection, after the response has gone out; the plan
+is written as its own {"type": "plan"} line and referenced from request
+records by shape id. Only read-only shapes get EXPLAIN (ANALYZE, BUFFERS) —
+run in a READ ONLY transaction that is rolled back. Anything that could
+write, lock or bump a sequence (INSERT/UPDATE/DELETE, FOR UPDATE/SHARE,
+data-modifying CTEs, calls to volatile user functions such as
+set_driver_location) gets a plain EXPLAIN and is never executed again.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+
+from flask import g, request, session
+
+import database
+
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))   # 0 = off
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+SLOW_LOG_PATH = os.environ.get("SLOW_LOG_PATH", "slow_requests.log")
+SLOW_LOG_MAX_BYTES = int(os.environ.get("SLOW_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_LOG_BACKUPS = int(os.environ.get("SLOW_LOG_BACKUPS", "5"))
+EXPLAIN_TIMEOUT_MS = 5000
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_RE = re.compile(r"%s|%\(\w+\)s|\$\d+")
+_EXECUTE_RE = re.compile(r"^EXECUTE\s+(\w+)", re.I)
+_WRITES_RE = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|FOR\s+(NO\s+KEY\s+)?UPDATE|FOR\s+(KEY\s+)?SHARE"
+                        r"|nextval|setval|pg_advisory\w*|pg_notify)\b", re.I)
+_CALL_RE = re.compile(r"\b([A-Za-z_]\w*)\s*\(")
+
+_explained = set()   # shape ids whose plan this process already wrote
+_explained_lock = threading.Lock()
+_logger = None
+
+
+def normalize(sql) -> str:
+    """Query shape: literals and placeholders -> ?, whitespace collapsed."""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    sql = " ".join(str(sql).split())
+    m = _EXECUTE_RE.match(sql)
+    if m:
+        return m.group(0)   # EXECUTE name (...) -> EXECUTE name
+    sql = _STRING_RE.sub("?", sql)
+    sql = _PARAM_RE.sub("?", sql)
+    return _NUMBER_RE.sub("?", sql)
+
+def shape_id(shape: str) -> str:
+    return hashlib.sha1(shape.encode()).hexdigest()[:12]
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("ambulance.slowlog")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        for old in list(logger.handlers):
+            logger.removeHandler(old); old.close()
+        handler = RotatingFileHandler(SLOW_LOG_PATH, maxBytes=SLOW_LOG_MAX_BYTES,
+                                      backupCount=SLOW_LOG_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+def _write(record):
+    _get_logger().info(json.dumps(record, default=str))
+
+def _n_params(vars):
+    if vars is None:
+        return 0
+    return len(vars) if isinstance(vars, (list, tuple, dict)) else 1
+
+def read_only(cur, sql) -> bool:
+    """True if running sql again can't write, lock rows or call a volatile user function."""
+    if sql.split(None, 1)[0].upper() not in ("SELECT", "WITH") or _WRITES_RE.search(sql):
+        return False
+    names = sorted({n.lower() for n in _CALL_RE.findall(sql)})
+    cur.execute("""
+        SELECT 1 FROM pg_proc p JOIN pg_namespace n ON n.oid = p.pronamespace
+        WHERE p.proname = ANY(%s) AND p.provolatile = 'v'
+          AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+        LIMIT 1
+    """, (names,))
+    return cur.fetchone() is None
+
+def explain(sql, vars):
+    """
+    (plan lines, analyzed). Read-only statements run under EXPLAIN (ANALYZE,
+    BUFFERS) in a rolled-back READ ONLY transaction; the rest are only planned.
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    m = _EXECUTE_RE.match(sql.strip())
+    if m and m.group(1) in database.PREPARED:
+        sql = database.PREPARED[m.group(1)][1]   # plain text of a prepared statement
+    conn = database.get_db_connection()
+    try:
+        cur = conn.cursor()
+        analyze = read_only(cur, sql)
+        conn.rollback()
+        if analyze:
+            cur.execute("SET TRANSACTION READ ONLY")
+        cur.execute("SET LOCAL statement_timeout = %s", (EXPLAIN_TIMEOUT_MS,))
+        cur.execute(("EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN ") + sql, vars)
+        plan = [r[0] for r in cur.fetchall()]
+        cur.close()
+        return plan, analyze
+    finally:
+        conn.rollback()
+        conn.close()
+
+def record(route, method, status, role, total_ms, log):
+    """Write the request record, then capture plans for new slow shapes."""
+    statements, to_explain = [], []
+    for sql, seconds, vars in log:
+        shape = normalize(sql)
+        sid = shape_id(shape)
+        ms = round(seconds * 1000, 2)
+        statements.append({"shape": sid, "ms": ms, "sql": shape, "params": _n_params(vars)})
+        if ms >= SLOW_QUERY_MS and shape.split(" ", 1)[0].upper() in _EXPLAINABLE + ("EXECUTE",):
+            with _explained_lock:
+                if sid in _explained:
+                    continue
+                _explained.add(sid)
+            to_explain.append((sid, shape, sql, vars))
+    _write({"type": "request", "at": time.strftime("%Y-%m-%dT%H:%M:%S"), "route": route,
+            "method": method, "status": status, "role": role, "ms": round(total_ms, 2),
+            "db_ms": round(sum(s["ms"] for s in statements), 2), "statements": statements})
+    for sid, shape, sql, vars in to_explain:
+        try:
+            plan, analyzed = explain(sql, vars)
+        except Exception as e:
+            plan, analyzed = [f"EXPLAIN failed: {type(e).__name__}: {e}"], False
+        _write({"type": "plan", "shape": sid, "sql": shape, "analyzed": analyzed, "plan": plan})
+
+
+def init_app(app):
+    @app.before_request
+    def _slowlog_start():
+        if SLOW_REQUEST_MS <= 0:
+            return
+        g.slowlog_t0 = time.perf_counter()
+        database.start_query_trace(params=True)
+
+    @app.after_request
+    def _slowlog_finish(resp):
+        t0 = g.pop("slowlog_t0", None)
+        if t0 is None:
+            return resp
+        log = database.stop_query_trace()
+        total_ms = (time.perf_counter() - t0) * 1000
+        if total_ms >= SLOW_REQUEST_MS:
+            rule = request.url_rule.rule if request.url_rule else request.path
+            args = (rule, request.method, resp.status_code, session.get("role"), total_ms, log or [])
+            resp.call_on_close(lambda: record(*args))
+        return resp
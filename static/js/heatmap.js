@@ -0,0 +1,41 @@
+// === Demand heatmap overlay ===
+// Any element with [data-demand-map] becomes a Leaflet map shaded by
+// /api/heatmap cells (pickups per geohash cell over data-hours, default 24).
+// Cells are re-fetched for the visible bounds after the map stops moving.
+
+(function(){
+  if (!window.L) return;
+  document.querySelectorAll('[data-demand-map]').forEach(el=>{
+    const hours = el.dataset.hours || 24;
+    const map = L.map(el, { zoomControl: true }).setView([27.7, 85.33], 12);
+    L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', { maxZoom: 19, attribution: '&copy; OpenStreetMap' }).addTo(map);
+    const layer = L.layerGroup().addTo(map);
+    let fitted = false, timer = null;
+
+    async function load(){
+      const b = map.getBounds();
+      const bbox = [b.getSouth(), b.getWest(), b.getNorth(), b.getEast()].map(v=>v.toFixed(4)).join(',');
+      const url = fitted ? `/api/heatmap?hours=${hours}&bbox=${bbox}` : `/api/heatmap?hours=${hours}`;
+      let data;
+      try { data = await (await fetch(url)).json(); } catch(e){ return; }
+      if (!data.cells) return;
+      layer.clearLayers();
+      const max = Math.max(1, ...data.cells.map(c=>c[5]));
+      data.cells.forEach(([cell, s, w, n, e, count])=>{
+        const t = count / max;
+        L.rectangle([[s, w], [n, e]], {
+          stroke: false, fillColor: t > .66 ? '#dc2626' : t > .33 ? '#f97316' : '#facc15',
+          fillOpacity: .25 + .5*t
+        }).bindTooltip(`${count} pickup${count===1?'':'s'}`).addTo(layer);
+      });
+      if (!fitted && data.cells.length){
+        fitted = true;
+        const c = data.cells[0];
+        map.setView([(c[1]+c[3])/2, (c[2]+c[4])/2], 13);
+      }
+    }
+    map.on('moveend', ()=>{ clearTimeout(timer); timer = setTimeout(load, 400); });
+    setTimeout(()=>map.invalidateSize(), 350);
+    load();
+  });
+})();
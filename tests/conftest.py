@@ -4,12 +4,18 @@ import sys
 import importlib
 import random
 import string
+from contextlib import contextmanager
 import psycopg2
 import pytest
 
 # Ensure project root is on sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+# Tests poke the DB directly; don't let a background listener cache around them.
+os.environ.setdefault("EVENT_BUS", "0")
+# Run jobs explicitly (jobs.work_once) instead of in background threads.
+os.environ.setdefault("JOB_WORKERS", "0")
+
 import database as dbmod  # DO NOT import app here!
 
 def _rand_db_name(prefix="ambulance_db_test_"):
@@ -58,7 +64,7 @@ def app(test_db_name, monkeypatch):
     monkeypatch.setattr(dbmod, "DB_CFG", new_cfg, raising=True)
 
     def patched_conn():
-        return psycopg2.connect(**dbmod.DB_CFG)
+        return psycopg2.connect(**dbmod.DB_CFG, cursor_factory=dbmod.TracedCursor)
     monkeypatch.setattr(dbmod, "get_db_connection", patched_conn, raising=True)
 
     # 2) Initialize schema + seed admin in the test DB
@@ -83,6 +89,51 @@ def db_conn():
     yield conn
     conn.close()
 
+@pytest.fixture(scope="function")
+def query_budget(app):
+    """
+    Per-request statement/DB-time budget for route handlers:
+
+        with query_budget(2):
+            client.get("/dashboard/user")
+
+    Every request made inside the block must run at most `statements` SQL
+    statements (and at most `ms` milliseconds of DB time, if given) between
+    the last before_request hook and the response. Session loading and
+    identity-flag refreshes happen before that point and are not counted.
+    """
+    from flask import request
+    seen = []
+    active = {"on": False}
+
+    @app.before_request
+    def _start_trace():
+        if active["on"]:
+            dbmod.start_query_trace()
+
+    @app.after_request
+    def _stop_trace(resp):
+        if active["on"]:
+            seen.append((request.path, dbmod.stop_query_trace() or []))
+        return resp
+
+    @contextmanager
+    def budget(statements, ms=None):
+        seen.clear(); active["on"] = True
+        try:
+            yield seen
+        finally:
+            active["on"] = False
+        assert seen, "no request was made inside query_budget()"
+        for path, log in seen:
+            sql = "\n".join(" ".join(str(q).split()) for q, _ in log)
+            assert len(log) <= statements, \
+                f"{path} ran {len(log)} statements (budget {statements}):\n{sql}"
+            if ms is not None:
+                total = sum(d for _, d in log) * 1000
+                assert total <= ms, f"{path} spent {total:.1f} ms in the DB (budget {ms} ms):\n{sql}"
+    return budget
+
 # Convenience helpers for tests
 def login(client, email, password):
     return client.post("/signin", data={"email": email, "password": password}, follow_redirects=True)
@@ -0,0 +1,78 @@
+# tests/test_admin_bulk.py
+import json
+import select
+import sys
+import psycopg2
+
+import database as dbmod
+from events import CHANNEL
+
+def _ids(db_conn, emails):
+    cur = db_conn.cursor()
+    cur.execute("SELECT id FROM users WHERE email = ANY(%s) ORDER BY id", (emails,))
+    ids = [r[0] for r in cur.fetchall()]; cur.close()
+    return ids
+
+def test_bulk_verify_and_reject_in_one_request(client, db_conn, make_user, query_budget):
+    emails = [f"bulk{i}@example.com" for i in range(5)]
+    for i, e in enumerate(emails):
+        make_user(f"Bulk{i}", e, "pw", "driver")
+    ids = _ids(db_conn, emails)
+
+    assert client.post("/admin/users/bulk_verify", json={"user_ids": ids}).status_code == 403
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+    assert client.post("/admin/users/bulk_verify", json={"user_ids": ["x"]}).status_code == 400
+    assert client.post("/admin/users/bulk_verify", json={"user_ids": []}).status_code == 400
+
+    with query_budget(2):   # UPDATE + NOTIFY, whatever the batch size
+        body = client.post("/admin/users/bulk_verify", json={"user_ids": ids[:3] + [ids[0]]}).get_json()
+    assert body == {"ok": True, "verified": ids[:3]}
+
+    with query_budget(4):   # UPDATE + one notifications INSERT + two NOTIFYs
+        body = client.post("/admin/users/bulk_reject", json={"user_ids": ids[2:], "reason": "blurry"}).get_json()
+    assert body["rejected"] == ids[2:]
+
+    cur = db_conn.cursor()
+    cur.execute("SELECT id, is_verified FROM users WHERE id = ANY(%s) ORDER BY id", (ids,))
+    assert cur.fetchall() == [(ids[0], True), (ids[1], True), (ids[2], False), (ids[3], False), (ids[4], False)]
+    cur.execute("SELECT user_id FROM notifications WHERE body='blurry' ORDER BY user_id")
+    assert [r[0] for r in cur.fetchall()] == ids[2:]
+    cur.close()
+
+    # plain form post from a non-JS page: flash + redirect
+    r = client.post("/admin/users/bulk_verify", data={"user_ids": [str(ids[4])]})
+    assert r.status_code == 302
+
+def test_bulk_at_max_batch_with_large_ids(client, db_conn):
+    cur = db_conn.cursor()
+    cur.execute("SELECT setval('users_id_seq', GREATEST((SELECT last_value FROM users_id_seq), 1000000))")
+    cur.execute("""
+        INSERT INTO users (username, email, password, role)
+        SELECT 'bulkmax' || g, 'bulkmax' || g || '@example.com', 'x', 'driver'
+        FROM generate_series(1, %s) g
+        RETURNING id
+    """, (sys.modules["app"].BULK_MAX,))
+    ids = sorted(r[0] for r in cur.fetchall())
+    db_conn.commit(); cur.close()
+
+    listener = psycopg2.connect(**dbmod.DB_CFG)
+    listener.autocommit = True
+    listener.cursor().execute(f"LISTEN {CHANNEL}")
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+    r = client.post("/admin/users/bulk_verify", json={"user_ids": ids})
+    assert r.status_code == 200 and r.get_json()["verified"] == ids
+    r = client.post("/admin/users/bulk_reject", json={"user_ids": ids})
+    assert r.status_code == 200 and r.get_json()["rejected"] == ids
+
+    while select.select([listener], [], [], 0.5)[0]:   # drain everything delivered
+        listener.poll()
+    seen = {}
+    for n in listener.notifies:
+        assert len(n.payload.encode()) < 8000
+        event = json.loads(n.payload)
+        if event["topic"] in ("user_verified", "notification"):
+            key = (event["topic"], event.get("is_verified"))
+            seen.setdefault(key, []).extend(event.get("user_ids") or [])
+    listener.close()
+    for key in (("user_verified", True), ("user_verified", False), ("notification", None)):
+        assert sorted(seen[key]) == ids
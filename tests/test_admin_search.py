@@ -0,0 +1,40 @@
+# tests/test_admin_search.py
+import search
+
+def test_prefix_query_sanitizes_terms():
+    assert search.prefix_query("Ram  984") == "'ram':* & '984':*"
+    assert search.prefix_query("o'brien") == "'o':* & 'brien':*"
+    assert search.prefix_query("x") is None and search.prefix_query("!!") is None
+
+def test_admin_search_and_autocomplete(client, db_conn, make_user):
+    make_user("Sitaram", "sitaram@example.com", "pw", "user")
+    cur = db_conn.cursor()
+    cur.execute("""
+        INSERT INTO bookings (patient_name, phone_no, pickup_location, destination)
+        VALUES ('Hari Bahadur', '9841234567', 'Baneshwor', 'Bir Hospital')
+    """)
+    db_conn.commit(); cur.close()
+
+    assert client.get("/admin/api/search?q=sita").status_code == 403
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+
+    body = client.get("/admin/api/search?q=sita").get_json()
+    assert [u["email"] for u in body["users"]] == ["sitaram@example.com"]
+    body = client.get("/admin/api/search?q=98412&scope=bookings").get_json()
+    assert "users" not in body and body["bookings"][0]["patient_name"] == "Hari Bahadur"
+    body = client.get("/admin/api/search?q=bir hosp").get_json()
+    assert body["bookings"] and not body["users"]
+    assert client.get("/admin/api/search?q=s").get_json() == {"q": "s", "users": [], "bookings": []}
+
+    assert "Sitaram" in client.get("/admin/api/autocomplete?q=sit").get_json()["suggestions"]
+    assert client.get("/admin/api/autocomplete?q=har").get_json()["suggestions"] == ["Hari Bahadur"]
+    assert client.get("/admin/api/autocomplete?q=%25%25").get_json()["suggestions"] == []
+
+def test_search_uses_indexes(app, db_conn):
+    cur = db_conn.cursor()
+    cur.execute("SET enable_seqscan = off")
+    cur.execute(f"EXPLAIN SELECT id FROM users WHERE {search.USERS_DOC} @@ to_tsquery('simple', 'ra:*')")
+    assert "idx_users_search" in "\n".join(r[0] for r in cur.fetchall())
+    cur.execute("EXPLAIN SELECT username FROM users WHERE lower(username) LIKE 'ra%'")
+    assert "idx_users_username_prefix" in "\n".join(r[0] for r in cur.fetchall())
+    db_conn.rollback(); cur.close()
@@ -0,0 +1,30 @@
+# tests/test_admission.py
+import admission
+
+def test_low_priority_polls_shed_when_class_is_full(client, make_user, monkeypatch):
+    make_user("AC", "ac@example.com", "acpw", "user")
+    client.post("/signin", data={"email": "ac@example.com", "password": "acpw"})
+
+    low = admission._Gate("low", 1, 0, 5)
+    monkeypatch.setitem(admission.GATES, "low", low)
+    assert low.enter()          # occupy the only slot, as a slow poll would
+
+    r = client.get("/api/notifications/unread_count")
+    assert r.status_code == 503 and r.headers["Retry-After"] == "5"
+    assert r.get_json()["error"] == "busy"
+    r = client.get("/dashboard/user", headers={"Accept": "text/html"})
+    assert r.status_code == 503 and b"Server busy" in r.data
+
+    # booking creation is never shed
+    assert client.get("/book").status_code == 200
+    assert low.stats()["shed"] == 2
+
+    low.leave()
+    assert client.get("/api/notifications/unread_count").status_code == 200
+    assert low.stats() == {"limit": 1, "admitted": 2, "shed": 2, "in_flight": 0, "peak_in_flight": 1}
+
+def test_admission_metrics_admin_only(client):
+    assert client.get("/admin/api/admission").status_code == 403
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+    body = client.get("/admin/api/admission").get_json()
+    assert set(body["classes"]) == {"critical", "normal", "low"}
@@ -0,0 +1,48 @@
+# tests/test_assets.py
+import gzip
+from flask import Flask, render_template_string
+import assets
+
+def _make_app(tmp_path):
+    static = tmp_path / "static"
+    (static / "css").mkdir(parents=True)
+    (static / "css" / "style.css").write_text("body { color: red; }\n" * 50)
+    assets.build(str(static))
+    app = Flask(__name__, static_folder=str(static))
+    assets.init_app(app)
+    return app
+
+def test_url_for_rewritten_to_fingerprinted_name(tmp_path):
+    app = _make_app(tmp_path)
+    with app.test_request_context():
+        url = render_template_string("{{ url_for('static', filename='css/style.css') }}")
+    assert url.startswith("/static/dist/css/style.") and url.endswith(".css")
+    assert url != "/static/dist/css/style.css"
+
+def test_fingerprinted_asset_is_immutable_and_precompressed(tmp_path):
+    app = _make_app(tmp_path)
+    client = app.test_client()
+    with app.test_request_context():
+        url = render_template_string("{{ url_for('static', filename='css/style.css') }}")
+
+    r = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert "immutable" in r.headers["Cache-Control"]
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.mimetype == "text/css"
+    assert gzip.decompress(r.data).startswith(b"body { color: red; }")
+
+    r = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in r.headers
+    assert r.data.startswith(b"body")
+
+def test_plain_files_without_manifest(tmp_path):
+    static = tmp_path / "static"
+    (static / "css").mkdir(parents=True)
+    (static / "css" / "style.css").write_text("body{}")
+    app = Flask(__name__, static_folder=str(static))
+    assets.init_app(app)
+    with app.test_request_context():
+        url = render_template_string("{{ url_for('static', filename='css/style.css') }}")
+    assert url == "/static/css/style.css"
+    assert app.test_client().get(url).data == b"body{}"
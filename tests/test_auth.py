@@ -1,5 +1,11 @@
 # tests/test_auth.py
 import re
+import threading
+import time
+
+import pytest
+
+import passwords
 
 def test_admin_seed_login(client):
     # seeded in initialize_db -> admin: raj@gmail.com / raj123
@@ -15,3 +21,34 @@ def test_signup_and_login_user(client, make_user):
 def test_invalid_login(client):
     resp = client.post("/signin", data={"email": "nope@example.com", "password": "x"}, follow_redirects=True)
     assert b"Invalid credentials." in resp.data
+
+def test_legacy_sha256_hash_upgraded_on_login(client, db_conn):
+    import hashlib
+    legacy = hashlib.sha256(b"oldpw").hexdigest()
+    with db_conn.cursor() as cur:
+        cur.execute("INSERT INTO users (username, email, password, role) VALUES (%s,%s,%s,'user')",
+                    ("Old", "old@example.com", legacy))
+        db_conn.commit()
+    resp = client.post("/signin", data={"email": "old@example.com", "password": "oldpw"}, follow_redirects=True)
+    assert b"Signed in." in resp.data
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT password FROM users WHERE email=%s", ("old@example.com",))
+        stored = cur.fetchone()[0]
+    assert stored != legacy
+    assert stored.startswith(("pbkdf2:", "scrypt:"))
+
+def test_timed_out_hash_holds_its_slot_until_the_worker_is_done(monkeypatch):
+    monkeypatch.setattr(passwords, "POOL_SIZE", 1)
+    monkeypatch.setattr(passwords, "TIMEOUT", 0.2)
+    monkeypatch.setattr(passwords, "_slots", threading.BoundedSemaphore(1))
+    passwords._reset_pool(wait=True)
+    try:
+        with pytest.raises(passwords.HashingBusy, match="timed out"):
+            passwords._run(time.sleep, 1.0)
+        # the worker is still sleeping, so there is no room yet
+        with pytest.raises(passwords.HashingBusy, match="queue is full"):
+            passwords._run(abs, -3)
+        time.sleep(1.5)
+        assert passwords._run(abs, -3) == 3
+    finally:
+        passwords._reset_pool(wait=True)
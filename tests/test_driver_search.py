@@ -0,0 +1,37 @@
+# tests/test_driver_search.py
+import sys
+import database as dbmod
+import regions
+
+def _place_driver(db_conn, make_user, name, lat, lon):
+    make_user(name, f"{name.lower()}@example.com", "pw", "driver")
+    cur = db_conn.cursor()
+    cur.execute("UPDATE users SET is_verified=TRUE, is_online=TRUE WHERE username=%s RETURNING id", (name,))
+    did = cur.fetchone()[0]
+    cur.execute("SELECT set_driver_location(%s, %s, %s, %s, NOW()::timestamp)",
+                (did, lat, lon, regions.region_of(lat, lon)))
+    db_conn.commit(); cur.close()
+    return did
+
+def test_ring_search_stops_at_first_ring_with_enough_drivers(app, db_conn, make_user, monkeypatch):
+    appmod = sys.modules["app"]
+    # rider at (10, 10): two drivers within ~1 km, one ~40 km out, one ~500 km out
+    near1 = _place_driver(db_conn, make_user, "Near1", 10.005, 10.0)
+    near2 = _place_driver(db_conn, make_user, "Near2", 10.0, 10.007)
+    mid   = _place_driver(db_conn, make_user, "Mid", 10.36, 10.0)
+    far   = _place_driver(db_conn, make_user, "Far", 14.5, 10.0)
+
+    monkeypatch.setattr(appmod, "SEARCH_MIN_CANDIDATES", 2)
+    conn = dbmod.get_db_connection()
+    drivers, radius = appmod.find_nearby_drivers(conn, 10.0, 10.0)
+    assert radius == appmod.SEARCH_RINGS_KM[0]
+    assert {d["driver_id"] for d in drivers} == {near1, near2}
+
+    monkeypatch.setattr(appmod, "SEARCH_MIN_CANDIDATES", 3)
+    drivers, radius = appmod.find_nearby_drivers(conn, 10.0, 10.0)
+    ids = {d["driver_id"] for d in drivers}
+    assert mid in ids and far not in ids and radius >= 40
+
+    drivers = appmod.fetch_driver_cards(conn, near=(10.0, 10.0), radius_km=50, limit=1)
+    assert [d["driver_id"] for d in drivers] == [near1]   # capped, nearest first
+    conn.close()
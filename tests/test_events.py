@@ -0,0 +1,37 @@
+# tests/test_events.py
+import time
+import events
+
+def _wait(pred, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if pred(): return True
+        time.sleep(0.05)
+    return False
+
+def test_notify_reaches_local_subscribers(app, client, db_conn):
+    seen = []
+
+    @events.subscribe("user_verified")
+    def collect(payload):
+        seen.append(payload)
+
+    events.start_listener()
+    try:
+        assert _wait(events.listening), "listener did not connect"
+
+        # uncommitted publish is not delivered
+        events.publish(db_conn, "user_verified", user_id=-1, is_verified=True)
+        db_conn.rollback()
+
+        client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"}, follow_redirects=True)
+        with db_conn.cursor() as cur:
+            cur.execute("SELECT id FROM users WHERE email='raj@gmail.com'")
+            admin_id = cur.fetchone()[0]
+        client.post(f"/admin/verify_user/{admin_id}")
+
+        assert _wait(lambda: any(p["user_id"] == admin_id for p in seen))
+        assert all(p["user_id"] != -1 for p in seen)
+    finally:
+        events.stop_listener()
+        events._subscribers["user_verified"].pop((collect.__module__, collect.__qualname__), None)
@@ -0,0 +1,69 @@
+# tests/test_export.py
+import csv
+import io
+import json
+import sys
+from datetime import date, timedelta
+
+import export
+
+def _seed(db_conn):
+    today = date.today()
+    cur = db_conn.cursor()
+    cur.execute("SELECT id FROM users WHERE email='raj@gmail.com'")
+    uid = cur.fetchone()[0]
+    for days, status in ((0, "Completed"), (0, "Pending"), (1, "Completed"), (40, "Completed")):
+        cur.execute("""
+            INSERT INTO bookings (user_id, patient_name, phone_no, destination, booking_time, status)
+            VALUES (%s, 'Export Patient', '01', 'Teaching, Hospital', %s, %s)
+        """, (uid, today - timedelta(days=days), status))
+    db_conn.commit(); cur.close()
+    return today
+
+def test_export_streams_filtered_csv_and_ndjson(client, db_conn, monkeypatch):
+    today = _seed(db_conn)
+    assert client.get("/admin/export/bookings.csv").status_code == 403
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+
+    monkeypatch.setattr(export, "ITERSIZE", 1)
+    since = (today - timedelta(days=1)).isoformat()
+    r = client.get(f"/admin/export/bookings.csv?from={since}&to={today}&status=Completed")
+    assert r.status_code == 200 and r.is_streamed
+    assert r.headers["Content-Disposition"].startswith('attachment; filename="bookings-')
+    rows = [row for row in csv.DictReader(io.StringIO(r.get_data(as_text=True)))
+            if row["patient_name"] == "Export Patient"]
+    assert len(rows) == 2 and {row["status"] for row in rows} == {"Completed"}
+    assert rows[0]["destination"] == "Teaching, Hospital" and rows[0]["user_name"] == "raj"
+
+    r = client.get(f"/admin/export/bookings.ndjson?from={since}&status=Pending,Completed")
+    lines = [json.loads(l) for l in r.get_data(as_text=True).splitlines()]
+    assert sum(1 for l in lines if l["patient_name"] == "Export Patient") == 3
+
+    assert client.get("/admin/export/ratings.csv").get_data(as_text=True).startswith("id,created_at,booking_id")
+    assert client.get("/admin/export/bookings.csv?from=yesterday").status_code == 400
+    assert client.get("/admin/export/bookings.csv?status=Lost").status_code == 400
+    assert client.get("/admin/export/users.csv").status_code == 404
+
+def test_export_query_filters():
+    sql, params = export.build_query("ratings", date(2026, 1, 1), None, ["Completed"])
+    assert "r.created_at >= %s" in sql and "status" not in sql and params == [date(2026, 1, 1)]
+
+def test_export_order_comes_from_an_index(app, db_conn):
+    cur = db_conn.cursor()
+    cur.execute("SET enable_sort = off")   # a Sort node would then only appear if no index can supply the order
+    for kind in export.EXPORTS:
+        sql, params = export.build_query(kind, date(2026, 1, 1), None, ["Completed"])
+        cur.execute("EXPLAIN " + sql, params)
+        nodes = [r[0].strip().lstrip("->").strip() for r in cur.fetchall()]
+        assert not [n for n in nodes if n.split("  (")[0].endswith("Sort")], nodes
+    db_conn.rollback(); cur.close()
+
+def test_export_connection_closed_when_stream_never_starts(client, monkeypatch):
+    appmod = sys.modules["app"]
+    real, opened = appmod.get_read_connection, []
+    monkeypatch.setattr(appmod, "get_read_connection", lambda: opened.append(real()) or opened[-1])
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+    r = client.head("/admin/export/bookings.csv")   # the body is never iterated
+    assert r.status_code == 200 and len(opened) == 1
+    r.close()
+    assert opened[0].closed
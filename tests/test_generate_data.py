@@ -0,0 +1,68 @@
+# tests/test_generate_data.py
+import os
+import importlib.util
+
+
+def _load():
+    path = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "generate_data.py")
+    spec = importlib.util.spec_from_file_location("generate_data", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def _snapshot(db_conn, first_user):
+    cur = db_conn.cursor()
+    cur.execute("""
+        SELECT username, role, is_verified FROM users WHERE id >= %s ORDER BY id
+    """, (first_user,))
+    users = cur.fetchall()
+    cur.execute("""
+        SELECT user_id - %s, driver_id - %s, status, priority, pickup_location
+        FROM bookings WHERE user_id >= %s ORDER BY id
+    """, (first_user, first_user, first_user))
+    bookings = cur.fetchall()
+    cur.close()
+    return users, bookings
+
+def test_generates_requested_volumes_reproducibly(app, db_conn):
+    gen = _load()
+    gen.CHUNK = 7   # exercise several COPY batches
+    cur = db_conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users")
+    first = cur.fetchone()[0]
+    db_conn.commit()
+
+    counts = gen.generate(db_conn, users=30, drivers=10, bookings=60, rated=1.0,
+                          notifications=25, months=3, seed=7, log=lambda *_: None)
+    assert counts["bookings"] == 60 and counts["notifications"] == 25
+    cur.execute("SELECT COUNT(*) FROM users WHERE email LIKE 'gen%%@example.test'")
+    assert cur.fetchone()[0] >= 40
+    cur.execute("SELECT COUNT(*) FROM driver_location WHERE driver_id >= %s", (first,))
+    assert cur.fetchone()[0] == 10
+    # every completed trip was rated once by its own passenger
+    cur.execute("""
+        SELECT COUNT(*) FROM bookings b
+        LEFT JOIN driver_ratings r ON r.booking_id = b.id AND r.rater_user_id = b.user_id
+        WHERE b.user_id >= %s AND b.status = 'Completed' AND r.id IS NULL
+    """, (first,))
+    assert cur.fetchone()[0] == 0
+    assert counts["ratings"] > 0
+    # no driver holds two open trips
+    cur.execute("""
+        SELECT driver_id FROM bookings WHERE status='Accepted' AND user_id >= %s
+        GROUP BY driver_id HAVING COUNT(*) > 1
+    """, (first,))
+    assert cur.fetchall() == []
+    db_conn.commit()
+    users_a, bookings_a = _snapshot(db_conn, first)
+
+    # same seed, same data (ids shifted by however many were reserved before)
+    cur.execute("SELECT last_value + 1 FROM users_id_seq")
+    second = cur.fetchone()[0]
+    db_conn.commit()
+    gen.generate(db_conn, users=30, drivers=10, bookings=60, rated=1.0,
+                 notifications=25, months=3, seed=7, log=lambda *_: None)
+    users_b, bookings_b = _snapshot(db_conn, second)
+    assert users_b == users_a
+    assert [b[2:] for b in bookings_b] == [b[2:] for b in bookings_a]
+    cur.close()
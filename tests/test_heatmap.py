@@ -0,0 +1,35 @@
+# tests/test_heatmap.py
+import heatmap
+
+def _uid(db_conn, email):
+    cur = db_conn.cursor()
+    cur.execute("SELECT id FROM users WHERE email=%s", (email,))
+    uid = cur.fetchone()[0]; cur.close()
+    return uid
+
+def test_geohash_roundtrip():
+    assert heatmap.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    s, w, n, e = heatmap.bounds(heatmap.encode(27.7, 85.33))
+    assert s <= 27.7 <= n and w <= 85.33 <= e
+
+def test_bookings_feed_heatmap_cells(client, db_conn, make_user):
+    make_user("HD", "hd@example.com", "hdpw", "driver")
+    make_user("HU", "hu@example.com", "hupw", "user")
+    did = _uid(db_conn, "hd@example.com")
+    cur = db_conn.cursor()
+    cur.execute("UPDATE users SET is_verified=TRUE WHERE id=%s", (did,))
+    db_conn.commit(); cur.close()
+
+    client.post("/signin", data={"email": "hu@example.com", "password": "hupw"})
+    for _ in range(2):
+        client.post("/request_driver", data={
+            "driver_id": str(did), "patient_name": "p", "phone_no": "98", "destination": "H",
+            "pickup_location": "", "user_lat": "-33.8688", "user_lon": "151.2093"})
+    assert client.get("/api/heatmap").status_code == 403     # riders don't get the map
+
+    client.get("/logout")
+    client.post("/signin", data={"email": "hd@example.com", "password": "hdpw"})
+    cell = heatmap.encode(-33.8688, 151.2093)
+    body = client.get("/api/heatmap?hours=1&bbox=-34,151,-33,152").get_json()
+    assert [c[0] for c in body["cells"]] == [cell] and body["cells"][0][5] == 2
+    assert client.get("/api/heatmap?bbox=1,2").status_code == 400
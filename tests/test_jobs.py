@@ -0,0 +1,61 @@
+# tests/test_jobs.py
+import database as dbmod
+import jobs
+
+calls = []
+
+@jobs.task("flaky_test_job", max_attempts=3)
+def flaky_test_job(n):
+    calls.append(n)
+    if len(calls) == 1:
+        raise RuntimeError("first try fails")
+
+def _job(db_conn, job_id):
+    cur = db_conn.cursor()
+    cur.execute("SELECT status, attempts, last_error, run_at > NOW() FROM jobs WHERE id=%s", (job_id,))
+    row = cur.fetchone(); db_conn.commit(); cur.close()
+    return row
+
+def test_job_retries_with_backoff_then_succeeds(app, db_conn):
+    calls.clear()
+    conn = dbmod.get_db_connection()
+    job_id = jobs.enqueue(conn, "flaky_test_job", n=7)
+    conn.rollback()                         # not committed -> never runs
+    assert not jobs.work_once("t")
+
+    job_id = jobs.enqueue(conn, "flaky_test_job", n=7)
+    conn.commit(); conn.close()
+    assert jobs.work_once("t")
+    status, attempts, error, delayed = _job(db_conn, job_id)
+    assert (status, attempts, delayed) == ("queued", 1, True) and "first try fails" in error
+    assert not jobs.work_once("t")          # backing off
+
+    cur = db_conn.cursor()
+    cur.execute("UPDATE jobs SET run_at = NOW() WHERE id=%s", (job_id,))
+    db_conn.commit(); cur.close()
+    assert jobs.work_once("t")
+    assert _job(db_conn, job_id)[:2] == ("done", 2) and calls == [7, 7]
+
+def test_claimed_jobs_are_skipped_not_waited_on(app, db_conn):
+    conn = dbmod.get_db_connection()
+    first = jobs.enqueue(conn, "flaky_test_job", n=1)
+    second = jobs.enqueue(conn, "flaky_test_job", n=2)
+    conn.commit()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM jobs WHERE id=%s FOR UPDATE", (first,))   # another worker holds it
+    calls[:] = ["warm"]                     # so neither run fails
+    assert jobs.work_once("t")
+    assert _job(db_conn, second)[0] == "done" and _job(db_conn, first)[0] == "queued"
+    conn.rollback(); conn.close()
+    assert jobs.work_once("t") and _job(db_conn, first)[0] == "done"
+
+def test_recurring_jobs_enqueued_once_per_interval(client):
+    with dbmod.pooled_connection() as conn:
+        first = jobs.enqueue_due(conn)
+        assert "sweep_stale_drivers" in first
+        assert "sweep_stale_drivers" not in jobs.enqueue_due(conn)
+    while jobs.work_once("t"):
+        pass
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+    body = client.get("/admin/api/jobs").get_json()
+    assert "sweep_stale_drivers" not in body["tasks"] and body["oldest_due_s"] == 0
@@ -0,0 +1,74 @@
+# tests/test_location_batch.py
+import time
+import pytest
+import locations
+
+NOW = 1_700_000_000
+
+def test_parse_orders_dedupes_and_drops_bad_fixes():
+    body = b"""{"fixes": [
+        {"t": 1699999990, "lat": 27.71, "lon": 85.31},
+        {"t": 1699999970, "lat": 27.70, "lon": 85.30},
+        {"t": 1699999990, "lat": 27.71, "lon": 85.31},
+        {"t": 1699999980, "lat": 95.0, "lon": 85.30},
+        {"t": 1700009999, "lat": 27.7, "lon": 85.3},
+        {"t": 1600000000, "lat": 27.7, "lon": 85.3},
+        {"lat": 27.7}
+    ]}"""
+    fixes, dropped = locations.parse_fixes(body, "application/json", now=NOW)
+    assert fixes == [(1699999970.0, 27.70, 85.30), (1699999990.0, 27.71, 85.31)]
+    assert dropped == 5
+
+def test_parse_binary_and_rejects_garbage():
+    body = b"".join(locations.FIX_STRUCT.pack(t, int(lat * 1e6), int(lon * 1e6))
+                    for t, lat, lon in [(NOW - 5, 27.7, 85.3), (NOW - 10, -33.5, 151.25)])
+    fixes, dropped = locations.parse_fixes(body, "application/octet-stream", now=NOW)
+    assert [(t, round(la, 6), round(lo, 6)) for t, la, lo in fixes] == \
+        [(NOW - 10, -33.5, 151.25), (NOW - 5, 27.7, 85.3)]
+    assert dropped == 0
+    with pytest.raises(locations.BadBatch):
+        locations.parse_fixes(body[:-1], "application/octet-stream", now=NOW)
+    with pytest.raises(locations.BadBatch):
+        locations.parse_fixes(b"{not json", "application/json", now=NOW)
+
+def _driver(client, db_conn, make_user):
+    make_user("Tunnel", "tunnel@example.com", "pw", "driver")
+    cur = db_conn.cursor()
+    cur.execute("UPDATE users SET is_verified=TRUE WHERE email='tunnel@example.com' RETURNING id")
+    did = cur.fetchone()[0]
+    db_conn.commit(); cur.close()
+    client.get("/logout")
+    client.post("/signin", data={"email": "tunnel@example.com", "password": "pw"})
+    return did
+
+def _state(db_conn, did):
+    cur = db_conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM driver_location_history WHERE driver_id=%s", (did,))
+    n = cur.fetchone()[0]
+    cur.execute("SELECT latitude, longitude FROM driver_location WHERE driver_id=%s", (did,))
+    pos = cur.fetchone()
+    db_conn.commit(); cur.close()
+    return n, pos
+
+def test_batch_upload_writes_history_and_current_position(client, db_conn, make_user):
+    did = _driver(client, db_conn, make_user)
+    now = int(time.time())
+    batch = {"fixes": [{"t": now - 60 + i * 10, "lat": 27.70 + i / 1000, "lon": 85.30} for i in range(5)]}
+    r = client.post("/driver/api/locations", json=batch)
+    j = r.get_json()
+    assert r.status_code == 200 and j["accepted"] == 5 and j["online"] is True and j["next_interval"]
+    assert _state(db_conn, did) == (5, (27.704, 85.30))
+
+    # a replay is idempotent; an older batch doesn't move the driver back
+    client.post("/driver/api/locations", json=batch)
+    older = {"fixes": [{"t": now - 600, "lat": 1.0, "lon": 1.0}]}
+    assert client.post("/driver/api/locations", json=older).get_json()["accepted"] == 1
+    assert _state(db_conn, did) == (6, (27.704, 85.30))
+
+    r = client.post("/driver/api/locations", data=b"\x00" * 7, content_type="application/octet-stream")
+    assert r.status_code == 400
+
+def test_batch_upload_is_driver_only(client, make_user):
+    make_user("Walker", "walker@example.com", "pw", "user")
+    r = client.post("/driver/api/locations", json={"fixes": []})
+    assert r.status_code == 403
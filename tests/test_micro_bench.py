@@ -0,0 +1,25 @@
+# tests/test_micro_bench.py
+import os
+import importlib.util
+
+def _load():
+    path = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "micro.py")
+    spec = importlib.util.spec_from_file_location("micro", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def test_measure_reports_per_call_microseconds():
+    micro = _load()
+    stats = micro.measure(lambda: sum(range(100)), min_time=0.02, repeats=3)
+    assert stats["loops"] > 1
+    assert 0 < stats["min_us"] <= stats["median_us"] < 1000
+
+def test_compare_flags_slowdowns_beyond_threshold():
+    micro = _load()
+    base = {"results": {"a": {"median_us": 10.0}, "b": {"median_us": 10.0},
+                        "c": {"median_us": 10.0}, "gone": {"median_us": 1.0}}}
+    head = {"results": {"a": {"median_us": 10.5}, "b": {"median_us": 13.0},
+                        "c": {"median_us": 5.0}}}
+    rows = {name: verdict for name, _, _, _, verdict in micro.compare(base, head, threshold=0.10)}
+    assert rows == {"a": "", "b": "REGRESSION", "c": "faster"}
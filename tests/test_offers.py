@@ -0,0 +1,182 @@
+# tests/test_offers.py
+import jobs
+import offers
+import regions
+
+PICKUP = (-40.0, 170.0)
+
+def _place_driver(db_conn, make_user, name, lat, lon):
+    make_user(name, f"{name.lower()}@example.com", "pw", "driver")
+    cur = db_conn.cursor()
+    cur.execute("UPDATE users SET is_verified=TRUE, is_online=TRUE WHERE username=%s RETURNING id", (name,))
+    did = cur.fetchone()[0]
+    cur.execute("SELECT set_driver_location(%s, %s, %s, %s, NOW()::timestamp)",
+                (did, lat, lon, regions.region_of(lat, lon)))
+    db_conn.commit(); cur.close()
+    return did
+
+def _booking(db_conn, booking_id):
+    cur = db_conn.cursor()
+    cur.execute("SELECT driver_id, status FROM bookings WHERE id=%s", (booking_id,))
+    row = cur.fetchone()
+    cur.execute("SELECT driver_id, status FROM booking_offers WHERE booking_id=%s ORDER BY id", (booking_id,))
+    offer_rows = cur.fetchall()
+    db_conn.commit(); cur.close()
+    return row, offer_rows
+
+def _expire_now(db_conn, booking_id):
+    cur = db_conn.cursor()
+    cur.execute("""
+        UPDATE jobs SET run_at = NOW()
+        WHERE task='offer_expire' AND status='queued'
+          AND (payload->>'offer_id')::bigint IN (SELECT id FROM booking_offers WHERE booking_id=%s)
+    """, (booking_id,))
+    db_conn.commit(); cur.close()
+    while jobs.work_once("t"):
+        pass
+
+def test_rejection_and_timeout_cascade_to_next_ranked_driver(client, db_conn, make_user, monkeypatch):
+    monkeypatch.setattr(offers, "OFFER_MAX_ATTEMPTS", 3)
+    d1 = _place_driver(db_conn, make_user, "Cascade1", PICKUP[0] + 0.001, PICKUP[1])
+    d2 = _place_driver(db_conn, make_user, "Cascade2", PICKUP[0] + 0.003, PICKUP[1])
+    d3 = _place_driver(db_conn, make_user, "Cascade3", PICKUP[0] + 0.006, PICKUP[1])
+    make_user("CascadeRider", "cascaderider@example.com", "pw", "user")
+    client.get("/logout")
+    client.post("/signin", data={"email": "cascaderider@example.com", "password": "pw"})
+    client.post("/request_driver", data={
+        "driver_id": d1, "patient_name": "P", "phone_no": "1", "destination": "H",
+        "user_lat": PICKUP[0], "user_lon": PICKUP[1],
+    })
+    cur = db_conn.cursor()
+    cur.execute("SELECT MAX(id) FROM bookings WHERE driver_id=%s", (d1,))
+    bid = cur.fetchone()[0]
+    cur.execute("""
+        SELECT run_at > NOW() FROM jobs
+        WHERE task='offer_expire' AND (payload->>'offer_id')::bigint =
+              (SELECT id FROM booking_offers WHERE booking_id=%s)
+    """, (bid,))
+    assert cur.fetchone() == (True,)
+    db_conn.commit(); cur.close()
+    assert _booking(db_conn, bid) == ((d1, "Pending"), [(d1, "open")])
+
+    # rejection moves it on at once
+    client.get("/logout")
+    client.post("/signin", data={"email": "cascade1@example.com", "password": "pw"})
+    client.post(f"/driver/reject/{bid}")
+    assert _booking(db_conn, bid) == ((d2, "Pending"), [(d1, "rejected"), (d2, "open")])
+
+    # d2 sits on it past the deadline
+    _expire_now(db_conn, bid)
+    assert _booking(db_conn, bid) == ((d3, "Pending"), [(d1, "rejected"), (d2, "expired"), (d3, "open")])
+
+    # too late for d2
+    client.get("/logout")
+    client.post("/signin", data={"email": "cascade2@example.com", "password": "pw"})
+    r = client.post(f"/driver/accept/{bid}", follow_redirects=True)
+    assert b"no longer available" in r.data
+    assert _booking(db_conn, bid)[0] == (d3, "Pending")
+
+    # third and last offer runs out: closed as Unassigned, nothing left open, rider told
+    _expire_now(db_conn, bid)
+    assert _booking(db_conn, bid) == ((None, "Unassigned"),
+                                      [(d1, "rejected"), (d2, "expired"), (d3, "expired")])
+    client.get("/logout")
+    client.post("/signin", data={"email": "cascaderider@example.com", "password": "pw"})
+    assert b"Book again" in client.get("/mybookings").data
+    cur = db_conn.cursor()
+    cur.execute("""
+        SELECT 1 FROM notifications n JOIN users u ON u.id = n.user_id
+        WHERE u.email='cascaderider@example.com' AND n.title='No driver available'
+    """)
+    assert cur.fetchone()
+    db_conn.commit(); cur.close()
+
+def test_accept_closes_offer_and_stale_timeout_is_ignored(client, db_conn, make_user):
+    d1 = _place_driver(db_conn, make_user, "Quick1", PICKUP[0] - 0.3, PICKUP[1])
+    make_user("QuickRider", "quickrider@example.com", "pw", "user")
+    client.get("/logout")
+    client.post("/signin", data={"email": "quickrider@example.com", "password": "pw"})
+    client.post("/request_driver", data={
+        "driver_id": d1, "patient_name": "P", "phone_no": "1", "destination": "H",
+        "user_lat": PICKUP[0] - 0.3, "user_lon": PICKUP[1],
+    })
+    cur = db_conn.cursor()
+    cur.execute("SELECT MAX(id) FROM bookings WHERE driver_id=%s", (d1,))
+    bid = cur.fetchone()[0]
+    db_conn.commit(); cur.close()
+
+    client.get("/logout")
+    client.post("/signin", data={"email": "quick1@example.com", "password": "pw"})
+    client.post(f"/driver/accept/{bid}")
+    _expire_now(db_conn, bid)
+    assert _booking(db_conn, bid) == ((d1, "Accepted"), [(d1, "accepted")])
+
+def test_emergency_broadcast_first_accept_wins(client, db_conn, make_user, monkeypatch):
+    monkeypatch.setattr(offers, "EMERGENCY_FANOUT", 2)
+    at = (PICKUP[0] + 0.6, PICKUP[1])
+    e1 = _place_driver(db_conn, make_user, "Siren1", at[0] + 0.001, at[1])
+    e2 = _place_driver(db_conn, make_user, "Siren2", at[0] + 0.002, at[1])
+    e3 = _place_driver(db_conn, make_user, "Siren3", at[0] + 0.004, at[1])
+    make_user("SirenRider", "sirenrider@example.com", "pw", "user")
+    client.get("/logout")
+    client.post("/signin", data={"email": "sirenrider@example.com", "password": "pw"})
+    client.post("/request_emergency", data={
+        "patient_name": "P", "phone_no": "1", "destination": "H",
+        "user_lat": at[0], "user_lon": at[1],
+    })
+    cur = db_conn.cursor()
+    cur.execute("SELECT MAX(booking_id) FROM booking_offers WHERE driver_id=%s", (e1,))
+    bid = cur.fetchone()[0]
+    cur.execute("SELECT priority FROM bookings WHERE id=%s", (bid,))
+    assert cur.fetchone() == ("Emergency",)
+    db_conn.commit(); cur.close()
+    assert _booking(db_conn, bid) == ((None, "Pending"), [(e1, "open"), (e2, "open")])
+
+    # both see it on their board; the second to accept loses
+    client.get("/logout")
+    client.post("/signin", data={"email": "siren2@example.com", "password": "pw"})
+    assert b"Emergency" in client.get("/driver/requests").data
+    client.post(f"/driver/accept/{bid}")
+    client.get("/logout")
+    client.post("/signin", data={"email": "siren1@example.com", "password": "pw"})
+    r = client.post(f"/driver/accept/{bid}", follow_redirects=True)
+    assert b"no longer available" in r.data
+    assert _booking(db_conn, bid) == ((e2, "Accepted"), [(e1, "withdrawn"), (e2, "accepted")])
+    assert e3 not in {d for d, _ in _booking(db_conn, bid)[1]}
+
+def test_emergency_round_that_runs_out_goes_to_next_drivers(client, db_conn, make_user, monkeypatch):
+    monkeypatch.setattr(offers, "EMERGENCY_FANOUT", 1)
+    at = (PICKUP[0] - 0.9, PICKUP[1])
+    r1 = _place_driver(db_conn, make_user, "Round1", at[0] + 0.001, at[1])
+    r2 = _place_driver(db_conn, make_user, "Round2", at[0] + 0.003, at[1])
+    make_user("RoundRider", "roundrider@example.com", "pw", "user")
+    client.get("/logout")
+    client.post("/signin", data={"email": "roundrider@example.com", "password": "pw"})
+    client.post("/request_emergency", data={
+        "patient_name": "P", "phone_no": "1", "destination": "H",
+        "user_lat": at[0], "user_lon": at[1],
+    })
+    cur = db_conn.cursor()
+    cur.execute("SELECT MAX(booking_id) FROM booking_offers WHERE driver_id=%s", (r1,))
+    bid = cur.fetchone()[0]
+    db_conn.commit(); cur.close()
+    _expire_now(db_conn, bid)
+    assert _booking(db_conn, bid) == ((None, "Pending"), [(r1, "expired"), (r2, "open")])
+
+def test_emergency_with_no_driver_in_reach_is_closed(client, db_conn, make_user):
+    make_user("LoneRider", "lonerider@example.com", "pw", "user")
+    client.get("/logout")
+    client.post("/signin", data={"email": "lonerider@example.com", "password": "pw"})
+    r = client.post("/request_emergency", data={
+        "patient_name": "P", "phone_no": "1", "destination": "H",
+        "user_lat": -80.0, "user_lon": -170.0,
+    }, follow_redirects=True)
+    assert b"No driver is available" in r.data
+    cur = db_conn.cursor()
+    cur.execute("""
+        SELECT b.id FROM bookings b JOIN users u ON u.id = b.user_id
+        WHERE u.email='lonerider@example.com'
+    """)
+    bid = cur.fetchone()[0]
+    db_conn.commit(); cur.close()
+    assert _booking(db_conn, bid) == ((None, "Unassigned"), [])
@@ -0,0 +1,137 @@
+# tests/test_partitions.py
+from datetime import date
+import psycopg2
+import pytest
+
+import database as dbmod
+import partitions
+
+def _months_ago(n):
+    return partitions._add_months(date.today().replace(day=1), -n)
+
+def _insert(cur, when, status):
+    cur.execute("""
+        INSERT INTO bookings (patient_name, phone_no, destination, booking_time, status)
+        VALUES ('P','1','H',%s,%s) RETURNING tableoid::regclass::text
+    """, (when, status))
+    return cur.fetchone()[0]
+
+def test_live_queries_prune_old_partitions(app, db_conn):
+    cur = db_conn.cursor()
+    assert partitions.is_partitioned(cur)
+    partitions.ensure_partitions(cur, start=_months_ago(4))
+    assert _insert(cur, _months_ago(4), "Completed") == partitions.partition_name(_months_ago(4))
+    assert _insert(cur, date.today(), "Pending") == partitions.partition_name(_months_ago(0))
+    db_conn.commit()
+
+    cur.execute("EXPLAIN " + dbmod.PREPARED["pending_count"][1] % "0")
+    plan = "\n".join(r[0] for r in cur.fetchall())
+    assert partitions.partition_name(_months_ago(0)) in plan
+    assert partitions.partition_name(_months_ago(4)) not in plan
+    cur.close()
+
+def test_archive_detaches_only_fully_completed_old_months(app, db_conn):
+    cur = db_conn.cursor()
+    partitions.ensure_partitions(cur, start=_months_ago(9))
+    _insert(cur, _months_ago(8), "Completed")
+    _insert(cur, _months_ago(9), "Completed")
+    _insert(cur, _months_ago(9), "Pending")          # still open: month 9 stays
+    db_conn.commit(); cur.close()
+
+    archived = partitions.archive(dbmod.get_db_connection())
+    assert partitions.partition_name(_months_ago(8)) in archived
+    assert partitions.partition_name(_months_ago(9)) not in archived
+    assert partitions.partition_name(_months_ago(2)) not in archived   # too recent
+
+    cur = db_conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM archive.%s" % partitions.partition_name(_months_ago(8)))
+    assert cur.fetchone()[0] == 1
+    cur.execute("SELECT COUNT(*) FROM bookings WHERE booking_time >= %s AND booking_time < %s",
+                (_months_ago(8), _months_ago(7)))
+    assert cur.fetchone()[0] == 0
+    cur.close()
+
+def test_new_month_takes_its_rows_out_of_default(app, db_conn):
+    cur = db_conn.cursor()
+    assert _insert(cur, _months_ago(20), "Completed") == "bookings_default"
+    db_conn.commit()
+    partitions.ensure_partitions(cur, start=_months_ago(20))
+    db_conn.commit()
+    cur.execute("SELECT tableoid::regclass::text FROM bookings WHERE booking_time = %s", (_months_ago(20),))
+    assert cur.fetchall() == [(partitions.partition_name(_months_ago(20)),)]
+    cur.close()
+
+def test_trip_older_than_live_window_still_completes(client, db_conn, make_user):
+    make_user("OldTripDrv", "oldtripdrv@example.com", "pw", "driver")
+    cur = db_conn.cursor()
+    partitions.ensure_partitions(cur, start=_months_ago(4))
+    cur.execute("UPDATE users SET is_verified=TRUE, is_online=TRUE WHERE email='oldtripdrv@example.com' RETURNING id")
+    did = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO bookings (driver_id, patient_name, phone_no, destination, booking_time, status)
+        VALUES (%s,'P','1','H',%s,'Accepted') RETURNING id
+    """, (did, _months_ago(4)))
+    bid = cur.fetchone()[0]
+    db_conn.commit()
+
+    # still busy: not offered to anyone else, can't go offline, board shows the trip
+    cur.execute(dbmod.PREPARED["driver_has_trip"][1] % did)
+    assert cur.fetchone() == (1,)
+    db_conn.commit()
+    client.post("/signin", data={"email": "oldtripdrv@example.com", "password": "pw"})
+    client.post("/driver/set_status", data={"state": "offline"})
+    cur.execute("SELECT is_online FROM users WHERE id=%s", (did,))
+    assert cur.fetchone() == (True,)
+    db_conn.commit()
+    assert f"#{bid}".encode() in client.get("/driver/requests").data
+
+    client.post(f"/driver/complete/{bid}")
+    cur.execute("SELECT status FROM bookings WHERE id=%s", (bid,))
+    assert cur.fetchone() == ("Completed",)
+    db_conn.commit(); cur.close()
+
+@pytest.fixture
+def legacy_db(pg_admin_conn, test_db_name):
+    name = test_db_name + "_legacy"
+    with pg_admin_conn.cursor() as cur:
+        cur.execute(f'CREATE DATABASE "{name}"')
+    conn = psycopg2.connect(**dict(dbmod.DB_CFG, database=name))
+    yield conn
+    conn.close()
+    with pg_admin_conn.cursor() as cur:
+        cur.execute(f'DROP DATABASE IF EXISTS "{name}"')
+
+def test_migrate_plain_bookings_table(legacy_db):
+    cur = legacy_db.cursor()
+    cur.execute("""
+        CREATE TABLE users (id SERIAL PRIMARY KEY);
+        CREATE TABLE bookings (
+            id SERIAL PRIMARY KEY,
+            user_id INT REFERENCES users(id),
+            driver_id INT REFERENCES users(id),
+            patient_name VARCHAR(100) NOT NULL,
+            phone_no VARCHAR(20) NOT NULL,
+            pickup_location TEXT,
+            destination TEXT NOT NULL,
+            booking_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status VARCHAR(20) NOT NULL DEFAULT 'Pending',
+            priority VARCHAR(20) DEFAULT 'Normal'
+        );
+        CREATE TABLE driver_ratings (id SERIAL PRIMARY KEY, booking_id INT REFERENCES bookings(id) ON DELETE CASCADE);
+    """)
+    for when in (_months_ago(14), _months_ago(1), None):
+        cur.execute("INSERT INTO bookings (patient_name, phone_no, destination, booking_time) VALUES ('P','1','H',%s)",
+                    (when,))
+    cur.execute("INSERT INTO driver_ratings (booking_id) VALUES (1)")
+    legacy_db.commit()
+
+    assert partitions.migrate(legacy_db) == 3
+    assert partitions.migrate(legacy_db) == 0          # idempotent
+    assert partitions.is_partitioned(cur)
+    cur.execute("SELECT id, tableoid::regclass::text FROM bookings ORDER BY id")
+    rows = cur.fetchall()
+    assert [r[0] for r in rows] == [1, 2, 3]
+    assert rows[0][1] == partitions.partition_name(_months_ago(14))
+    cur.execute("INSERT INTO bookings (patient_name, phone_no, destination) VALUES ('P','1','H') RETURNING id")
+    assert cur.fetchone()[0] == 4                     # sequence carried over
+    legacy_db.commit(); cur.close()
@@ -0,0 +1,50 @@
+# tests/test_ping_cadence.py
+import sys
+
+def _uid(db_conn, email):
+    cur = db_conn.cursor()
+    cur.execute("SELECT id FROM users WHERE email=%s", (email,))
+    uid = cur.fetchone()[0]; cur.close()
+    return uid
+
+def _exec(db_conn, sql, params):
+    cur = db_conn.cursor(); cur.execute(sql, params); db_conn.commit(); cur.close()
+
+def test_rider_cadence_follows_booking_state(app, client, db_conn, make_user):
+    make_user("Rider", "rider@example.com", "riderpw", "user")
+    make_user("RDrv", "rdrv@example.com", "rdrvpw", "driver")
+    client.post("/signin", data={"email": "rider@example.com", "password": "riderpw"})
+    ping = lambda: client.post("/update_user_location", data={"lat": "27.7", "lon": "85.3"}).get_json()
+
+    body = ping()
+    assert body["ok"] and body["state"] == "off"
+    assert body["next_interval"] == sys.modules["app"].PING_CADENCE["off"][0] >= 60   # slow keep-alive
+
+    uid, did = _uid(db_conn, "rider@example.com"), _uid(db_conn, "rdrv@example.com")
+    _exec(db_conn, """INSERT INTO bookings (user_id, driver_id, patient_name, phone_no, destination)
+                      VALUES (%s,%s,'P','1','Hospital')""", (uid, did))
+    assert ping()["state"] == "waiting"
+
+    _exec(db_conn, "UPDATE bookings SET status='Accepted' WHERE user_id=%s", (uid,))
+    body = ping()
+    assert body["state"] == "trip"
+    assert (body["next_interval"], body["min_move_m"]) == sys.modules["app"].PING_CADENCE["trip"][:2]
+
+def test_driver_cadence_idle_vs_trip(client, db_conn, make_user):
+    make_user("Drv", "drv@example.com", "drvpw", "driver")
+    did = _uid(db_conn, "drv@example.com")
+    client.post("/signin", data={"email": "drv@example.com", "password": "drvpw"})
+    ping = lambda: client.post("/update_driver_location", data={"lat": "27.7", "lon": "85.3"}).get_json()
+
+    body = ping()
+    assert body["state"] == "off"            # unverified: only a slow keep-alive...
+    assert body["next_interval"] is not None  # ...so verification is noticed without a reload
+
+    _exec(db_conn, "UPDATE users SET is_verified=TRUE WHERE id=%s", (did,))
+    body = ping()
+    assert body["state"] == "idle" and body["online"] and body["next_interval"] > 5
+
+    _exec(db_conn, """INSERT INTO bookings (driver_id, patient_name, phone_no, destination, status)
+                      VALUES (%s,'P','1','Hospital','Accepted')""", (did,))
+    body = ping()
+    assert body["state"] == "trip" and body["max_quiet"] < 300   # fresher than the 5-min staleness cutoff
@@ -0,0 +1,51 @@
+# tests/test_prepared_statements.py
+import sys
+from contextlib import contextmanager
+
+import database as dbmod
+
+def _server_prepared(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT name FROM pg_prepared_statements")
+        names = {r[0] for r in cur.fetchall()}
+    conn.rollback()
+    return names
+
+def test_hot_statements_prepared_once_per_connection(app, make_user, client):
+    make_user("PU", "pu@example.com", "pupw", "user")
+    with dbmod.pooled_connection() as conn:
+        assert dbmod.execute_prepared(conn, "unread_count", (0,)).fetchone()[0] == 0
+        assert "unread_count" in conn.prepared
+        assert "unread_count" in _server_prepared(conn)
+
+        # server forgets (e.g. pooler reset): re-prepared transparently
+        with conn.cursor() as cur:
+            cur.execute("DEALLOCATE ALL")
+        conn.commit()
+        assert dbmod.execute_prepared(conn, "unread_count", (0,)).fetchone()[0] == 0
+
+        conn.close()   # simulate a dropped connection; the pool discards it
+
+    with dbmod.pooled_connection() as conn:
+        assert not conn.closed
+        assert dbmod.execute_prepared(conn, "user_is_verified", (0,)).fetchone() is None
+
+def test_pings_and_polls_use_prepared_statements(client, make_user, monkeypatch):
+    make_user("PP", "pp@example.com", "pppw", "user")
+    client.post("/signin", data={"email": "pp@example.com", "password": "pppw"}, follow_redirects=True)
+
+    # remember the pooled connection each request borrowed
+    appmod, used = sys.modules["app"], []
+    real = appmod.pooled_connection
+    @contextmanager
+    def tracked():
+        with real() as conn:
+            used.append(conn)
+            yield conn
+    monkeypatch.setattr(appmod, "pooled_connection", tracked)
+
+    assert client.post("/update_user_location", data={"lat": "27.7", "lon": "85.3"}).get_json()["ok"]
+    assert client.get("/api/notifications/unread_count").get_json()["count"] == 0
+    assert len(used) == 2 and all(getattr(c, "pooled", False) for c in used)
+    assert {"upsert_user_location", "user_booking_state"} <= _server_prepared(used[0])
+    assert {"unread_count"} <= _server_prepared(used[1])
@@ -0,0 +1,59 @@
+# tests/test_query_budget.py
+def _id(conn, email):
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM users WHERE LOWER(email)=LOWER(%s)", (email,))
+        return cur.fetchone()[0]
+
+def _login(client, email, password):
+    client.get("/logout")
+    client.post("/signin", data={"email": email, "password": password}, follow_redirects=True)
+
+def _seed(db_conn, make_user):
+    make_user("QUser", "qu@example.com", "qupw", "user")
+    make_user("QDriver", "qd@example.com", "qdpw", "driver")
+    uid, did = _id(db_conn, "qu@example.com"), _id(db_conn, "qd@example.com")
+    with db_conn.cursor() as cur:
+        cur.execute("UPDATE users SET is_verified=TRUE WHERE id=%s", (did,))
+        for status in ("Pending", "Accepted", "Completed", "Completed"):
+            cur.execute("""
+                INSERT INTO bookings (user_id, driver_id, patient_name, phone_no, destination, status)
+                VALUES (%s,%s,'QP','98','QH',%s) RETURNING id
+            """, (uid, did, status))
+            bid = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO driver_ratings (booking_id, rater_user_id, driver_id, stars, comment)
+            VALUES (%s,%s,%s,4,'ok')
+        """, (bid, uid, did))
+        cur.execute("INSERT INTO notifications (user_id, title, body) VALUES (%s,'Q','q')", (uid,))
+        db_conn.commit()
+
+def test_listing_pages_meet_query_budget(client, db_conn, make_user, query_budget):
+    _seed(db_conn, make_user)
+
+    _login(client, "qu@example.com", "qupw")
+    with query_budget(1):
+        r = client.get("/mybookings")
+    assert b"QDriver" in r.data
+    with query_budget(2):
+        r = client.get("/dashboard/user")
+    assert b"QDriver" in r.data
+
+    _login(client, "qd@example.com", "qdpw")
+    with query_budget(1):
+        r = client.get("/driver/requests")
+    assert b"QUser" in r.data and b"QP" in r.data
+    with query_budget(1):
+        r = client.get("/driver/trips")
+    assert b"QUser" in r.data
+    with query_budget(1):
+        js = client.get("/driver/api/assigned").get_json()
+    assert js["active"][0]["user_name"] == "QUser"
+    assert js["pending"][0]["user_name"] == "QP"
+    with query_budget(2):
+        r = client.get("/dashboard/driver")
+    assert b"4.0" in r.data
+
+    _login(client, "raj@gmail.com", "raj123")
+    with query_budget(2):
+        r = client.get("/dashboard/admin")
+    assert b"QDriver" in r.data and b"QUser" in r.data
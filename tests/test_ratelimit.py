@@ -0,0 +1,44 @@
+# tests/test_ratelimit.py
+import ratelimit
+
+def test_memory_bucket_refills_and_evicts():
+    b = ratelimit.MemoryBuckets(max_keys=2)
+    assert b.take("k", 1, 2, now=0) == (True, 0.0)
+    assert b.take("k", 1, 2, now=0)[0]
+    allowed, wait = b.take("k", 1, 2, now=0.25)
+    assert not allowed and abs(wait - 0.75) < 1e-9
+    assert b.take("k", 1, 2, now=1.0)[0]          # one token back after a second
+
+    b.take("a", 1, 1, now=0); b.take("b", 1, 1, now=0)
+    assert len(b) == 2 and not b.take("b", 1, 1, now=0)[0]
+    assert b.take("k", 1, 2, now=1.0)[0]          # "k" was evicted: starts full again
+
+def test_pings_throttled_per_driver_before_handler(client, make_user, monkeypatch):
+    make_user("RLDrv", "rldrv@example.com", "rlpw", "driver")
+    client.post("/signin", data={"email": "rldrv@example.com", "password": "rlpw"})
+    monkeypatch.setitem(ratelimit.BUDGETS, "ping", (0.01, 2))
+    monkeypatch.setattr(ratelimit, "store", ratelimit.MemoryBuckets())
+    monkeypatch.setattr(ratelimit, "_stats", {})
+
+    ping = lambda: client.post("/update_driver_location", data={"lat": "27.7", "lon": "85.3"})
+    assert ping().status_code == 200
+    assert ping().status_code == 200
+    r = ping()
+    assert r.status_code == 429 and r.get_json()["error"] == "rate_limited"
+    assert int(r.headers["Retry-After"]) >= 1
+    # the JSON twin has its own bucket
+    assert client.post("/driver/api/location", json={"lat": 27.7, "lon": 85.3}).status_code == 200
+
+    client.get("/logout")
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+    routes = client.get("/admin/api/ratelimit").get_json()["routes"]
+    assert routes["update_driver_location"] == {"allowed": 2, "throttled": 1, "errors": 0}
+
+def test_shared_postgres_buckets(app):
+    b = ratelimit.PgBuckets()
+    assert b.take("test:pg", 0.01, 1) == (True, 0.0)
+    allowed, wait = b.take("test:pg", 0.01, 1)
+    assert not allowed and wait > 90
+
+def test_ratelimit_metrics_admin_only(client):
+    assert client.get("/admin/api/ratelimit").status_code == 403
@@ -0,0 +1,45 @@
+# tests/test_read_routing.py
+import time
+import database as dbmod
+
+def _app_name(conn):
+    with conn.cursor() as cur:
+        cur.execute("SHOW application_name")
+        return cur.fetchone()[0]
+
+def test_read_route_uses_replica_unless_pinned(app, monkeypatch):
+    # The test DB doubles as the "replica"; application_name tells them apart.
+    replica = dict(dbmod.DB_CFG, application_name="replica-1")
+    monkeypatch.setattr(dbmod, "REPLICA_CFGS", [replica])
+
+    @dbmod.db_route("read")
+    def read():
+        conn = dbmod.get_read_connection()
+        try:
+            return _app_name(conn)
+        finally:
+            conn.close()
+
+    assert read() == "replica-1"
+
+    # outside a read route -> primary
+    conn = dbmod.get_read_connection()
+    assert _app_name(conn) != "replica-1"
+    conn.close()
+
+    # pinned (read-your-writes) -> primary
+    dbmod.pin_primary(True)
+    try:
+        assert read() != "replica-1"
+    finally:
+        dbmod.pin_primary(False)
+
+def test_write_route_pins_session_to_primary(client, make_user):
+    make_user("RW", "rw@example.com", "rwpw", "user")
+    client.post("/signin", data={"email": "rw@example.com", "password": "rwpw"}, follow_redirects=True)
+    with client.session_transaction() as s:
+        assert s.get("db_primary_until", 0) < time.time()
+
+    client.post("/api/notifications/mark_read")
+    with client.session_transaction() as s:
+        assert s["db_primary_until"] > time.time()
@@ -0,0 +1,150 @@
+# tests/test_regions.py
+import json
+import threading
+import psycopg2
+import pytest
+
+import database as dbmod
+import regions
+
+KATHMANDU = (27.70, 85.33)
+POKHARA = (28.21, 83.99)
+
+def _uid(db_conn, email):
+    cur = db_conn.cursor()
+    cur.execute("SELECT id FROM users WHERE email=%s", (email,))
+    uid = cur.fetchone()[0]; cur.close()
+    return uid
+
+def _rows(db_conn, did):
+    cur = db_conn.cursor()
+    cur.execute("SELECT region, tableoid::regclass::text, latitude FROM driver_location WHERE driver_id=%s", (did,))
+    rows = cur.fetchall(); cur.close(); db_conn.commit()
+    return rows
+
+def test_region_map():
+    assert regions.region_of(*KATHMANDU) == "kathmandu"
+    assert regions.region_of(*POKHARA) == "pokhara"
+    assert regions.region_of(-40.0, 170.0) == regions.OTHER
+    assert regions.region_of(None, None) == regions.OTHER
+    # a small box inside one city scans that city only; one on its edge adds OTHER
+    assert regions.regions_in_box(27.69, 27.71, 85.32, 85.34) == ["kathmandu"]
+    assert regions.regions_in_box(27.50, 27.60, 85.30, 85.40) == ["kathmandu", regions.OTHER]
+
+def test_load_map_validates(tmp_path):
+    good = tmp_path / "good.json"
+    good.write_text(json.dumps({"valley": [27.5, 27.9, 85.1, 85.6]}))
+    assert regions.load_map(str(good)) == {"valley": (27.5, 27.9, 85.1, 85.6)}
+    for bad in ({"Bad-Name": [0, 1, 0, 1]}, {"other": [0, 1, 0, 1]}, {"flipped": [1, 0, 0, 1]}):
+        path = tmp_path / "bad.json"
+        path.write_text(json.dumps(bad))
+        with pytest.raises(ValueError):
+            regions.load_map(str(path))
+
+def test_ping_moves_driver_between_region_partitions(client, db_conn, make_user):
+    make_user("RegDrv", "regdrv@example.com", "regpw", "driver")
+    client.post("/signin", data={"email": "regdrv@example.com", "password": "regpw"})
+    did = _uid(db_conn, "regdrv@example.com")
+    ping = lambda lat, lon: client.post("/update_driver_location", data={"lat": lat, "lon": lon})
+
+    assert ping(*KATHMANDU).status_code == 200
+    assert _rows(db_conn, did) == [("kathmandu", "driver_location_kathmandu", KATHMANDU[0])]
+    ping(27.71, 85.33)
+    assert _rows(db_conn, did) == [("kathmandu", "driver_location_kathmandu", 27.71)]
+    ping(*POKHARA)
+    assert _rows(db_conn, did) == [("pokhara", "driver_location_pokhara", POKHARA[0])]
+
+    # an older offline fix never moves the driver back
+    cur = db_conn.cursor()
+    cur.execute("SELECT set_driver_location(%s, %s, %s, %s, NOW()::timestamp - INTERVAL '1 minute')",
+                (did, *KATHMANDU, "kathmandu"))
+    db_conn.commit(); cur.close()
+    assert _rows(db_conn, did) == [("pokhara", "driver_location_pokhara", POKHARA[0])]
+
+def test_driver_search_prunes_other_regions(app, db_conn):
+    cur = db_conn.cursor()
+    cur.execute("EXPLAIN SELECT 1 FROM driver_location WHERE region = ANY(%s)",
+                (regions.regions_in_box(27.69, 27.71, 85.32, 85.34),))
+    plan = "\n".join(r[0] for r in cur.fetchall()); cur.close()
+    assert "driver_location_kathmandu" in plan
+    assert "driver_location_pokhara" not in plan
+
+def test_booking_gets_pickup_region(client, db_conn, make_user):
+    make_user("RegNear", "regnear@example.com", "regpw", "driver")
+    cur = db_conn.cursor()
+    cur.execute("UPDATE users SET is_verified=TRUE, is_online=TRUE WHERE email='regnear@example.com' RETURNING id")
+    cur.execute("SELECT set_driver_location(%s, %s, %s, 'pokhara', NOW()::timestamp)",
+                (cur.fetchone()[0], POKHARA[0] + 0.001, POKHARA[1]))
+    db_conn.commit(); cur.close()
+    make_user("RegRider", "regrider@example.com", "regpw", "user")
+    client.post("/signin", data={"email": "regrider@example.com", "password": "regpw"})
+    client.post("/request_emergency", data={"patient_name": "P", "phone_no": "1", "destination": "H",
+                                            "user_lat": str(POKHARA[0]), "user_lon": str(POKHARA[1])})
+    cur = db_conn.cursor()
+    cur.execute("SELECT region FROM bookings WHERE user_id=%s", (_uid(db_conn, "regrider@example.com"),))
+    assert cur.fetchone() == ("pokhara",)
+    cur.close()
+
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+    body = client.get("/admin/api/regions").get_json()
+    pokhara = next(r for r in body["regions"] if r["region"] == "pokhara")
+    assert pokhara["pending_bookings"] >= 1
+
+@pytest.fixture
+def legacy_db(pg_admin_conn, test_db_name):
+    name = test_db_name + "_legacy_loc"
+    with pg_admin_conn.cursor() as cur:
+        cur.execute(f'CREATE DATABASE "{name}"')
+    conn = psycopg2.connect(**dict(dbmod.DB_CFG, database=name))
+    yield conn
+    conn.close()
+    with pg_admin_conn.cursor() as cur:
+        cur.execute(f'DROP DATABASE IF EXISTS "{name}"')
+
+def test_plain_driver_location_converted(legacy_db):
+    cur = legacy_db.cursor()
+    cur.execute("""
+        CREATE TABLE users (id SERIAL PRIMARY KEY);
+        CREATE TABLE driver_location (
+            driver_id INT PRIMARY KEY REFERENCES users(id),
+            latitude DOUBLE PRECISION,
+            longitude DOUBLE PRECISION,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX idx_driver_location_lat_lon ON driver_location (latitude, longitude);
+        INSERT INTO users DEFAULT VALUES; INSERT INTO users DEFAULT VALUES;
+        INSERT INTO driver_location (driver_id, latitude, longitude) VALUES (1, 27.70, 85.33), (2, NULL, NULL);
+    """)
+    regions.create_table(cur)
+    legacy_db.commit()
+    cur.execute("SELECT driver_id, region, tableoid::regclass::text FROM driver_location ORDER BY driver_id")
+    assert cur.fetchall() == [(1, "kathmandu", "driver_location_kathmandu"),
+                              (2, regions.OTHER, "driver_location_other")]
+    cur.execute("SELECT to_regclass('public.driver_location_legacy')")
+    assert cur.fetchone()[0] is None
+    cur.close()
+
+def test_concurrent_region_moves_leave_one_row(client, db_conn, make_user):
+    make_user("RaceDrv", "racedrv@example.com", "racepw", "driver")
+    did = _uid(db_conn, "racedrv@example.com")
+    cur = db_conn.cursor()
+    cur.execute("SELECT set_driver_location(%s, %s, %s, 'kathmandu', NOW()::timestamp - INTERVAL '1 minute')",
+                (did, *KATHMANDU))
+    db_conn.commit()
+
+    # tx A moves the driver to pokhara and holds its transaction open...
+    cur.execute("SELECT set_driver_location(%s, %s, %s, 'pokhara', NOW()::timestamp - INTERVAL '30 seconds')",
+                (did, *POKHARA))
+    # ...while tx B moves them to other
+    def move_to_other():
+        conn = psycopg2.connect(**dbmod.DB_CFG)
+        conn.cursor().execute("SELECT set_driver_location(%s, -40.0, 170.0, %s, NOW()::timestamp)",
+                              (did, regions.OTHER))
+        conn.commit(); conn.close()
+    other = threading.Thread(target=move_to_other)
+    other.start()
+    other.join(0.5)
+    assert other.is_alive()          # B waits for A's lock on this driver
+    db_conn.commit(); cur.close()
+    other.join(5)
+    assert [r[0] for r in _rows(db_conn, did)] == [regions.OTHER]
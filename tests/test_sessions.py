@@ -0,0 +1,72 @@
+# tests/test_sessions.py
+from datetime import datetime, timedelta
+
+def _session_cookie(client):
+    c = client.get_cookie("session")
+    return c.value if c else None
+
+def test_cookie_holds_only_opaque_id(client, db_conn, make_user):
+    make_user("S1", "s1@example.com", "s1pw", "user")
+    client.post("/signin", data={"email": "s1@example.com", "password": "s1pw"}, follow_redirects=True)
+    client.post("/book", data={
+        "patient_name": "Patient With A Long Name", "phone_no": "9800000000",
+        "pickup_location": "Somewhere far away", "destination": "Hospital",
+        "user_lat": "27.70", "user_lon": "85.33"
+    })
+
+    sid = _session_cookie(client)
+    assert sid and len(sid) == 22
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT data FROM sessions WHERE sid=%s", (sid,))
+        data = cur.fetchone()[0]
+    assert "Patient With A Long Name" in data
+
+    client.get("/logout")
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT data FROM sessions WHERE sid=%s", (sid,))
+        row = cur.fetchone()
+    assert row is None or "Patient" not in row[0]
+
+def test_sweep_removes_expired_sessions(app, db_conn):
+    store = app.session_interface.store
+    store.save("x" * 22, {"user_id": 1}, datetime.now() - timedelta(seconds=1))
+    assert store.load("x" * 22) == (None, None)
+    store.sweep()
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM sessions WHERE sid=%s", ("x" * 22,))
+        assert cur.fetchone() is None
+
+def test_login_issues_new_session_id(client, db_conn, make_user):
+    make_user("S2", "s2@example.com", "s2pw", "user")
+    client.post("/signin", data={"email": "s2@example.com", "password": "wrong"})   # flash -> session
+    before = _session_cookie(client)
+    assert before
+
+    client.post("/signin", data={"email": "s2@example.com", "password": "s2pw"})
+    after = _session_cookie(client)
+    assert after and after != before
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT sid FROM sessions WHERE sid = ANY(%s)", ([before, after],))
+        assert [r[0] for r in cur.fetchall()] == [after]
+
+    # the pre-login id is worthless now
+    client.set_cookie("session", before)
+    assert client.get("/api/booking_positions/1").status_code == 403
+
+def test_flashes_added_to_a_stored_session_survive(client):
+    # each request flashes and redirects without rendering; the later ones
+    # append to the _flashes list that was loaded back from storage
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+    client.get("/mybookings")
+    client.get("/driver/trips")
+    page = client.get("/signin").data
+    assert b"Signed in." in page and b"Sign in as user." in page and b"Sign in as driver." in page
+
+def test_static_requests_do_not_load_the_session(client, monkeypatch):
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+    store = client.application.session_interface.store
+    loads = []
+    monkeypatch.setattr(store, "load", lambda sid: loads.append(sid) or (None, None))
+    r = client.get("/static/css/style.css")
+    assert r.status_code == 200 and loads == []
+    r.close()
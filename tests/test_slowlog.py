@@ -0,0 +1,57 @@
+# tests/test_slowlog.py
+import json
+import slowlog
+
+def test_normalize_strips_literals_and_params():
+    sql = "SELECT * FROM users  WHERE email = 'a@b.c' AND id = %s LIMIT 10"
+    assert slowlog.normalize(sql) == "SELECT * FROM users WHERE email = ? AND id = ? LIMIT ?"
+    assert slowlog.normalize("EXECUTE unread_count (%s)") == "EXECUTE unread_count"
+
+def test_slow_requests_logged_with_plans_once_per_shape(client, tmp_path, monkeypatch):
+    path = tmp_path / "slow.log"
+    monkeypatch.setattr(slowlog, "SLOW_REQUEST_MS", 0.001)
+    monkeypatch.setattr(slowlog, "SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(slowlog, "SLOW_LOG_PATH", str(path))
+    monkeypatch.setattr(slowlog, "_logger", None)
+    monkeypatch.setattr(slowlog, "_explained", set())
+
+    client.post("/signin", data={"email": "raj@gmail.com", "password": "raj123"})
+    client.get("/admin/api/search?q=raj").close()   # WSGI servers close; plans run then
+    client.get("/admin/api/search?q=raj").close()   # WSGI servers close; plans run then
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+
+    searches = [r for r in records if r["type"] == "request" and r["route"] == "/admin/api/search"]
+    assert len(searches) == 2
+    req = searches[0]
+    assert req["role"] == "admin" and req["status"] == 200 and req["ms"] > 0
+    assert req["statements"] and all(s["ms"] >= 0 for s in req["statements"])
+    assert any(s["params"] for s in req["statements"])
+
+    plans = [r for r in records if r["type"] == "plan"]
+    shapes = [p["shape"] for p in plans]
+    assert len(shapes) == len(set(shapes))          # each shape explained once
+    assert {s["shape"] for s in req["statements"] if s["sql"].startswith(("SELECT", "WITH"))} <= set(shapes)
+    assert any("Buffers" in line or "actual time" in line for p in plans for line in p["plan"])
+
+    text = path.read_text()
+    assert "raj123" not in text and "'raj:*'" not in text
+
+def test_only_read_only_shapes_are_analyzed(app, db_conn):
+    plan, analyzed = slowlog.explain("SELECT COUNT(*) FROM users WHERE id > %s", (0,))
+    assert analyzed and any("actual time" in line for line in plan)
+
+    writes = [
+        ("UPDATE users SET username='slowlog' WHERE id=%s", (1,)),
+        ("SELECT id FROM users WHERE id=%s FOR UPDATE", (1,)),
+        ("WITH d AS (DELETE FROM notifications WHERE id=%s RETURNING 1) SELECT * FROM d", (0,)),
+        ("SELECT set_driver_location(%s, 1.0, 1.0, 'other', NOW()::timestamp)", (-1,)),
+        ("EXECUTE upsert_driver_location (%s, %s, %s, %s)", (-1, 1.0, 1.0, "other")),
+    ]
+    for sql, vars in writes:
+        plan, analyzed = slowlog.explain(sql, vars)
+        assert not analyzed, sql
+        assert not any("actual time" in line for line in plan), sql
+
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT username FROM users WHERE id=1")
+        assert cur.fetchone()[0] != "slowlog"
@@ -0,0 +1,83 @@
+# tests/test_unread_counters.py
+import sys
+import threading
+
+import psycopg2
+
+import database as dbmod
+
+
+def _uid(db_conn, email):
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT id FROM users WHERE email=%s", (email,))
+        return cur.fetchone()[0]
+
+def _counter(db_conn, uid):
+    with db_conn.cursor() as cur:
+        cur.execute("SELECT unread FROM notification_counters WHERE user_id=%s", (uid,))
+        row = cur.fetchone()
+    db_conn.commit()
+    return row[0] if row else 0
+
+
+def test_counter_follows_inserts_and_mark_read(client, db_conn, make_user, query_budget):
+    make_user("CntUser", "cnt@example.com", "cpw", "user")
+    make_user("CntOther", "cnt2@example.com", "cpw", "user")
+    uid, other = _uid(db_conn, "cnt@example.com"), _uid(db_conn, "cnt2@example.com")
+
+    with db_conn.cursor() as cur:
+        cur.execute("INSERT INTO notifications (user_id, title, body) VALUES (%s,'a','b'), (%s,'c','d')",
+                    (uid, uid))
+        cur.execute("INSERT INTO notifications (user_id, title, body, is_read) VALUES (%s,'old','x',TRUE)",
+                    (uid,))
+    sys.modules["app"].create_notifications(db_conn, [uid, other], "Bulk", "Body")
+    db_conn.commit()
+    assert _counter(db_conn, uid) == 3
+    assert _counter(db_conn, other) == 1
+
+    client.post("/signin", data={"email": "cnt@example.com", "password": "cpw"}, follow_redirects=True)
+    with query_budget(2):   # PREPARE (first use on this connection) + one primary-key lookup
+        assert client.get("/api/notifications/unread_count").get_json()["count"] == 3
+
+    client.post("/api/notifications/mark_read")
+    assert _counter(db_conn, uid) == 0
+    assert _counter(db_conn, other) == 1
+    assert client.get("/api/notifications/unread_count").get_json()["count"] == 0
+
+
+def test_reconcile_repairs_drift(client, db_conn, make_user):
+    make_user("DriftUser", "drift@example.com", "dpw", "user")
+    uid = _uid(db_conn, "drift@example.com")
+    with db_conn.cursor() as cur:
+        cur.execute("INSERT INTO notifications (user_id, title, body) VALUES (%s,'a','b')", (uid,))
+        cur.execute("UPDATE notification_counters SET unread=42 WHERE user_id=%s", (uid,))
+    db_conn.commit()
+
+    assert dbmod.reconcile_unread_counters(db_conn) >= 1
+    assert _counter(db_conn, uid) == 1
+    assert dbmod.reconcile_unread_counters(db_conn) == 0
+
+
+def test_reconcile_does_not_wait_on_other_users_writes(client, db_conn, make_user):
+    make_user("BusyWriter", "busywriter@example.com", "bpw", "user")
+    make_user("Drifted", "drifted@example.com", "dpw", "user")
+    busy, drifted = _uid(db_conn, "busywriter@example.com"), _uid(db_conn, "drifted@example.com")
+    with db_conn.cursor() as cur:
+        cur.execute("INSERT INTO notification_counters (user_id, unread) SELECT %s, 7 "
+                    "ON CONFLICT (user_id) DO UPDATE SET unread=7", (drifted,))
+    db_conn.commit()
+
+    # a booking transaction mid-way: its notification is written but not committed
+    writer = psycopg2.connect(**dbmod.DB_CFG)
+    writer.cursor().execute("INSERT INTO notifications (user_id, title, body) VALUES (%s,'a','b')", (busy,))
+    done = []
+    def run():
+        conn = psycopg2.connect(**dbmod.DB_CFG)
+        done.append(dbmod.reconcile_unread_counters(conn)); conn.close()
+    t = threading.Thread(target=run)
+    t.start(); t.join(5)
+    finished = not t.is_alive()
+    writer.commit(); writer.close(); t.join(5)
+    assert finished and done[0] >= 1
+    assert _counter(db_conn, drifted) == 0
+    assert _counter(db_conn, busy) == 1